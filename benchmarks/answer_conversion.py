@@ -0,0 +1,87 @@
+"""
+Answer extraction benchmark: single-pass Markdown converter against the former BeautifulSoup cleaners.
+
+Usage: python benchmarks/answer_conversion.py [--blocks 50] [--runs 20]
+The answer is made of `--blocks` sections, each one with a paragraph, inline code, a decorated code block and a list.
+Requires beautifulsoup4 for the baseline.
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import timeit
+from typing import Callable, Dict, List
+
+from bs4 import BeautifulSoup, Tag
+
+ROOT_PATH: str = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_PATH)
+
+from chapito.tools.markdown import html_to_markdown  # noqa: E402
+
+SECTION_HTML: str = """
+<p>Section {index}: call <code>run({index})</code> to start, then check the <code>status</code> field.</p>
+<pre><div class="header"><span>python</span><button><svg><path d="M0,0"></path></svg>Copy</button></div>
+<div><code class="language-python">{code}</code></div></pre>
+<ul><li>First point of section {index}</li><li>Second point, with <b>bold</b> text</li></ul>
+"""
+CODE_LINE: str = "result = compute(values[{line}], factor=&quot;{line}&quot;)  # &lt;step {line}&gt;\n"
+
+
+def build_answer(blocks: int, code_lines: int = 20) -> str:
+    code = "".join(CODE_LINE.format(line=line) for line in range(code_lines))
+    sections = "".join(SECTION_HTML.format(index=index, code=code) for index in range(blocks))
+    return f'<div class="answer">{sections}</div>'
+
+
+def clean_with_beautifulsoup(html: str) -> str:
+    """
+    Former cleaner of Anthropic answers: keep the code of <pre> blocks, then fence block and inline code.
+    """
+    soup = BeautifulSoup(html, "html.parser")
+    for pre in soup.find_all("pre"):
+        if isinstance(pre, Tag):
+            code_tags = pre.find_all("code")
+            pre.clear()
+            for code in code_tags:
+                pre.append(code)
+    for code_tag in soup.find_all("code"):
+        if code_tag.parent and code_tag.parent.name == "pre":
+            code_tag.insert_before("```\n")
+            code_tag.insert_after("\n```\n")
+        else:
+            code_tag.insert_before("`")
+            code_tag.insert_after("`")
+    return soup.get_text().strip()
+
+
+def measure(convert: Callable[[str], str], html: str, runs: int) -> List[float]:
+    """
+    Duration of each conversion, in milliseconds.
+    """
+    return [duration * 1000 for duration in timeit.repeat(lambda: convert(html), number=1, repeat=runs)]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare the answer converters of Chapito")
+    parser.add_argument("--blocks", type=int, default=50, help="Number of sections in the answer")
+    parser.add_argument("--runs", type=int, default=20, help="Number of measures")
+    args = parser.parse_args()
+
+    html = build_answer(args.blocks)
+    converters: Dict[str, Callable[[str], str]] = {
+        "beautifulsoup": clean_with_beautifulsoup,
+        "markdown": html_to_markdown,
+    }
+    print(f"Answer: {len(html) // 1024} KB of HTML, {args.runs} runs")
+    medians = {}
+    for name, convert in converters.items():
+        durations = measure(convert, html, args.runs)
+        medians[name] = statistics.median(durations)
+        print(f"{name:>15}: median {medians[name]:8.2f} ms, min {min(durations):8.2f} ms")
+    print(f"Speedup: x{medians['beautifulsoup'] / medians['markdown']:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,309 @@
+"""
+Offline chat site: a fake WebDriver answering the commands of the real chatbot modules.
+
+Each tab holds a conversation of the chatbot. Elements are found with the selectors of the chatbot module,
+so the page always matches the module. Answers are HTML fixtures shaped like the chatbot's answers
+(its code block markup), "typed" one block at a time at a scripted pace.
+Scripts of Chapito are recognized and answered from the state of the page: the in-page answer extractor
+is emulated by its Python mirror (`html_to_markdown`).
+No browser nor network is needed: the commands of a tab are served in the Python process.
+"""
+
+import html
+import importlib
+import itertools
+import os
+import sys
+import time
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional, Tuple
+
+from selenium.common.exceptions import NoSuchElementException
+from selenium.webdriver.remote.command import Command
+from selenium.webdriver.remote.locator_converter import LocatorConverter
+from selenium.webdriver.remote.switch_to import SwitchTo
+from selenium.webdriver.remote.webdriver import WebDriver
+from selenium.webdriver.remote.webelement import WebElement
+
+ROOT_PATH: str = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_PATH not in sys.path:
+    sys.path.insert(0, ROOT_PATH)
+
+from chapito.tools.completion import COMPLETION_STATE_SCRIPT, INSTALL_OBSERVER_SCRIPT  # noqa: E402
+from chapito.tools.extraction import EXTRACT_ANSWER_SCRIPT  # noqa: E402
+from chapito.tools.markdown import html_to_markdown, parse_selectors  # noqa: E402
+from chapito.tools.rotation import DOM_SIZE_SCRIPT  # noqa: E402
+from chapito.tools.tools import INSERT_PROMPT_SCRIPT, READ_PROMPT_HASH_SCRIPT, get_prompt_hash  # noqa: E402
+
+ELEMENT_KEY: str = "element-6066-11e4-a52e-4f735466cecf"
+# Elements of an empty chat page, and per block of answer.
+PAGE_NODES: int = 300
+BLOCK_NODES: int = 20
+DEFAULT_BLOCKS: int = 20
+DEFAULT_CODE_LINES: int = 10
+DEFAULT_BLOCK_INTERVAL_SECONDS: float = 0.025
+
+PARAGRAPH_HTML: str = "<p>Step {index}: call <code>run({index})</code>, then check the <b>status</b> field.</p>"
+LIST_HTML: str = "<ul><li>First point of step {index}</li><li>Second point of step {index}</li></ul>"
+CODE_HEADER_HTML: str = '<div class="header"><span>python</span><button><svg></svg>Copy</button></div>'
+CODE_LINE: str = 'result = compute(values[{line}], factor="{line}")  # <step {line}>\n'
+
+
+def build_code_block(code_block_selector: str, code: str) -> str:
+    """
+    Code block marked up like the chatbot's ones: its first code block selector wraps the <pre> element.
+    """
+    tag, classes = parse_selectors(code_block_selector)[0]
+    code_html = f'<code class="language-python">{html.escape(code)}</code>'
+    if tag == "pre" and not classes:
+        return f"<pre>{CODE_HEADER_HTML}{code_html}</pre>"
+    tag = tag or "div"
+    return f'<{tag} class="{" ".join(sorted(classes))}">{CODE_HEADER_HTML}<pre>{code_html}</pre></{tag}>'
+
+
+def build_answer_blocks(
+    code_block_selector: str, blocks: int = DEFAULT_BLOCKS, code_lines: int = DEFAULT_CODE_LINES
+) -> List[str]:
+    """
+    HTML of an answer, split in the blocks displayed while the chatbot is typing:
+    paragraphs with inline code, code blocks and lists.
+    """
+    code = "".join(CODE_LINE.format(line=line) for line in range(code_lines))
+    templates = [
+        lambda index: PARAGRAPH_HTML.format(index=index),
+        lambda index: build_code_block(code_block_selector, code),
+        lambda index: LIST_HTML.format(index=index),
+    ]
+    return [templates[index % len(templates)](index) for index in range(blocks)]
+
+
+class Answer:
+    """
+    An answer typed one block at a time, from the moment the prompt is submitted.
+    """
+
+    def __init__(self, blocks: List[str], block_interval: float):
+        self.blocks = blocks
+        self.block_interval = block_interval
+        self.start_time = time.monotonic()
+
+    def visible_blocks(self, now: float) -> int:
+        return min(len(self.blocks), int((now - self.start_time) / self.block_interval))
+
+    def is_finished(self, now: float) -> bool:
+        return self.visible_blocks(now) == len(self.blocks)
+
+    def last_change(self, now: float) -> float:
+        # The prompt bubble appears on submit, then each block.
+        return self.start_time + self.visible_blocks(now) * self.block_interval
+
+    def get_html(self, now: float) -> str:
+        return '<div class="answer">' + "".join(self.blocks[: self.visible_blocks(now)]) + "</div>"
+
+    @property
+    def duration(self) -> float:
+        return len(self.blocks) * self.block_interval
+
+
+class FakeTab:
+    def __init__(self):
+        self.prompt = ""
+        self.answers: List[Answer] = []
+        # Time the completion observer was installed.
+        self.observer_time: Optional[float] = None
+
+
+class FakeChatSite:
+    """
+    Pages of a chatbot in one browser. Commands are serialized by the tabs sharing the browser.
+    """
+
+    def __init__(self, provider, answer_blocks: List[str], block_interval: float):
+        self.provider = provider
+        self.answer_blocks = answer_blocks
+        self.block_interval = block_interval
+        self.handle_counter = itertools.count()
+        self.tabs: Dict[str, FakeTab] = {}
+        self.current_handle: Optional[str] = None
+        converter = LocatorConverter()
+        # Element kinds by locator, as sent by WebDriver.
+        self.locators: Dict[Tuple[str, str], str] = {
+            converter.convert(*provider.answer_locator): "answer",
+            converter.convert(*provider.textarea_locator): "textarea",
+            ("css selector", provider.get_loaded_css_selector()): "loaded",
+            ("css selector", provider.get_done_css_selector()): "done",
+            ("css selector", provider.submit_css_selector): "submit",
+        }
+
+    @property
+    def tab(self) -> FakeTab:
+        return self.tabs[self.current_handle]
+
+    def find(self, using: str, value: str) -> List[str]:
+        kind = self.locators.get((using, value))
+        now = time.monotonic()
+        generating = bool(self.tab.answers) and not self.tab.answers[-1].is_finished(now)
+        if kind == "answer":
+            return [f"{self.current_handle}:answer:{index}" for index in range(len(self.tab.answers))]
+        if kind in ("textarea", "loaded") or (kind in ("submit", "done") and not generating):
+            return [f"{self.current_handle}:{kind}:0"]
+        return []
+
+    def click(self, element_id: str) -> None:
+        handle, kind, _ = element_id.split(":")
+        if kind == "submit":
+            tab = self.tabs[handle]
+            tab.prompt = ""
+            tab.answers.append(Answer(self.answer_blocks, self.block_interval))
+
+    def get_answer(self, element_id: str) -> Answer:
+        handle, _, index = element_id.split(":")
+        return self.tabs[handle].answers[int(index)]
+
+    def get_completion_state(self) -> Optional[Dict[str, Any]]:
+        tab = self.tab
+        if tab.observer_time is None:
+            return None
+        now = time.monotonic()
+        answer = tab.answers[-1] if tab.answers and tab.answers[-1].start_time >= tab.observer_time else None
+        if answer is None:
+            return {
+                "quietFor": now - tab.observer_time,
+                "mutations": 0,
+                "firstAnswerTextAfter": None,
+                "done": True,
+                "newAnswer": False,
+            }
+        first_text_time = answer.start_time + answer.block_interval
+        return {
+            "quietFor": now - answer.last_change(now),
+            "mutations": 1 + answer.visible_blocks(now),
+            "firstAnswerTextAfter": first_text_time - tab.observer_time if answer.visible_blocks(now) else None,
+            "done": answer.is_finished(now),
+            "newAnswer": True,
+        }
+
+    def extract_last_answer(self, code_block_selector: str, skip_selector: str, known_count) -> Dict[str, Any]:
+        answers = self.tab.answers
+        if known_count is None or len(answers) <= known_count:
+            return {"count": len(answers), "markdown": None}
+        html_answer = answers[-1].get_html(time.monotonic())
+        return {"count": len(answers), "markdown": html_to_markdown(html_answer, code_block_selector, skip_selector)}
+
+    def execute_script(self, script: str, args: List[Any]) -> Any:
+        args = [arg.id if isinstance(arg, WebElement) else arg for arg in args]
+        tab = self.tab
+        if script == INSERT_PROMPT_SCRIPT:
+            tab.prompt = args[1]
+            return "value" if args[2] == "auto" else args[2]
+        if script == READ_PROMPT_HASH_SCRIPT:
+            return get_prompt_hash(tab.prompt)
+        if script == INSTALL_OBSERVER_SCRIPT:
+            tab.observer_time = time.monotonic()
+            return None
+        if script == COMPLETION_STATE_SCRIPT:
+            return self.get_completion_state()
+        if script == EXTRACT_ANSWER_SCRIPT:
+            return self.extract_last_answer(args[2], args[3], args[4])
+        if script == DOM_SIZE_SCRIPT:
+            now = time.monotonic()
+            return PAGE_NODES + BLOCK_NODES * sum(answer.visible_blocks(now) for answer in tab.answers)
+        if script.startswith("/* getAttribute */"):
+            element_id, name = args
+            if name == "outerHTML" and ":answer:" in element_id:
+                return self.get_answer(element_id).get_html(time.monotonic())
+            return None
+        if script.startswith("/* isDisplayed */"):
+            return True
+        return None
+
+
+class FakeChatDriver(WebDriver):
+    """
+    WebDriver session answered by a `FakeChatSite` instead of a browser.
+    The site is shared with the copies of the driver (tab views), like a real session.
+    Implicit waits are not emulated: searches fail right away (tab views emulate them).
+    """
+
+    def __init__(self, site: FakeChatSite):
+        # No remote end: commands are answered by `execute`.
+        self.session_id = "fake-chat-session"
+        self._switch_to = SwitchTo(self)
+        self.locator_converter = LocatorConverter()
+        self.site = site
+        self.switch_to.new_window("tab")
+
+    def execute(self, driver_command: str, params: dict = None) -> dict:
+        site = self.site
+        params = params or {}
+        value = None
+        if driver_command == Command.NEW_WINDOW:
+            handle = f"tab-{next(site.handle_counter)}"
+            site.tabs[handle] = FakeTab()
+            value = {"handle": handle, "type": params["type"]}
+        elif driver_command == Command.SWITCH_TO_WINDOW:
+            site.current_handle = params["handle"]
+        elif driver_command == Command.CLOSE:
+            del site.tabs[site.current_handle]
+            site.current_handle = None
+        elif driver_command == Command.W3C_GET_CURRENT_WINDOW_HANDLE:
+            value = site.current_handle
+        elif driver_command == Command.W3C_GET_WINDOW_HANDLES:
+            value = list(site.tabs)
+        elif driver_command == Command.GET:
+            # New chat.
+            site.tabs[site.current_handle] = FakeTab()
+        elif driver_command in (Command.FIND_ELEMENT, Command.FIND_ELEMENTS):
+            element_ids = site.find(params["using"], params["value"])
+            if driver_command == Command.FIND_ELEMENT and not element_ids:
+                raise NoSuchElementException(f"No element matches {params['value']}")
+            value = [{ELEMENT_KEY: element_id} for element_id in element_ids]
+            value = value[0] if driver_command == Command.FIND_ELEMENT else value
+        elif driver_command == Command.FIND_CHILD_ELEMENT:
+            raise NoSuchElementException(f"No element matches {params['value']}")
+        elif driver_command == Command.FIND_CHILD_ELEMENTS:
+            value = []
+        elif driver_command == Command.CLICK_ELEMENT:
+            site.click(params["id"])
+        elif driver_command == Command.IS_ELEMENT_ENABLED:
+            value = True
+        elif driver_command == Command.GET_ELEMENT_TAG_NAME:
+            value = "div"
+        elif driver_command == Command.GET_ELEMENT_TEXT:
+            value = html_to_markdown(site.get_answer(params["id"]).get_html(time.monotonic()))
+        elif driver_command == Command.W3C_EXECUTE_SCRIPT:
+            value = site.execute_script(params["script"], params["args"])
+        elif driver_command != Command.SET_TIMEOUTS:
+            raise NotImplementedError(driver_command)
+        return {"value": self._unwrap_value(value)}
+
+    def quit(self) -> None:
+        self.site.tabs.clear()
+
+
+def create_fake_chat_module(
+    module_name: str,
+    blocks: int = DEFAULT_BLOCKS,
+    code_lines: int = DEFAULT_CODE_LINES,
+    block_interval: float = DEFAULT_BLOCK_INTERVAL_SECONDS,
+) -> SimpleNamespace:
+    """
+    Chatbot module (eg. "chapito.grok_chat") whose browsers are fake chat sites: the chatbot code runs unchanged.
+    """
+    chat_module = importlib.import_module(module_name)
+    provider = chat_module.provider
+    answer_blocks = build_answer_blocks(provider.code_block_selector, blocks, code_lines)
+
+    def initialize_driver(config) -> FakeChatDriver:
+        driver = FakeChatDriver(FakeChatSite(provider, answer_blocks, block_interval))
+        provider.open_new_chat(driver)
+        return driver
+
+    return SimpleNamespace(
+        provider=provider,
+        initialize_driver=initialize_driver,
+        open_new_chat=provider.open_new_chat,
+        send_request_and_get_response=provider.send_request_and_get_response,
+        send_request_and_stream_response=provider.send_request_and_stream_response,
+        answer_duration=len(answer_blocks) * block_interval,
+    )
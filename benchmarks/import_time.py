@@ -0,0 +1,63 @@
+"""
+Cold start benchmark: import time of the entry point, measured with `python -X importtime`.
+
+Usage: python benchmarks/import_time.py [--module main] [--runs 5] [--max-ms 1000]
+Exits with an error when the median import time exceeds `--max-ms`.
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+ROOT_PATH: str = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def measure_import(module: str) -> Dict[str, int]:
+    """
+    Cumulative import time of each module, in microseconds, in a fresh interpreter.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT_PATH,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    timings = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        timings[name.strip()] = int(cumulative)
+    return timings
+
+
+def get_slowest_imports(timings: Dict[str, int], count: int = 10) -> List[Tuple[str, int]]:
+    return sorted(timings.items(), key=lambda item: item[1], reverse=True)[:count]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Measure the import time of Chapito")
+    parser.add_argument("--module", type=str, default="main", help="Module to import")
+    parser.add_argument("--runs", type=int, default=5, help="Number of measures")
+    parser.add_argument("--max-ms", type=float, help="Maximum median import time, in milliseconds")
+    args = parser.parse_args()
+
+    runs = [measure_import(args.module) for _ in range(args.runs)]
+    durations = [timings[args.module] / 1000 for timings in runs]
+    median = statistics.median(durations)
+    print(f"import {args.module}: median {median:.1f} ms, min {min(durations):.1f} ms, max {max(durations):.1f} ms")
+    print("Slowest imports (last run):")
+    for name, cumulative in get_slowest_imports(runs[-1]):
+        print(f"  {cumulative / 1000:8.1f} ms  {name}")
+
+    if args.max_ms is not None and median > args.max_ms:
+        print(f"Import time regression: {median:.1f} ms > {args.max_ms} ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
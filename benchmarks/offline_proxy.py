@@ -0,0 +1,211 @@
+"""
+Offline proxy benchmark: the whole proxy (HTTP layer, browser pool, chatbot module) against fake chat sites.
+
+Usage: python benchmarks/offline_proxy.py [--chatbot grok] [--requests 20] [--concurrency 2] [--stream]
+           [--blocks 20] [--code-lines 10] [--block-interval 0.025] [--quiet-period 0.2]
+Each client holds a conversation and sends its turns one after the other. The proxy is served by uvicorn
+on the loopback interface, the chatbot module drives a fake WebDriver (see `fake_chat_site.py`):
+no browser nor network needed.
+Reports throughput, and p50/p99 of the request latency, time to first token and stages of the proxy.
+"Completion detection" is the time between the end of the typed answer and the end of the generation stage.
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import sys
+import threading
+import time
+from typing import Callable, Dict, List
+
+import httpx
+import uvicorn
+
+ROOT_PATH: str = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_PATH)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT_PATH, "tests"))
+
+from conftest import make_config as make_test_config  # noqa: E402
+
+from fake_chat_site import (  # noqa: E402
+    DEFAULT_BLOCK_INTERVAL_SECONDS,
+    DEFAULT_BLOCKS,
+    DEFAULT_CODE_LINES,
+    create_fake_chat_module,
+)
+
+from main import CHAT_MODULES  # noqa: E402
+
+from chapito.config import Config  # noqa: E402
+from chapito.proxy import app, setup_proxy  # noqa: E402
+from chapito.tools.metrics import metrics  # noqa: E402
+from chapito.tools.providers import ProviderRegistry  # noqa: E402
+from chapito.tools.specs import apply_spec  # noqa: E402
+from chapito.types import Chatbot  # noqa: E402
+
+# Stages of the proxy, as observed by `chapito.tools.metrics`.
+STAGES: List[str] = ["queue", "transfer", "submit", "first_token", "generation", "extraction", "cleaning"]
+
+
+def make_config(chatbot: Chatbot, concurrency: int, stream: bool) -> Config:
+    return make_test_config(
+        chatbot=chatbot,
+        stream=stream,
+        tabs_per_worker=concurrency,
+        max_tabs=concurrency + 1,
+        queue_size=concurrency * 2,
+    )
+
+
+def start_server() -> uvicorn.Server:
+    """
+    Serve the proxy on a free port of the loopback interface, in its own thread like in production.
+    """
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=0, log_level="warning"))
+    threading.Thread(target=server.run, name="chapito-bench-server", daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return server
+
+
+def percentile(samples: List[float], percent: float) -> float:
+    """
+    Nearest-rank percentile.
+    """
+    ordered = sorted(samples)
+    return ordered[max(0, math.ceil(len(ordered) * percent / 100) - 1)]
+
+
+def record_stages(samples: Dict[str, List[float]]) -> Callable[[], None]:
+    """
+    Keep every stage duration observed by the proxy. Returns the function restoring the metrics.
+    """
+    observe = metrics.observe
+
+    def record(stage: str, seconds: float, provider: str = "") -> None:
+        samples.setdefault(stage, []).append(seconds)
+        observe(stage, seconds, provider)
+
+    metrics.observe = record
+    return lambda: vars(metrics).pop("observe", None)
+
+
+async def send_turn(client: httpx.AsyncClient, messages: List[dict], user: str, stream: bool) -> Dict[str, float]:
+    payload = {"model": "chapito", "messages": messages, "user": user}
+    start_time = time.perf_counter()
+    first_token_time = None
+    content = ""
+    if stream:
+        async with client.stream("POST", "/chat/completions", json=payload) as response:
+            async for line in response.aiter_lines():
+                if not line.startswith("data: ") or line == "data: [DONE]":
+                    continue
+                delta = json.loads(line[len("data: ") :])["choices"][0]["delta"].get("content") or ""
+                if delta and first_token_time is None:
+                    first_token_time = time.perf_counter()
+                content += delta
+    else:
+        response = await client.post("/chat/completions", json=payload)
+        content = response.json()["choices"][0]["message"]["content"]
+        first_token_time = time.perf_counter()
+    end_time = time.perf_counter()
+    messages.append({"role": "assistant", "content": content})
+    if not content:
+        raise RuntimeError("Empty answer from the fake chat site")
+    return {"latency": end_time - start_time, "ttft": (first_token_time or end_time) - start_time}
+
+
+async def run_client(
+    client: httpx.AsyncClient, index: int, messages: List[dict], turns: int, stream: bool, results: List[dict]
+) -> None:
+    for _ in range(turns):
+        turn = len(messages) // 2
+        messages.append({"role": "user", "content": f"Client {index}, question {turn}: how to compute values?"})
+        results.append(await send_turn(client, messages, f"client-{index}", stream))
+
+
+async def run_benchmark(args: argparse.Namespace) -> Dict[str, List[float]]:
+    chatbot = Chatbot(args.chatbot)
+    chat_module = create_fake_chat_module(CHAT_MODULES[chatbot], args.blocks, args.code_lines, args.block_interval)
+    if args.quiet_period is not None:
+        apply_spec(chat_module.provider, {"quiet_period_seconds": args.quiet_period})
+    config = make_config(chatbot, args.concurrency, args.stream)
+    providers = ProviderRegistry({chatbot: chat_module}, config)
+    providers.start()
+    setup_proxy(providers, config)
+    turns = math.ceil(args.requests / args.concurrency)
+    samples: Dict[str, List[float]] = {}
+    server = start_server()
+    port = server.servers[0].sockets[0].getsockname()[1]
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=None) as client:
+            conversations: List[List[dict]] = [[] for _ in range(args.concurrency)]
+            # Warm up: open the tab of each conversation.
+            await asyncio.gather(
+                *(
+                    run_client(client, index, messages, 1, args.stream, [])
+                    for index, messages in enumerate(conversations)
+                )
+            )
+            restore_metrics = record_stages(samples)
+            results: List[dict] = []
+            start_time = time.perf_counter()
+            await asyncio.gather(
+                *(
+                    run_client(client, index, messages, turns, args.stream, results)
+                    for index, messages in enumerate(conversations)
+                )
+            )
+            samples["wall"] = [time.perf_counter() - start_time]
+            restore_metrics()
+    finally:
+        server.should_exit = True
+        providers.quit()
+        app.state.executor.shutdown()
+        apply_spec(chat_module.provider, {})
+    samples["http"] = [result["latency"] for result in results]
+    samples["time_to_first_token"] = [result["ttft"] for result in results]
+    samples["completion_detection"] = [
+        duration - chat_module.answer_duration for duration in samples.get("generation", [])
+    ]
+    return samples
+
+
+def report(samples: Dict[str, List[float]]) -> None:
+    requests = len(samples["http"])
+    print(f"{requests} requests in {samples['wall'][0]:.2f}s: {requests / samples['wall'][0]:.2f} requests/s")
+    for name in ["http", "time_to_first_token", *STAGES, "completion_detection"]:
+        values = samples.get(name)
+        if not values:
+            continue
+        p50, p99 = percentile(values, 50) * 1000, percentile(values, 99) * 1000
+        print(f"{name:>22}: p50 {p50:9.2f} ms, p99 {p99:9.2f} ms ({len(values)} samples)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the proxy against fake chat sites")
+    parser.add_argument(
+        "--chatbot",
+        type=str,
+        default=Chatbot.GROK.value,
+        choices=[chatbot.value for chatbot in CHAT_MODULES],
+        help="Chatbot module to drive",
+    )
+    parser.add_argument("--requests", type=int, default=20, help="Number of measured requests")
+    parser.add_argument("--concurrency", type=int, default=2, help="Number of clients (one conversation each)")
+    parser.add_argument("--stream", action="store_true", help="Stream the answers")
+    parser.add_argument("--blocks", type=int, default=DEFAULT_BLOCKS, help="Blocks of each answer")
+    parser.add_argument("--code-lines", type=int, default=DEFAULT_CODE_LINES, help="Lines of each code block")
+    parser.add_argument(
+        "--block-interval", type=float, default=DEFAULT_BLOCK_INTERVAL_SECONDS, help="Typing time of a block (s)"
+    )
+    parser.add_argument("--quiet-period", type=float, help="Override the quiet period of the chatbot (s)")
+    args = parser.parse_args()
+    report(asyncio.run(run_benchmark(args)))
+
+
+if __name__ == "__main__":
+    main()
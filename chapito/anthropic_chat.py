@@ -1,115 +1,31 @@
-import time
-import logging
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.common.by import By
-from bs4 import BeautifulSoup, Tag
 
-from chapito.config import Config
-from chapito.tools.tools import create_driver, transfer_prompt
+from chapito.base_chat import BaseChatProvider
+from chapito.types import TransferStrategy
 
-URL: str = "https://claude.ai/new"
-TIMEOUT_SECONDS: int = 120
 SUBMIT_CSS_SELECTOR: str = 'button[type="button"][aria-label="Send Message"]'
 SUBMIT_DISABLE_CSS_SELECTOR: str = 'button[disabled][type="button"][aria-label="Send Message"]'
-ANSWER_XPATH: str = '//div[contains(@class, "font-claude-message")]'
 
 
-def check_if_chat_loaded(driver) -> bool:
-    driver.implicitly_wait(5)
-    try:
-        button = driver.find_element(By.CSS_SELECTOR, SUBMIT_CSS_SELECTOR)
-    except Exception as e:
-        logging.warning("Can't find submit button in chat interface. Maybe it's not loaded yet.")
-        return False
-    return button is not None
+class AnthropicChat(BaseChatProvider):
+    name = "Anthropic"
+    url = "https://claude.ai/new"
+    transfer_strategy = TransferStrategy.CONTENT_EDITABLE
+    textarea_locator = (By.CSS_SELECTOR, "div[contenteditable='true']")
+    submit_css_selector = SUBMIT_CSS_SELECTOR
+    # Submit button is disabled once the answer is finished (and the prompt is empty).
+    done_css_selector = SUBMIT_DISABLE_CSS_SELECTOR
+    answer_locator = (By.XPATH, '//div[contains(@class, "font-claude-message")]')
+    fallback_delay_seconds = 2
 
 
-def initialize_driver(config: Config):
-    logging.info("Initializing browser for Grok...")
-    driver = create_driver(config)
-    driver.get(URL)
-
-    while not check_if_chat_loaded(driver):
-        logging.info("Waiting for chat interface to load...")
-        time.sleep(5)
-    logging.info("Browser initialized")
-    return driver
-
-
-def send_request_and_get_response(driver, message):
-    logging.debug("Send request to chatbot interface")
-    driver.implicitly_wait(10)
-    textarea = driver.find_element(By.CSS_SELECTOR, "div[contenteditable='true']")
-    transfer_prompt(message, textarea)
-    wait = WebDriverWait(driver, TIMEOUT_SECONDS)
-    wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, SUBMIT_CSS_SELECTOR)))
-    submit_button = driver.find_element(By.CSS_SELECTOR, SUBMIT_CSS_SELECTOR)
-    logging.debug("Push submit button")
-    submit_button.click()
-
-    # Wait a little time to avoid early fail.
-    time.sleep(2)
-
-    # Wait for submit button to be available. It means answer is finished.
-    wait = WebDriverWait(driver, TIMEOUT_SECONDS)
-    wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, SUBMIT_DISABLE_CSS_SELECTOR)))
-
-    message_bubbles = driver.find_elements(By.XPATH, ANSWER_XPATH)
-    if not message_bubbles:
-        logging.warning("No message found.")
-        return ""
-    last_message_bubble = message_bubbles[-1]
-    html = last_message_bubble.get_attribute("outerHTML")
-    clean_message = clean_chat_answer(html)
-    logging.debug(f"Clean message ends with: {clean_message[-100:]}")
-    return clean_message
-
-
-def clean_chat_answer(html: str) -> str:
-    """
-    Find all DIVs containing code and remove unecessary decorations."
-    """
-    logging.debug("Clean chat answer")
-    soup = BeautifulSoup(html, "html.parser")
-    no_prose_divs = soup.find_all("pre")
-    for div in no_prose_divs:
-        if isinstance(div, Tag):
-            code_tags = div.find_all("code")
-            div.clear()
-            for code in code_tags:
-                div.append(code)
-            # Block code
-            code_tags = div.find_all("code")
-            for code_tag in code_tags:
-                code_tag.insert_before("```\n")
-                code_tag.insert_after("\n```\n")
-        else:
-            code_tags = []
-
-    # Inline code
-    code_tags = soup.find_all("code")
-    for code_tag in code_tags:
-        if code_tag.parent and code_tag.parent.name == "pre":
-            # Skip block code
-            continue
-        code_tag.insert_before("`")
-        code_tag.insert_after("`")
-    return soup.get_text().strip()
-
-
-def main():
-    driver = initialize_driver(Config())
-    try:
-        while True:
-            user_request = input("Ask something (or 'quit'): ")
-            if user_request.lower() == "quit":
-                break
-            response = send_request_and_get_response(driver, user_request)
-            print("Answer:", response)
-    finally:
-        driver.quit()
+provider = AnthropicChat()
+initialize_driver = provider.initialize_driver
+open_new_chat = provider.open_new_chat
+send_request_and_get_response = provider.send_request_and_get_response
+send_request_and_stream_response = provider.send_request_and_stream_response
+clean_chat_answer = provider.clean_chat_answer
 
 
 if __name__ == "__main__":
-    main()
+    provider.main()
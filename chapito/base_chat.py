@@ -0,0 +1,219 @@
+import contextlib
+import logging
+import time
+from typing import Iterator, Optional, Tuple
+
+from selenium.common.exceptions import NoSuchElementException
+from selenium.webdriver.common.by import By
+from selenium.webdriver.remote.webelement import WebElement
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
+
+from chapito.config import Config
+from chapito.tools.completion import install_completion_observer, is_turn_finished, wait_for_completion
+from chapito.tools.extraction import extract_last_answer
+from chapito.tools.markdown import DEFAULT_CODE_BLOCK_SELECTOR, DEFAULT_SKIP_SELECTOR, html_to_markdown
+from chapito.tools.metrics import metrics
+from chapito.tools.streaming import stream_answer
+from chapito.tools.tracing import span, traced_sleep
+from chapito.tools.tools import CHAT_LOAD_RETRY_SECONDS, create_driver, transfer_prompt
+from chapito.types import TransferStrategy
+
+# Implicit wait used to find the elements of the chat interface.
+CHAT_LOAD_WAIT_SECONDS: int = 5
+ELEMENT_WAIT_SECONDS: int = 10
+
+
+class BaseChatProvider:
+    """
+    Drives the web interface of a chatbot.
+    Chatbots declare their page (URL, selectors and waits) as class attributes,
+    and override methods only for behaviors specific to their interface.
+    """
+
+    name: str = ""
+    url: str = ""
+    timeout_seconds: int = 120
+    # The answer is finished when the page doesn't change during this period.
+    quiet_period_seconds: float = 1
+    transfer_strategy: TransferStrategy = TransferStrategy.VALUE
+    textarea_locator: Tuple[str, str] = (By.TAG_NAME, "textarea")
+    # Index of the prompt field and of the submit button when the page has several of them.
+    textarea_index: int = 0
+    submit_index: int = 0
+    submit_css_selector: str = ""
+    # Wait for the submit button to be enabled, once the prompt is taken into account.
+    wait_for_submit_enabled: bool = False
+    # Element displayed once the chat interface is loaded. Default: the submit button.
+    loaded_css_selector: str = ""
+    # Element displayed once the answer is finished. Default: the submit button.
+    done_css_selector: str = ""
+    answer_locator: Tuple[str, str] = (By.CSS_SELECTOR, "")
+    # Fixed waits, only used when the completion observer is lost.
+    fallback_delay_seconds: float = 1
+    settle_delay_seconds: float = 0
+    # Answer elements converted to fenced code blocks, and elements dropped from answers (comma-separated).
+    code_block_selector: str = DEFAULT_CODE_BLOCK_SELECTOR
+    skip_selector: str = DEFAULT_SKIP_SELECTOR
+
+    def get_loaded_css_selector(self) -> str:
+        return self.loaded_css_selector or self.submit_css_selector
+
+    def get_done_css_selector(self) -> str:
+        return self.done_css_selector or self.submit_css_selector
+
+    def is_blocked(self, driver) -> bool:
+        """
+        The chat interface is loaded but can't be used yet (eg. captcha).
+        """
+        return False
+
+    def check_if_chat_loaded(self, driver) -> bool:
+        driver.implicitly_wait(CHAT_LOAD_WAIT_SECONDS)
+        try:
+            driver.find_element(By.CSS_SELECTOR, self.get_loaded_css_selector())
+        except Exception as e:
+            logging.warning("Can't find submit button in chat interface. Maybe it's not loaded yet.")
+            return False
+        return not self.is_blocked(driver)
+
+    def open_new_chat(self, driver) -> None:
+        driver.get(self.url)
+
+        while not self.check_if_chat_loaded(driver):
+            logging.info("Waiting for chat interface to load...")
+            time.sleep(CHAT_LOAD_RETRY_SECONDS)
+
+    def initialize_driver(self, config: Config):
+        logging.info(f"Initializing browser for {self.name}...")
+        driver = create_driver(config)
+        self.open_new_chat(driver)
+        logging.info("Browser initialized")
+        return driver
+
+    def find_textarea(self, driver) -> WebElement:
+        textareas = driver.find_elements(*self.textarea_locator)
+        if not textareas:
+            raise NoSuchElementException(f"Prompt field not found: {self.textarea_locator}")
+        return textareas[self.textarea_index]
+
+    def find_submit_button(self, driver) -> WebElement:
+        return driver.find_elements(By.CSS_SELECTOR, self.submit_css_selector)[self.submit_index]
+
+    def is_submit_enabled(self, submit_button: WebElement) -> bool:
+        return submit_button.is_enabled()
+
+    def submit_prompt(self, driver, message: str) -> None:
+        logging.debug("Send request to chatbot interface")
+        driver.implicitly_wait(ELEMENT_WAIT_SECONDS)
+        textarea = self.find_textarea(driver)
+        with metrics.timer("transfer"):
+            transfer_prompt(message, textarea, self.transfer_strategy)
+        with metrics.timer("submit"):
+            wait = WebDriverWait(driver, self.timeout_seconds)
+            with span("WebDriverWait.until", "wait", condition="submit button present"):
+                wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, self.submit_css_selector)))
+            if self.wait_for_submit_enabled:
+                with span("WebDriverWait.until", "wait", condition="submit button enabled"):
+                    wait.until(lambda driver: self.is_submit_enabled(self.find_submit_button(driver)))
+            submit_button = self.find_submit_button(driver)
+            install_completion_observer(driver, self.answer_locator)
+            logging.debug("Push submit button")
+            submit_button.click()
+
+    def is_answer_finished(self, driver) -> bool:
+        return is_turn_finished(driver, self.get_done_css_selector(), self.quiet_period_seconds)
+
+    def wait_for_answer(self, driver) -> None:
+        done_css_selector = self.get_done_css_selector()
+        if wait_for_completion(driver, done_css_selector, self.quiet_period_seconds, self.timeout_seconds):
+            return
+        # Wait a little time to avoid early fail.
+        traced_sleep(self.fallback_delay_seconds)
+
+        # Wait for the "done" element to be available. It means answer is finished.
+        wait = WebDriverWait(driver, self.timeout_seconds)
+        with span("WebDriverWait.until", "wait", condition="done element present"):
+            wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, done_css_selector)))
+        traced_sleep(self.settle_delay_seconds)
+
+    def after_answer(self, driver) -> None:
+        """
+        Interactions needed once the answer is finished, before reading it.
+        """
+
+    def clean_chat_answer(self, html: str) -> str:
+        logging.debug("Clean chat answer")
+        return html_to_markdown(html, self.code_block_selector, self.skip_selector)
+
+    def read_bubble_content(self, bubble: WebElement) -> str:
+        """
+        Content of an answer element, given to `clean_chat_answer`.
+        """
+        return bubble.get_attribute("outerHTML")
+
+    def count_answers(self, driver) -> int:
+        extracted = extract_last_answer(
+            driver, self.answer_locator, self.code_block_selector, self.skip_selector, known_count=None
+        )
+        if extracted is not None:
+            return extracted[0]
+        return len(driver.find_elements(*self.answer_locator))
+
+    def read_new_answer(self, driver, known_count: int, final: bool = True) -> Optional[str]:
+        """
+        Markdown of the last answer, or None when the page has no more than `known_count` answers.
+        The answer is converted in the page, within the "extraction" stage; WebDriver commands and
+        the "cleaning" stage are only used when it can't be.
+        Stages are only recorded for the `final` read, not for the reads polled while the answer streams.
+        """
+        with metrics.timer("extraction") if final else contextlib.nullcontext():
+            extracted = extract_last_answer(
+                driver, self.answer_locator, self.code_block_selector, self.skip_selector, known_count
+            )
+            if extracted is not None:
+                return extracted[1]
+            message_bubbles = driver.find_elements(*self.answer_locator)[known_count:]
+            if not message_bubbles:
+                return None
+            content = self.read_bubble_content(message_bubbles[-1])
+        with metrics.timer("cleaning") if final else contextlib.nullcontext():
+            return self.clean_chat_answer(content)
+
+    def read_answer(self, driver) -> str:
+        answer = self.read_new_answer(driver, 0)
+        if answer is None:
+            logging.warning("No message found.")
+            return ""
+        return answer
+
+    def send_request_and_get_response(self, driver, message: str) -> str:
+        self.submit_prompt(driver, message)
+        with metrics.timer("generation"):
+            self.wait_for_answer(driver)
+        self.after_answer(driver)
+        clean_message = self.read_answer(driver)
+        logging.debug(f"Clean message ends with: {clean_message[-100:]}")
+        return clean_message
+
+    def send_request_and_stream_response(self, driver, message: str) -> Iterator[str]:
+        yield from stream_answer(
+            driver,
+            lambda: self.submit_prompt(driver, message),
+            lambda: self.count_answers(driver),
+            lambda known_count, final: self.read_new_answer(driver, known_count, final),
+            lambda: self.is_answer_finished(driver),
+            self.timeout_seconds,
+        )
+
+    def main(self) -> None:
+        driver = self.initialize_driver(Config())
+        try:
+            while True:
+                user_request = input("Ask something (or 'quit'): ")
+                if user_request.lower() == "quit":
+                    break
+                response = self.send_request_and_get_response(driver, user_request)
+                print("Answer:", response)
+        finally:
+            driver.quit()
@@ -5,6 +5,7 @@ import logging
 import os.path
 from shutil import copy
 import sys
+from typing import List
 
 from chapito.tools.log import setup_logging_verbosity
 from chapito.types import Chatbot
@@ -13,6 +14,7 @@ SAMPLE_CONFIG_FILE: str = "config.ini.sample"
 DEFAULT_CONFIG_PATH: str = "config.ini"
 DEFAULT_USE_BROWSER_PROFILE: bool = True
 DEFAULT_BROWSER_PROFILE_PATH: str = "browser_profile"
+DEFAULT_BROWSER_PROFILE_TEMPLATE: str = ""
 DEFAULT_BROWSER_USER_AGENT: str = (
     "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36"
 )
@@ -22,6 +24,33 @@ DEFAULT_STREAM: bool = False
 
 DEFAULT_HOST = "127.0.0.1"
 DEFAULT_PORT = 5001
+DEFAULT_QUEUE_SIZE: int = 8
+DEFAULT_POOL_SIZE: int = 1
+DEFAULT_MAX_TABS: int = 4
+DEFAULT_TABS_PER_WORKER: int = 1
+DEFAULT_CACHE: bool = False
+DEFAULT_CACHE_TTL: int = 3600
+DEFAULT_CACHE_MAX_BYTES: int = 16 * 1024 * 1024
+DEFAULT_CACHE_PATH: str = ""
+DEFAULT_IDLE_TIMEOUT: int = 900
+DEFAULT_AUTO_CHATBOTS: str = ""
+DEFAULT_PROVIDER_SPECS: str = ""
+DEFAULT_ROTATION_TURNS: int = 0
+DEFAULT_ROTATION_DOM_NODES: int = 0
+DEFAULT_ROTATION_LATENCY: int = 0
+DEFAULT_TRACE_FILE: str = ""
+DEFAULT_TOKENIZER: str = "o200k_base"
+DEFAULT_PROMPT_BUDGET: int = 0
+
+
+def parse_chatbots(names: str) -> List[Chatbot]:
+    chatbots = []
+    for name in filter(None, (name.strip() for name in names.split(","))):
+        try:
+            chatbots.append(Chatbot(name))
+        except ValueError:
+            logging.error(f"Invalid chatbot specified: {name}")
+    return chatbots
 
 
 def create_config_file() -> None:
@@ -32,12 +61,30 @@ class Config:
     config_path: str = DEFAULT_CONFIG_PATH
     use_browser_profile: bool = DEFAULT_USE_BROWSER_PROFILE
     browser_profile_path: str = DEFAULT_BROWSER_PROFILE_PATH
+    browser_profile_template: str = DEFAULT_BROWSER_PROFILE_TEMPLATE
     browser_user_agent: str = DEFAULT_BROWSER_USER_AGENT
     verbosity: int = DEFAULT_VERBOSITY
     chatbot: Chatbot = DEFAULT_CHATBOT
     stream: bool = DEFAULT_STREAM
     host: str = DEFAULT_HOST
     port: int = DEFAULT_PORT
+    queue_size: int = DEFAULT_QUEUE_SIZE
+    pool_size: int = DEFAULT_POOL_SIZE
+    max_tabs: int = DEFAULT_MAX_TABS
+    tabs_per_worker: int = DEFAULT_TABS_PER_WORKER
+    cache: bool = DEFAULT_CACHE
+    cache_ttl: int = DEFAULT_CACHE_TTL
+    cache_max_bytes: int = DEFAULT_CACHE_MAX_BYTES
+    cache_path: str = DEFAULT_CACHE_PATH
+    idle_timeout: int = DEFAULT_IDLE_TIMEOUT
+    auto_chatbots: List[Chatbot] = []
+    provider_specs: str = DEFAULT_PROVIDER_SPECS
+    rotation_turns: int = DEFAULT_ROTATION_TURNS
+    rotation_dom_nodes: int = DEFAULT_ROTATION_DOM_NODES
+    rotation_latency: int = DEFAULT_ROTATION_LATENCY
+    trace_file: str = DEFAULT_TRACE_FILE
+    tokenizer: str = DEFAULT_TOKENIZER
+    prompt_budget: int = DEFAULT_PROMPT_BUDGET
 
     def __init__(self):
         logging.debug("Initializing config...")
@@ -52,10 +99,28 @@ class Config:
         parser.add_argument("--no-stream", action="store_true", help="Don't send response as stream")
         parser.add_argument("--use-browser-profile", action="store_true", help="Use a browser profile")
         parser.add_argument("--profile-path", type=str, help="Path to the browser profile")
+        parser.add_argument("--profile-template", type=str, help="Profile copied to create missing browser profiles")
         parser.add_argument("--user-agent", type=str, help="User agent to use")
         parser.add_argument("--verbosity", type=int, help="Verbosity level")
         parser.add_argument("--host", type=str, help="Host/IP to bind to")
         parser.add_argument("--port", type=int, help="Port to listen on")
+        parser.add_argument("--queue-size", type=int, help="Maximum number of pending requests")
+        parser.add_argument("--workers", type=int, help="Number of browsers serving requests in parallel")
+        parser.add_argument("--max-tabs", type=int, help="Maximum number of conversations (tabs) per browser")
+        parser.add_argument("--tabs", type=int, help="Number of requests served at the same time per browser")
+        parser.add_argument("--cache", action="store_true", help="Answer identical requests from a cache")
+        parser.add_argument("--cache-ttl", type=int, help="Lifetime of cached answers, in seconds")
+        parser.add_argument("--cache-max-bytes", type=int, help="Maximum size of the cache, in bytes")
+        parser.add_argument("--cache-path", type=str, help="SQLite file storing the cache across restarts")
+        parser.add_argument("--idle-timeout", type=int, help="Seconds before an unused chatbot is shut down")
+        parser.add_argument("--auto-chatbots", type=str, help="Comma-separated chatbots used by the `auto` model")
+        parser.add_argument("--provider-specs", type=str, help="TOML file overriding chatbot selectors and timings")
+        parser.add_argument("--rotation-turns", type=int, help="Turns before a conversation moves to a new chat")
+        parser.add_argument("--rotation-dom-nodes", type=int, help="Page elements before moving to a new chat")
+        parser.add_argument("--rotation-latency", type=int, help="Answer duration (s) before moving to a new chat")
+        parser.add_argument("--trace-file", type=str, help="File receiving the traces of requests (Chrome format)")
+        parser.add_argument("--tokenizer", type=str, help="tiktoken encoding counting tokens, or `heuristic`")
+        parser.add_argument("--prompt-budget", type=int, help="Tokens of a whole history sent to a new chat")
         args = parser.parse_args()
         self.config_path = args.config or DEFAULT_CONFIG_PATH
         config = configparser.ConfigParser()
@@ -76,6 +141,9 @@ class Config:
         self.browser_profile_path = args.profile_path or config.get(
             "DEFAULT", "browser_profile_path", fallback=DEFAULT_BROWSER_PROFILE_PATH
         )
+        self.browser_profile_template = args.profile_template or config.get(
+            "DEFAULT", "browser_profile_template", fallback=DEFAULT_BROWSER_PROFILE_TEMPLATE
+        )
         self.browser_user_agent = args.user_agent or config.get(
             "DEFAULT", "browser_user_agent", fallback=DEFAULT_BROWSER_USER_AGENT
         )
@@ -90,5 +158,50 @@ class Config:
 
         self.host = args.host or config.get("DEFAULT", "host", fallback=DEFAULT_HOST)
         self.port = args.port or config.getint("DEFAULT", "port", fallback=DEFAULT_PORT)
+        self.queue_size = args.queue_size or config.getint("DEFAULT", "queue_size", fallback=DEFAULT_QUEUE_SIZE)
+        self.pool_size = args.workers or config.getint("DEFAULT", "pool_size", fallback=DEFAULT_POOL_SIZE)
+        self.max_tabs = args.max_tabs or config.getint("DEFAULT", "max_tabs", fallback=DEFAULT_MAX_TABS)
+        self.tabs_per_worker = args.tabs or config.getint(
+            "DEFAULT", "tabs_per_worker", fallback=DEFAULT_TABS_PER_WORKER
+        )
+        self.cache = args.cache or config.getboolean("DEFAULT", "cache", fallback=DEFAULT_CACHE)
+        self.cache_ttl = args.cache_ttl or config.getint("DEFAULT", "cache_ttl", fallback=DEFAULT_CACHE_TTL)
+        self.cache_max_bytes = args.cache_max_bytes or config.getint(
+            "DEFAULT", "cache_max_bytes", fallback=DEFAULT_CACHE_MAX_BYTES
+        )
+        self.cache_path = args.cache_path or config.get("DEFAULT", "cache_path", fallback=DEFAULT_CACHE_PATH)
+        self.idle_timeout = (
+            args.idle_timeout
+            if args.idle_timeout is not None
+            else config.getint("DEFAULT", "idle_timeout", fallback=DEFAULT_IDLE_TIMEOUT)
+        )
+        self.auto_chatbots = parse_chatbots(
+            args.auto_chatbots or config.get("DEFAULT", "auto_chatbots", fallback=DEFAULT_AUTO_CHATBOTS)
+        )
+        self.provider_specs = args.provider_specs or config.get(
+            "DEFAULT", "provider_specs", fallback=DEFAULT_PROVIDER_SPECS
+        )
+        self.rotation_turns = (
+            args.rotation_turns
+            if args.rotation_turns is not None
+            else config.getint("DEFAULT", "rotation_turns", fallback=DEFAULT_ROTATION_TURNS)
+        )
+        self.rotation_dom_nodes = (
+            args.rotation_dom_nodes
+            if args.rotation_dom_nodes is not None
+            else config.getint("DEFAULT", "rotation_dom_nodes", fallback=DEFAULT_ROTATION_DOM_NODES)
+        )
+        self.rotation_latency = (
+            args.rotation_latency
+            if args.rotation_latency is not None
+            else config.getint("DEFAULT", "rotation_latency", fallback=DEFAULT_ROTATION_LATENCY)
+        )
+        self.trace_file = args.trace_file or config.get("DEFAULT", "trace_file", fallback=DEFAULT_TRACE_FILE)
+        self.tokenizer = args.tokenizer or config.get("DEFAULT", "tokenizer", fallback=DEFAULT_TOKENIZER)
+        self.prompt_budget = (
+            args.prompt_budget
+            if args.prompt_budget is not None
+            else config.getint("DEFAULT", "prompt_budget", fallback=DEFAULT_PROMPT_BUDGET)
+        )
 
         logging.debug(f"Config initialized: {self.__dict__}")
@@ -1,7 +1,10 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import contextvars
 import json
-from typing import Callable, List, Optional
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
 from fastapi import FastAPI, HTTPException, Request
-from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 
 import time
 import uuid
@@ -9,13 +12,70 @@ from pydantic import BaseModel, field_validator
 import uvicorn
 import logging
 
+from selenium.common.exceptions import TimeoutException
+
 from chapito.config import Config
+from chapito.tools.cache import ResponseCache, get_cache_key
+from chapito.tools.compaction import compact_messages
+from chapito.tools.history import MessageIndex, get_conversation_fingerprint
+from chapito.tools.metrics import CACHE_HITS_COUNTER, EMPTY_ANSWERS_COUNTER, TIMEOUTS_COUNTER, metrics
+from chapito.tools.providers import AUTO_MODEL, ProviderRegistry
+from chapito.tools.tokens import TokenCounter
+from chapito.tools.tracing import Trace, TraceWriter, create_trace_id, current_trace
+from chapito.types import Chatbot
+
+
+def get_usage(prompt_tokens: int, response_content: str) -> dict:
+    completion_tokens = app.state.token_counter.count(response_content)
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+        "cost": 0,
+    }
 
 
-async def generate_json_stream(data: dict):
-    data["choices"][0]["delta"] = data["choices"][0]["message"]
-    del data["choices"][0]["message"]
-    yield f"data: {json.dumps(data)}\n\n"
+def create_completion(model: str, prompt_tokens: int, response_content: str) -> dict:
+    return {
+        "id": f"chatcmpl-{uuid.uuid4()}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [
+            {
+                "index": 0,
+                "message": {"role": "assistant", "content": response_content, "refusal": None},
+                "finish_reason": "stop",
+                # "logprobs": {"content": [], "refusal": []},
+            }
+        ],
+        "usage": get_usage(prompt_tokens, response_content),
+    }
+
+
+async def generate_json_stream(model: str, prompt_tokens: int, deltas: AsyncIterator[str]):
+    completion_id = f"chatcmpl-{uuid.uuid4()}"
+    created = int(time.time())
+
+    def create_chunk(delta: dict, finish_reason: Optional[str] = None, usage: Optional[dict] = None) -> str:
+        data = {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": created,
+            "model": model,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+        }
+        if usage:
+            data["usage"] = usage
+        return f"data: {json.dumps(data)}\n\n"
+
+    yield create_chunk({"role": "assistant", "content": ""})
+    response_content = ""
+    async for text in deltas:
+        response_content += text
+        yield create_chunk({"content": text})
+    logging.debug(f"Response from chat ends with: {response_content[-100:]}")
+    yield create_chunk({}, "stop", get_usage(prompt_tokens, response_content))
     yield "data: [DONE]\n\n"
 
 
@@ -39,42 +99,268 @@ class ChatRequest(BaseModel):
     top_p: Optional[float] = None
     frequency_penalty: Optional[float] = None
     presence_penalty: Optional[float] = None
+    user: Optional[str] = None
+
+
+class Flight:
+    """
+    A browser call shared by identical concurrent requests.
+    Chunks are kept so requests joining late still get the whole answer.
+    """
+
+    def __init__(self, trace_id: str):
+        self.trace_id = trace_id
+        self.chunks: List[str] = []
+        self.done = False
+        self.error: Optional[Exception] = None
+        self.changed = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+
+    def _notify(self) -> None:
+        self.changed.set()
+        self.changed = asyncio.Event()
+
+    async def run(self, deltas: AsyncIterator[str]) -> None:
+        try:
+            async for chunk in deltas:
+                self.chunks.append(chunk)
+                self._notify()
+        except Exception as e:
+            self.error = e
+        finally:
+            self.done = True
+            self._notify()
+
+    async def subscribe(self) -> AsyncIterator[str]:
+        position = 0
+        while True:
+            changed = self.changed
+            while position < len(self.chunks):
+                yield self.chunks[position]
+                position += 1
+            if self.done:
+                if self.error is not None:
+                    raise self.error
+                return
+            await changed.wait()
 
 
 app = FastAPI()
+app.state.pending_requests = 0
+app.state.average_duration = 0.0
+
+# Messages already known by the chatbot.
+message_index = MessageIndex()
+
+# Browser calls in progress, by request key.
+in_flight: Dict[str, Flight] = {}
+
+# Header telling whether the answer comes from the cache.
+CACHE_HEADER: str = "X-Chapito-Cache"
+# Header giving the ID of the trace of the request (of the shared browser call for identical requests).
+TRACE_HEADER: str = "X-Chapito-Trace-Id"
 
-last_chat_messages: List[str] = []
+# Weight of the latest request when updating the average request duration.
+DURATION_SMOOTHING: float = 0.2
 
 
-def find_index_from_end(lst: List[Message], values: List[str]) -> int:
+def find_index_from_end(lst: List[Message], scope: str) -> int:
     for i in range(len(lst) - 1, -1, -1):
-        message = lst[i]
-        if message.content.strip() in values:
+        if message_index.contains(scope, lst[i].content):
             return i
     return -1
 
 
+def get_conversation_scope(request: ChatRequest, http_request: Request, chatbot: Chatbot) -> str:
+    """
+    Identify the conversation from the chatbot, the client and the first messages, up to the first user message.
+    Each conversation has its own chat session in the browser.
+    """
+    if request.user:
+        client = f"user:{request.user}"
+    else:
+        client = f"client:{http_request.client.host if http_request.client else 'unknown'}"
+    first_user_message_position = next(
+        (position for position, message in enumerate(request.messages) if message.role == "user"), 0
+    )
+    first_messages = [
+        f"[{message.role}] {message.content}" for message in request.messages[: first_user_message_position + 1]
+    ]
+    return f"{chatbot.value}:{client}:{get_conversation_fingerprint(first_messages)}"
+
+
+def format_message(message: Message) -> str:
+    return f"[{message.role}] {message.content}"
+
+
+def format_messages(messages: List[Message]) -> str:
+    return "\n\n".join(map(format_message, messages))
+
+
+def format_history(messages: List[Message]) -> str:
+    """
+    The whole conversation, for a chat that doesn't know it, compacted to the prompt budget.
+    """
+    budget = app.state.config.prompt_budget
+    if budget <= 0:
+        return format_messages(messages)
+    compacted = compact_messages(
+        [(message.role, message.content) for message in messages], budget, app.state.token_counter.count
+    )
+    prompt = format_messages([Message(role=role, content=content) for role, content in compacted])
+    history_length = sum(len(message.content) for message in messages)
+    logging.debug(f"History of {history_length} characters compacted to {len(prompt)} characters")
+    return prompt
+
+
+def count_prompt_tokens(messages: List[Message]) -> int:
+    """
+    Tokens of the whole conversation, as the context of the answer. Counts of known messages are memoized.
+    """
+    return app.state.token_counter.count_all(map(format_message, messages))
+
+
+async def remember_response(scope: str, response_content: str, request_key: str) -> None:
+    if response_content:
+        message_index.add(scope, response_content)
+        cache = app.state.cache
+        if cache is not None:
+            cache.put_in_memory(request_key, response_content)
+            if cache.is_persistent:
+                # SQLite writes wait for the disk: kept off the event loop.
+                await asyncio.to_thread(cache.put_in_database, request_key, response_content)
+
+
+async def replay(content: str) -> AsyncIterator[str]:
+    yield content
+
+
+async def wait_for_answer(answer: Awaitable[str]) -> AsyncIterator[str]:
+    yield await answer
+
+
+def estimate_retry_after() -> int:
+    """
+    Estimate, in seconds, when a slot will be available in the request queue.
+    """
+    average_duration = app.state.average_duration or 1.0
+    return max(1, int(average_duration * app.state.pending_requests / app.state.providers.capacity))
+
+
+def reserve_browser_slot() -> float:
+    if app.state.pending_requests >= app.state.config.queue_size:
+        retry_after = estimate_retry_after()
+        logging.warning(f"Request queue is full, client should retry after {retry_after}s")
+        raise HTTPException(
+            status_code=429, detail="Too many pending requests", headers={"Retry-After": str(retry_after)}
+        )
+    app.state.pending_requests += 1
+    return time.monotonic()
+
+
+def release_browser_slot(start_time: float) -> None:
+    app.state.pending_requests -= 1
+    duration = time.monotonic() - start_time
+    app.state.average_duration += DURATION_SMOOTHING * (duration - app.state.average_duration)
+
+
+def run_in_browser(func: Callable, *args) -> asyncio.Future:
+    """
+    Run a blocking browser call on the dedicated executor so the event loop stays responsive.
+    The browser call starts immediately so the queue slot is always released.
+    """
+    start_time = reserve_browser_slot()
+    # The browser thread records its spans in the trace of the request.
+    context = contextvars.copy_context()
+    future = asyncio.get_running_loop().run_in_executor(app.state.executor, context.run, func, *args)
+    future.add_done_callback(lambda _: release_browser_slot(start_time))
+    return future
+
+
+def stream_in_browser(func: Callable, *args) -> AsyncIterator[str]:
+    """
+    Iterate a blocking browser generator on the dedicated executor and forward its items to the event loop.
+    The browser call starts immediately so the queue slot is always released.
+    """
+    start_time = reserve_browser_slot()
+    loop = asyncio.get_running_loop()
+    chunks: asyncio.Queue[Optional[str]] = asyncio.Queue()
+
+    def produce() -> None:
+        try:
+            for chunk in func(*args):
+                loop.call_soon_threadsafe(chunks.put_nowait, chunk)
+        finally:
+            loop.call_soon_threadsafe(chunks.put_nowait, None)
+
+    future = loop.run_in_executor(app.state.executor, contextvars.copy_context().run, produce)
+    future.add_done_callback(lambda _: release_browser_slot(start_time))
+
+    async def read_chunks() -> AsyncIterator[str]:
+        while (chunk := await chunks.get()) is not None:
+            yield chunk
+        # Raise errors from the browser, if any.
+        await future
+
+    return read_chunks()
+
+
+def finish_trace(trace: Optional[Trace], **args) -> None:
+    if trace is not None and app.state.trace_writer is not None:
+        app.state.trace_writer.write(trace.finish("chat_completions", **args))
+
+
 @app.exception_handler(404)
 async def not_found_handler(request: Request, exc: HTTPException):
     return JSONResponse(status_code=404, content={"message": "Undefined route", "requested_url": request.url.path})
 
 @app.get("/models")
-async def get_models(): 
+async def get_models():
+    """
+    `chapito` is the default chatbot, `auto` the least busy chatbot.
+    The other models are the chatbots currently running.
+    """
+    names = ["chapito", AUTO_MODEL] + [chatbot.value for chatbot in app.state.providers.live_chatbots()]
     return [
         {
-            "name": "chapito",
+            "name": name,
             "type": "chat",
             "censored": True,
-            "description": "Chapito",
+            "description": "Chapito" if name == "chapito" else f"Chapito - {name}",
             "baseModel": True
         }
+        for name in names
     ]
 
-@app.post("/chat/completions")
-async def chat_completions(request: ChatRequest):
-    global last_chat_messages
+@app.get("/health/ready")
+async def get_readiness():
+    """
+    The server answers as soon as it starts, requests wait until the default chatbot is ready.
+    """
+    if app.state.providers.is_ready():
+        return {"status": "ready"}
+    return JSONResponse(status_code=503, content={"status": "starting"})
+
+
+@app.delete("/admin/cache")
+async def purge_cache():
+    purged = await asyncio.to_thread(app.state.cache.purge) if app.state.cache is not None else 0
+    logging.info(f"{purged} cached answers purged")
+    return {"purged": purged}
+
 
-    logging.debug(f"Request received: {request}")
+@app.get("/metrics")
+async def get_metrics():
+    """
+    Stage durations and counters, in the Prometheus text format.
+    """
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.post("/chat/completions")
+async def chat_completions(request: ChatRequest, http_request: Request):
+    trace_id = create_trace_id()
+    logging.debug(f"Request {trace_id} received: {request}")
 
     if not request.messages:
         raise HTTPException(status_code=400, detail="Field 'messages' is missing or empty")
@@ -83,53 +369,154 @@ async def chat_completions(request: ChatRequest):
     if len(request.messages) > 0:
         logging.debug(f"Last relevant message in request: {request.messages[last_revelant_message_position]}")
 
-    index_of_last_message = find_index_from_end(request.messages, last_chat_messages)
-    prompt = "\n\n".join(
-        f"[{message.role}] {message.content}" for message in request.messages[index_of_last_message + 1 :]
-    )
-    last_chat_messages.append(request.messages[-1].content.strip())
-    if not prompt:
+    # Keyed on the whole conversation: a retried request is identical, whatever the chatbot already knows.
+    full_prompt = format_messages(request.messages)
+    request_key = get_cache_key(request.model, full_prompt)
+    trace = Trace(trace_id) if app.state.trace_writer is not None else None
+    current_trace.set(trace)
+    headers = {TRACE_HEADER: trace_id}
+    prompt_tokens = count_prompt_tokens(request.messages)
+    cache = app.state.cache
+    if cache is not None:
+        cached_content = cache.get_from_memory(request_key)
+        if cached_content is None and cache.is_persistent:
+            # SQLite reads wait for the disk: kept off the event loop.
+            cached_content = await asyncio.to_thread(cache.get_from_database, request_key)
+        if cached_content is not None:
+            logging.debug("Answer found in cache")
+            metrics.increment(CACHE_HITS_COUNTER)
+            finish_trace(trace, model=request.model, cache="HIT")
+            headers[CACHE_HEADER] = "HIT"
+            return await create_response(request.model, prompt_tokens, replay(cached_content), headers)
+        headers[CACHE_HEADER] = "MISS"
+
+    flight = in_flight.get(request_key)
+    if flight is None:
+        flight = start_flight(request, http_request, request_key, trace_id)
+        flight.task.add_done_callback(lambda _: finish_trace(trace, model=request.model))
+    else:
+        logging.debug(f"Identical request in progress, sharing its answer (trace {flight.trace_id})")
+        headers[TRACE_HEADER] = flight.trace_id
+    return await create_response(request.model, prompt_tokens, flight.subscribe(), headers)
+
+
+def start_flight(request: ChatRequest, http_request: Request, request_key: str, trace_id: str) -> Flight:
+    """
+    Send the new messages to the chatbot. Identical requests received meanwhile share the answer.
+    """
+    chatbots = app.state.providers.get_candidates(request.model)
+    if len(chatbots) > 1:
+        # A conversation stays on the chatbot holding its context.
+        chatbots.sort(
+            key=lambda chatbot: find_index_from_end(
+                request.messages, get_conversation_scope(request, http_request, chatbot)
+            ) < 0
+        )
+    attempt = send_prompt(request, http_request, chatbots[0])
+    flight = Flight(trace_id)
+    answer = forward_answer(request, http_request, request_key, chatbots, attempt)
+    flight.task = asyncio.create_task(flight.run(answer))
+    in_flight[request_key] = flight
+    flight.task.add_done_callback(lambda _: in_flight.pop(request_key, None))
+    return flight
+
+
+def send_prompt(
+    request: ChatRequest, http_request: Request, chatbot: Chatbot
+) -> Tuple[str, str, AsyncIterator[str]]:
+    """
+    Start sending the messages unknown to the chatbot. Returns the conversation scope, the prompt and the answer.
+    """
+    scope = get_conversation_scope(request, http_request, chatbot)
+    index_of_last_message = find_index_from_end(request.messages, scope)
+    new_chat = index_of_last_message >= 0 and app.state.providers.needs_rotation(chatbot, scope)
+    prompt = format_messages(request.messages[index_of_last_message + 1 :])
+    if new_chat:
+        # The new chat gets the whole conversation, so it knows all the messages.
+        prompt = format_history(request.messages)
+        message_index.reset(scope)
+        for message in request.messages[:-1]:
+            message_index.add(scope, message.content)
+    elif not prompt:
         logging.debug("Can't determine latest messages, sending the whole chat session")
-        prompt = "\n\n".join(f"[{message.role}] {message.content}" for message in request.messages)
+        prompt = format_history(request.messages)
 
-    response_content = app.state.send_request_and_get_response(app.state.driver, prompt)
-    if response_content:
-        last_chat_messages.append(response_content)
-    logging.debug(f"Response from chat ends with: {response_content[-100:]}")
-    logging.debug("Sending response")
+    if app.state.config.stream:
+        deltas = stream_in_browser(app.state.providers.stream, chatbot, scope, prompt, new_chat)
+    else:
+        deltas = wait_for_answer(run_in_browser(app.state.providers.run, chatbot, scope, prompt, new_chat))
+    message_index.add(scope, request.messages[-1].content)
+    return scope, prompt, deltas
 
-    data = {
-        "id": f"chatcmpl-{uuid.uuid4()}",
-        "object": "chat.completion",
-        "created": int(time.time()),
-        "model": request.model,
-        "choices": [
-            {
-                "index": 0,
-                "message": {"role": "assistant", "content": response_content, "refusal": None},
-                "finish_reason": "stop",
-                # "logprobs": {"content": [], "refusal": []},
-            }
-        ],
-        "usage": {
-            "prompt_tokens": len(prompt.split()),
-            "completion_tokens": len(response_content.split()),
-            "total_tokens": len(prompt.split()) + len(response_content.split()),
-            "cost": 0,
-        },
-    }
+
+async def forward_answer(
+    request: ChatRequest,
+    http_request: Request,
+    request_key: str,
+    chatbots: List[Chatbot],
+    attempt: Tuple[str, str, AsyncIterator[str]],
+) -> AsyncIterator[str]:
+    """
+    Forward the answer of the first chatbot. When it times out or gives an empty answer,
+    the next chatbot is tried, as long as nothing was forwarded.
+    """
+    for position, chatbot in enumerate(chatbots):
+        if position > 0:
+            logging.warning(f"Trying chatbot {chatbot.value} instead")
+            attempt = send_prompt(request, http_request, chatbot)
+        scope, _, deltas = attempt
+        is_last_attempt = position == len(chatbots) - 1
+        response_content = ""
+        try:
+            async for chunk in deltas:
+                response_content += chunk
+                yield chunk
+        except TimeoutException:
+            metrics.increment(TIMEOUTS_COUNTER, chatbot.value)
+            if response_content or is_last_attempt:
+                raise
+            logging.warning(f"Chatbot {chatbot.value} timed out")
+            continue
+        if not response_content:
+            metrics.increment(EMPTY_ANSWERS_COUNTER, chatbot.value)
+        if response_content or is_last_attempt:
+            await remember_response(scope, response_content, request_key)
+            return
+        logging.warning(f"Chatbot {chatbot.value} gave an empty answer")
+
+
+async def create_response(model: str, prompt_tokens: int, deltas: AsyncIterator[str], headers: Dict[str, str]):
     if app.state.config.stream:
         logging.debug("Send StreamingResponse")
-        return StreamingResponse(generate_json_stream(data), media_type="text/event-stream")
-    else:
-        logging.debug("Send JSONResponse")
-        return JSONResponse(data)
+        stream = generate_json_stream(model, prompt_tokens, deltas)
+        return StreamingResponse(stream, media_type="text/event-stream", headers=headers)
+
+    response_content = "".join([chunk async for chunk in deltas])
+    logging.debug(f"Response from chat ends with: {response_content[-100:]}")
+    logging.debug("Send JSONResponse")
+    return JSONResponse(create_completion(model, prompt_tokens, response_content), headers=headers)
 
 
-def init_proxy(driver, send_request_and_get_response: Callable, config: Config) -> None:
-    app.state.driver = driver
-    app.state.send_request_and_get_response = send_request_and_get_response
+def setup_proxy(providers: ProviderRegistry, config: Config) -> None:
+    app.state.providers = providers
+    # A closed tab loses its context: the whole conversation must be sent again.
+    providers.on_conversation_closed = message_index.reset
     app.state.config = config
+    app.state.trace_writer = TraceWriter(config.trace_file) if config.trace_file else None
+    app.state.token_counter = TokenCounter(config.tokenizer)
+    app.state.cache = (
+        ResponseCache(ttl=config.cache_ttl, max_bytes=config.cache_max_bytes, path=config.cache_path)
+        if config.cache
+        else None
+    )
+    # One thread per tab: each request blocks its thread until a tab is available.
+    app.state.executor = ThreadPoolExecutor(
+        max_workers=providers.pool_capacity * len(providers.chat_modules), thread_name_prefix="chapito-browser"
+    )
+
+
+def init_proxy(providers: ProviderRegistry, config: Config) -> None:
+    setup_proxy(providers, config)
 
     logging.debug(f"Listening on: {config.host}:{config.port}")
 
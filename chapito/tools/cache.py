@@ -0,0 +1,167 @@
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+DEFAULT_TTL_SECONDS: float = 3600
+DEFAULT_MAX_BYTES: int = 16 * 1024 * 1024
+
+CREATE_TABLE_QUERY: str = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    content TEXT NOT NULL,
+    created REAL NOT NULL,
+    last_used REAL NOT NULL,
+    size INTEGER NOT NULL
+)
+"""
+
+
+def get_cache_key(model: str, prompt: str) -> str:
+    """
+    Canonical hash of a request: same model and same prompt give the same key.
+    """
+    canonical = json.dumps({"model": model, "prompt": prompt}, sort_keys=True, ensure_ascii=False)
+    return hashlib.blake2b(canonical.encode(), digest_size=16).hexdigest()
+
+
+def get_entry_size(key: str, content: str) -> int:
+    return len(key) + len(content.encode())
+
+
+class ResponseCache:
+    """
+    Answers of the chatbot by request key.
+    In-memory LRU, optionally backed by a SQLite file so entries survive restarts.
+    Entries expire after `ttl` seconds, and the least recently used ones are evicted above `max_bytes`.
+    Thread-safe: callers on an event loop look up the memory inline and run the SQLite tier
+    (`get_from_database`, `put_in_database`) in a thread.
+    """
+
+    def __init__(self, ttl: float = DEFAULT_TTL_SECONDS, max_bytes: int = DEFAULT_MAX_BYTES, path: str = ""):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        # Key -> (content, creation time), from the least recently used.
+        self.entries: OrderedDict[str, Tuple[str, float]] = OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()
+        self.database: Optional[sqlite3.Connection] = None
+        if path:
+            self.database = sqlite3.connect(path, check_same_thread=False)
+            self.database.execute(CREATE_TABLE_QUERY)
+            self.database.commit()
+            logging.debug(f"Response cache stored in {path}")
+
+    def _is_expired(self, created: float) -> bool:
+        return time.time() - created > self.ttl
+
+    def _remove(self, key: str) -> None:
+        content, _ = self.entries.pop(key)
+        self.size -= get_entry_size(key, content)
+
+    def _store_in_memory(self, key: str, content: str, created: float) -> None:
+        if key in self.entries:
+            self._remove(key)
+        self.entries[key] = (content, created)
+        self.size += get_entry_size(key, content)
+        while self.size > self.max_bytes and self.entries:
+            self._remove(next(iter(self.entries)))
+
+    def _get_from_database(self, key: str) -> Optional[Tuple[str, float]]:
+        row = self.database.execute("SELECT content, created FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        if self._is_expired(row[1]):
+            self.database.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self.database.commit()
+            return None
+        self.database.execute("UPDATE responses SET last_used = ? WHERE key = ?", (time.time(), key))
+        self.database.commit()
+        return row
+
+    def _store_in_database(self, key: str, content: str, created: float) -> None:
+        self.database.execute(
+            "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)",
+            (key, content, created, created, get_entry_size(key, content)),
+        )
+        self.database.execute("DELETE FROM responses WHERE created < ?", (time.time() - self.ttl,))
+        # Drop the least recently used entries above the size limit.
+        self.database.execute(
+            """
+            DELETE FROM responses WHERE key IN (
+                SELECT key FROM (
+                    SELECT key, SUM(size) OVER (ORDER BY last_used DESC) AS total_size FROM responses
+                ) WHERE total_size > ?
+            )
+            """,
+            (self.max_bytes,),
+        )
+        self.database.commit()
+
+    @property
+    def is_persistent(self) -> bool:
+        return self.database is not None
+
+    def get_from_memory(self, key: str) -> Optional[str]:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if self._is_expired(entry[1]):
+                self._remove(key)
+                return None
+            self.entries.move_to_end(key)
+            return entry[0]
+
+    def get_from_database(self, key: str) -> Optional[str]:
+        """
+        Answer stored in the SQLite file, kept in memory for the next requests.
+        """
+        if self.database is None:
+            return None
+        with self.lock:
+            entry = self._get_from_database(key)
+            if entry is None:
+                return None
+            self._store_in_memory(key, *entry)
+            return entry[0]
+
+    def get(self, key: str) -> Optional[str]:
+        content = self.get_from_memory(key)
+        return content if content is not None else self.get_from_database(key)
+
+    def put_in_memory(self, key: str, content: str) -> None:
+        if not content:
+            return
+        with self.lock:
+            self._store_in_memory(key, content, time.time())
+
+    def put_in_database(self, key: str, content: str) -> None:
+        if not content or self.database is None:
+            return
+        with self.lock:
+            self._store_in_database(key, content, time.time())
+
+    def put(self, key: str, content: str) -> None:
+        self.put_in_memory(key, content)
+        self.put_in_database(key, content)
+
+    def purge(self) -> int:
+        """
+        Remove all entries. Returns the number of entries removed.
+        """
+        with self.lock:
+            count = len(self.entries)
+            self.entries.clear()
+            self.size = 0
+            if self.database is not None:
+                count = max(count, self.database.execute("DELETE FROM responses").rowcount)
+                self.database.commit()
+            return count
+
+    def __len__(self) -> int:
+        return len(self.entries)
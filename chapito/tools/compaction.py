@@ -0,0 +1,99 @@
+import logging
+import re
+from typing import Callable, List, Set, Tuple
+
+from chapito.tools.history import get_message_digest
+
+# The last messages are kept whole: they hold the question and its immediate context.
+RECENT_MESSAGES: int = 4
+# Code blocks and tool outputs shorter than this are kept, even when repeated.
+MIN_DEDUPLICATED_LENGTH: int = 200
+# Characters kept at the beginning and at the end of a shortened message.
+KEPT_HEAD_LENGTH: int = 600
+KEPT_TAIL_LENGTH: int = 300
+TOOL_ROLES: Tuple[str, ...] = ("tool", "function")
+
+CODE_BLOCK_PATTERN: re.Pattern = re.compile(r"^```[^\n]*\n.*?^```$", re.MULTILINE | re.DOTALL)
+REPEATED_CODE_BLOCK: str = "```\n(same content as in a later message)\n```"
+REPEATED_TOOL_OUTPUT: str = "(same output as in a later message)"
+
+# (role, content) of a message.
+Message = Tuple[str, str]
+
+
+def collapse_system_messages(messages: List[Message]) -> List[Message]:
+    """
+    Agent tools repeat their instructions: system messages already seen are dropped.
+    """
+    seen: Set[bytes] = set()
+    collapsed = []
+    for role, content in messages:
+        if role == "system":
+            digest = get_message_digest(content)
+            if digest in seen:
+                continue
+            seen.add(digest)
+        collapsed.append((role, content))
+    return collapsed
+
+
+def deduplicate_contents(messages: List[Message]) -> List[Message]:
+    """
+    Files read several times and repeated tool outputs are only kept in their latest occurrence.
+    """
+    seen: Set[bytes] = set()
+
+    def replace_code_block(match: re.Match) -> str:
+        block = match.group(0)
+        if len(block) < MIN_DEDUPLICATED_LENGTH:
+            return block
+        digest = get_message_digest(block)
+        if digest in seen:
+            return REPEATED_CODE_BLOCK
+        seen.add(digest)
+        return block
+
+    deduplicated = []
+    # From the latest message: the latest occurrence is kept.
+    for role, content in reversed(messages):
+        if role in TOOL_ROLES and len(content) >= MIN_DEDUPLICATED_LENGTH:
+            digest = get_message_digest(content)
+            if digest in seen:
+                content = REPEATED_TOOL_OUTPUT
+            seen.add(digest)
+        content = CODE_BLOCK_PATTERN.sub(replace_code_block, content)
+        deduplicated.append((role, content))
+    return deduplicated[::-1]
+
+
+def shorten(content: str) -> str:
+    omitted = len(content) - KEPT_HEAD_LENGTH - KEPT_TAIL_LENGTH
+    if omitted <= 0:
+        return content
+    return f"{content[:KEPT_HEAD_LENGTH]}\n[... {omitted} characters omitted ...]\n{content[-KEPT_TAIL_LENGTH:]}"
+
+
+def compact_messages(messages: List[Message], budget: int, count_tokens: Callable[[str], int]) -> List[Message]:
+    """
+    Fit the history sent to a new chat in a budget of tokens, so it is written quickly and accepted by the chatbot.
+    Repeated system messages and contents are always removed. Above the budget, old messages are shortened
+    to their beginning and end, tool outputs first, then the other ones. System and recent messages are kept.
+    """
+    compacted = deduplicate_contents(collapse_system_messages(messages))
+    tokens = [count_tokens(content) for _, content in compacted]
+    total = sum(tokens)
+    old_positions = range(len(compacted) - RECENT_MESSAGES)
+    for roles in (TOOL_ROLES, ("user", "assistant")):
+        for position in old_positions:
+            if total <= budget:
+                break
+            role, content = compacted[position]
+            if role not in roles:
+                continue
+            compacted[position] = (role, shorten(content))
+            shortened_tokens = count_tokens(compacted[position][1])
+            total += shortened_tokens - tokens[position]
+            tokens[position] = shortened_tokens
+    if total > budget:
+        logging.warning(f"Prompt of {total} tokens still above the budget of {budget} tokens after compaction")
+    return compacted
@@ -0,0 +1,170 @@
+import logging
+from typing import Optional, Tuple
+
+from selenium.common.exceptions import WebDriverException
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+
+from chapito.tools.metrics import metrics
+from chapito.tools.tracing import span
+
+DEFAULT_QUIET_PERIOD_SECONDS: float = 1
+POLL_INTERVAL_SECONDS: float = 0.1
+FINISHED: str = "finished"
+OBSERVER_LOST: str = "observer_lost"
+
+INSTALL_OBSERVER_SCRIPT: str = """
+const [containerSelector, answerStrategy, answerLocator] = arguments;
+const container = (containerSelector && document.querySelector(containerSelector)) || document.body;
+if (window.__chapitoObserver) {
+    window.__chapitoObserver.disconnect();
+}
+
+function findAnswers() {
+    if (answerStrategy === "xpath") {
+        const answers = document.evaluate(answerLocator, document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+        return { count: answers.snapshotLength, last: answers.snapshotItem(answers.snapshotLength - 1) };
+    }
+    const answers = document.querySelectorAll(answerLocator);
+    return { count: answers.length, last: answers[answers.length - 1] };
+}
+
+// The first changes are the prompt bubble and the cleared input: the answer starts with the first text
+// of a new answer element.
+let knownAnswers = null;
+try {
+    knownAnswers = answerLocator ? findAnswers().count : null;
+} catch (error) {
+    // Invalid locator: completion is still detected, without checking for a new answer.
+}
+const state = {
+    start: performance.now(),
+    firstAnswerText: null,
+    lastMutation: performance.now(),
+    mutations: 0,
+    knownAnswers: knownAnswers,
+    findAnswers: findAnswers,
+};
+const observer = new MutationObserver((records) => {
+    state.lastMutation = performance.now();
+    state.mutations += records.length;
+    if (state.firstAnswerText === null && knownAnswers !== null) {
+        const answers = findAnswers();
+        if (answers.count > knownAnswers && answers.last && answers.last.textContent.trim()) {
+            state.firstAnswerText = state.lastMutation;
+        }
+    }
+});
+observer.observe(container, { childList: true, subtree: true, characterData: true });
+window.__chapitoObserver = observer;
+window.__chapitoCompletion = state;
+"""
+
+COMPLETION_STATE_SCRIPT: str = """
+const [doneSelector] = arguments;
+const state = window.__chapitoCompletion;
+if (!state) {
+    return null;
+}
+let newAnswer = null;
+if (state.knownAnswers !== null) {
+    try {
+        newAnswer = state.findAnswers().count > state.knownAnswers;
+    } catch (error) {
+        // Answers can't be counted: only the page activity and the "done" marker are checked.
+    }
+}
+return {
+    quietFor: (performance.now() - state.lastMutation) / 1000,
+    mutations: state.mutations,
+    firstAnswerTextAfter: state.firstAnswerText === null ? null : (state.firstAnswerText - state.start) / 1000,
+    done: document.querySelector(doneSelector) !== null,
+    newAnswer: newAnswer,
+};
+"""
+
+
+def install_completion_observer(
+    driver, answer_locator: Optional[Tuple[str, str]] = None, container_css_selector: Optional[str] = None
+) -> None:
+    """
+    Record DOM changes of the page (or of the answer container) from now on.
+    Must be called just before submitting the prompt. With an answer locator (CSS or XPath),
+    the time of the first text of the new answer is recorded too.
+    """
+    strategy, locator = answer_locator if answer_locator else (None, None)
+    if strategy not in (By.CSS_SELECTOR, By.XPATH):
+        strategy = locator = None
+    try:
+        driver.execute_script(INSTALL_OBSERVER_SCRIPT, container_css_selector, strategy, locator)
+    except WebDriverException as e:
+        logging.warning(f"Can't install completion observer: {e}")
+
+
+def get_completion_state(driver, done_css_selector: str) -> Optional[dict]:
+    """
+    Returns None when the observer is lost (eg. the page was reloaded).
+    """
+    try:
+        return driver.execute_script(COMPLETION_STATE_SCRIPT, done_css_selector)
+    except WebDriverException as e:
+        logging.warning(f"Can't read completion state: {e}")
+        return None
+
+
+def is_state_finished(state: dict, quiet_period: float) -> bool:
+    """
+    The "done" marker of some chatbots (a disabled submit button) is displayed as soon as the prompt is sent:
+    a new answer is required too, when answers can be counted (`newAnswer` is None otherwise).
+    """
+    if state.get("newAnswer") is False:
+        return False
+    return bool(state["mutations"]) and state["done"] and state["quietFor"] >= quiet_period
+
+
+def get_turn_status(driver, done_css_selector: str, quiet_period: float) -> Optional[bool]:
+    """
+    A turn is finished when a new answer is displayed, the page has been quiet for `quiet_period`
+    and the "done" marker is displayed.
+    Returns None when the observer is lost (eg. the page was reloaded).
+    """
+    state = get_completion_state(driver, done_css_selector)
+    if state is None:
+        return None
+    return is_state_finished(state, quiet_period)
+
+
+def is_turn_finished(driver, done_css_selector: str, quiet_period: float = DEFAULT_QUIET_PERIOD_SECONDS) -> bool:
+    status = get_turn_status(driver, done_css_selector, quiet_period)
+    if status is None:
+        return bool(driver.find_elements(By.CSS_SELECTOR, done_css_selector))
+    return status
+
+
+def wait_for_completion(
+    driver, done_css_selector: str, quiet_period: float = DEFAULT_QUIET_PERIOD_SECONDS, timeout: float = 120
+) -> bool:
+    """
+    Wait for the end of the answer.
+    Returns False when the observer is lost: the caller must fall back to its own wait.
+    Raises TimeoutException like WebDriverWait.
+    """
+
+    def get_status(driver) -> Optional[str]:
+        state = get_completion_state(driver, done_css_selector)
+        if state is None:
+            return OBSERVER_LOST
+        if not is_state_finished(state, quiet_period):
+            return None
+        # First text of the new answer after the submit.
+        if state.get("firstAnswerTextAfter") is not None:
+            metrics.observe("first_token", state["firstAnswerTextAfter"])
+        return FINISHED
+
+    wait = WebDriverWait(driver, timeout, poll_frequency=POLL_INTERVAL_SECONDS)
+    with span("WebDriverWait.until", "wait", condition="answer completed"):
+        status = wait.until(get_status)
+    if status == OBSERVER_LOST:
+        logging.warning("Completion observer lost, falling back to fixed waits")
+        return False
+    return True
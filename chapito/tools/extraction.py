@@ -0,0 +1,251 @@
+import json
+import logging
+from typing import Optional, Set, Tuple
+
+from selenium.common.exceptions import WebDriverException
+from selenium.webdriver.common.by import By
+
+from chapito.tools.markdown import BLOCK_ELEMENTS
+
+# Locator strategies the extractor can evaluate in the page.
+SUPPORTED_STRATEGIES: Set[str] = {By.CSS_SELECTOR, By.XPATH, By.TAG_NAME}
+
+# Same conversion as `chapito.tools.markdown.MarkdownConverter`, on the DOM of the page.
+EXTRACT_ANSWER_SCRIPT: str = r"""
+const [strategy, locator, codeBlockSelector, skipSelector, knownCount] = arguments;
+const HEADINGS = new Map([["h1", 1], ["h2", 2], ["h3", 3], ["h4", 4], ["h5", 5], ["h6", 6]]);
+const TABLE_PARTS = new Set(["table", "thead", "tbody", "tfoot", "tr"]);
+const BLOCKS = new Set(@@BLOCK_ELEMENTS@@);
+const PARAGRAPH_BREAK = "\n\n";
+
+let count = 0;
+let answer = null;
+if (strategy === "xpath") {
+    count = document.evaluate(`count(${locator})`, document, null, XPathResult.NUMBER_TYPE, null).numberValue;
+    if (count) {
+        const lastType = XPathResult.FIRST_ORDERED_NODE_TYPE;
+        answer = document.evaluate(`(${locator})[last()]`, document, null, lastType, null).singleNodeValue;
+    }
+} else {
+    const answers = document.querySelectorAll(locator);
+    count = answers.length;
+    answer = count ? answers[count - 1] : null;
+}
+if (knownCount === null || count <= knownCount || !answer) {
+    return { count: count, markdown: null };
+}
+
+const markdown = [];
+const lists = [];
+let table = null;
+// Separator written before the next text: a blank line, or a line break in a list item.
+let pendingBreak = null;
+// Position of the text of the current list item in `markdown`.
+let itemStart = 0;
+
+function emit(buffer, text) {
+    if (!text) {
+        return;
+    }
+    if (buffer === markdown && pendingBreak !== null) {
+        writeBreak(pendingBreak);
+        pendingBreak = null;
+    }
+    buffer.push(text);
+}
+
+function writeBreak(separator) {
+    if (!markdown.length) {
+        return;
+    }
+    const tail = markdown.slice(-2).join("");
+    const newlines = tail.length - tail.replace(/\n+$/, "").length;
+    if (separator === PARAGRAPH_BREAK) {
+        markdown.push("\n".repeat(Math.max(0, 2 - newlines)));
+    } else if (!newlines) {
+        markdown.push(separator);
+    }
+}
+
+// Start or end a block: the next text is separated from the previous one.
+function breakBlock(buffer) {
+    if (buffer !== markdown) {
+        // Cells are written on a single line.
+        buffer.push(" ");
+    } else if (!lists.length) {
+        pendingBreak = PARAGRAPH_BREAK;
+    } else if (pendingBreak === null && markdown.length > itemStart) {
+        pendingBreak = "\n" + "  ".repeat(lists.length);
+    }
+}
+
+function startLine(buffer) {
+    if (buffer.length && !buffer[buffer.length - 1].endsWith("\n")) {
+        buffer.push("\n");
+    }
+}
+
+function getLanguage(element) {
+    const name = Array.from(element.classList).find((name) => name.startsWith("language-"));
+    return name ? name.slice("language-".length) : "";
+}
+
+function readCodeBlock(block) {
+    const text = [];
+    const preText = [];
+    const codeText = [];
+    let language = getLanguage(block);
+    let hasPre = false;
+    let hasCode = false;
+    function push(data, inPre, inCode) {
+        text.push(data);
+        if (inPre || inCode) {
+            preText.push(data);
+        }
+        if (inCode) {
+            codeText.push(data);
+        }
+    }
+    function walk(node, inPre, inCode) {
+        for (const child of node.childNodes) {
+            if (child.nodeType === Node.TEXT_NODE) {
+                push(child.data, inPre, inCode);
+            } else if (child.nodeType === Node.ELEMENT_NODE && !child.matches(skipSelector)) {
+                if (child.localName === "br") {
+                    push("\n", inPre, inCode);
+                    continue;
+                }
+                const isPre = child.localName === "pre";
+                const isCode = child.localName === "code";
+                if (isPre || isCode) {
+                    hasPre = hasPre || isPre;
+                    hasCode = hasCode || isCode;
+                    language = language || getLanguage(child);
+                }
+                walk(child, inPre || isPre, inCode || isCode);
+            }
+        }
+    }
+    walk(block, false, false);
+    const kept = hasCode ? codeText : hasPre ? preText : text;
+    return "```" + language + "\n" + kept.join("").replace(/\n+$/, "") + "\n```\n";
+}
+
+function convertChildren(element, buffer) {
+    for (const child of element.childNodes) {
+        if (child.nodeType === Node.TEXT_NODE) {
+            // Tables: only the text of cells.
+            if (!TABLE_PARTS.has(element.localName)) {
+                // Whitespace between blocks is not displayed.
+                emit(buffer, pendingBreak !== null ? child.data.trimStart() : child.data);
+            }
+        } else if (child.nodeType === Node.ELEMENT_NODE && !child.matches(skipSelector)) {
+            convertElement(child, buffer);
+        }
+    }
+}
+
+function convertElement(element, buffer) {
+    const tag = element.localName;
+    if (element.matches(codeBlockSelector)) {
+        breakBlock(buffer);
+        startLine(buffer);
+        emit(buffer, readCodeBlock(element));
+        breakBlock(buffer);
+    } else if (tag === "code") {
+        emit(buffer, "`");
+        convertChildren(element, buffer);
+        emit(buffer, "`");
+    } else if (tag === "br") {
+        emit(buffer, "\n");
+    } else if (BLOCKS.has(tag)) {
+        breakBlock(buffer);
+        convertChildren(element, buffer);
+        breakBlock(buffer);
+    } else if (HEADINGS.has(tag)) {
+        breakBlock(buffer);
+        startLine(buffer);
+        emit(buffer, "#".repeat(HEADINGS.get(tag)) + " ");
+        convertChildren(element, buffer);
+        startLine(buffer);
+        breakBlock(buffer);
+    } else if (tag === "ul" || tag === "ol") {
+        if (!lists.length) {
+            breakBlock(buffer);
+        }
+        lists.push({ tag: tag, items: 0 });
+        convertChildren(element, buffer);
+        lists.pop();
+        startLine(buffer);
+        if (!lists.length) {
+            breakBlock(buffer);
+        }
+    } else if (tag === "li" && lists.length) {
+        startLine(buffer);
+        const list = lists[lists.length - 1];
+        list.items += 1;
+        const marker = list.tag === "ol" ? `${list.items}.` : "-";
+        emit(buffer, "  ".repeat(lists.length - 1) + marker + " ");
+        itemStart = markdown.length;
+        convertChildren(element, buffer);
+    } else if (tag === "table") {
+        breakBlock(buffer);
+        startLine(buffer);
+        table = { hasHeader: false, headerDone: false, cells: 0 };
+        convertChildren(element, buffer);
+        breakBlock(buffer);
+    } else if (tag === "tr" && table) {
+        startLine(buffer);
+        emit(buffer, "|");
+        table.cells = 0;
+        convertChildren(element, buffer);
+        if (table.hasHeader && !table.headerDone) {
+            emit(buffer, "\n|" + " --- |".repeat(table.cells));
+            table.headerDone = true;
+        }
+        emit(buffer, "\n");
+    } else if ((tag === "td" || tag === "th") && table) {
+        const cell = [];
+        table.hasHeader = table.hasHeader || tag === "th";
+        convertChildren(element, cell);
+        const text = cell.join("").split(/\s+/).filter(Boolean).join(" ").replace(/\|/g, "\\|");
+        emit(buffer, ` ${text} |`);
+        table.cells += 1;
+    } else {
+        convertChildren(element, buffer);
+    }
+}
+
+if (!answer.matches(skipSelector)) {
+    convertElement(answer, markdown);
+}
+return { count: count, markdown: markdown.join("").trim() };
+""".replace("@@BLOCK_ELEMENTS@@", json.dumps(sorted(BLOCK_ELEMENTS)))
+
+
+def extract_last_answer(
+    driver,
+    answer_locator: Tuple[str, str],
+    code_block_selector: str,
+    skip_selector: str,
+    known_count: Optional[int] = 0,
+) -> Optional[Tuple[int, Optional[str]]]:
+    """
+    Count the answers of the page and convert the last one to Markdown, in a single call to the browser:
+    the cost doesn't depend on the length of the conversation.
+    The last answer is only converted when there are more than `known_count` answers (never when None).
+    Returns None when the page can't run the extractor: the caller must read the answer with WebDriver commands.
+    """
+    strategy, locator = answer_locator
+    if strategy not in SUPPORTED_STRATEGIES:
+        return None
+    try:
+        result = driver.execute_script(
+            EXTRACT_ANSWER_SCRIPT, strategy, locator, code_block_selector, skip_selector, known_count
+        )
+    except WebDriverException as e:
+        logging.warning(f"Can't extract answer in the page: {e}")
+        return None
+    if not isinstance(result, dict):
+        return None
+    return int(result["count"]), result["markdown"]
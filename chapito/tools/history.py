@@ -0,0 +1,97 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional
+
+MAX_CONVERSATIONS: int = 256
+MAX_MESSAGES_PER_CONVERSATION: int = 512
+# Conversations unused for this period are forgotten.
+CONVERSATION_TTL_SECONDS: float = 24 * 3600
+
+
+def get_message_digest(content: str) -> bytes:
+    """
+    Digest of a message, insensitive to whitespace changes made by clients or chatbots.
+    """
+    normalized = " ".join(content.split())
+    return hashlib.blake2b(normalized.encode(), digest_size=16).digest()
+
+
+def get_conversation_fingerprint(first_messages: List[str]) -> str:
+    """
+    The beginning of a conversation never changes: it identifies the conversation.
+    """
+    digests = b"".join(get_message_digest(message) for message in first_messages)
+    return hashlib.blake2b(digests, digest_size=8).hexdigest()
+
+
+class Conversation:
+    def __init__(self):
+        self.last_used = time.monotonic()
+        self.digests: OrderedDict[bytes, None] = OrderedDict()
+
+
+class MessageIndex:
+    """
+    Digests of the messages already exchanged with the chatbot, scoped by conversation.
+    Membership checks are O(1), and memory is bounded by LRU and TTL evictions.
+    Thread-safe: conversations are also reset by the browser workers.
+    """
+
+    def __init__(
+        self,
+        max_conversations: int = MAX_CONVERSATIONS,
+        max_messages: int = MAX_MESSAGES_PER_CONVERSATION,
+        ttl: float = CONVERSATION_TTL_SECONDS,
+    ):
+        self.max_conversations = max_conversations
+        self.max_messages = max_messages
+        self.ttl = ttl
+        self.conversations: OrderedDict[str, Conversation] = OrderedDict()
+        self.lock = threading.Lock()
+
+    def _evict_expired(self) -> None:
+        expiration = time.monotonic() - self.ttl
+        # Conversations are ordered from the least recently used.
+        while self.conversations:
+            scope, conversation = next(iter(self.conversations.items()))
+            if conversation.last_used > expiration:
+                break
+            del self.conversations[scope]
+
+    def _get_conversation(self, scope: str, create: bool = False) -> Optional[Conversation]:
+        self._evict_expired()
+        conversation = self.conversations.get(scope)
+        if conversation is None:
+            if not create:
+                return None
+            conversation = Conversation()
+            self.conversations[scope] = conversation
+            if len(self.conversations) > self.max_conversations:
+                self.conversations.popitem(last=False)
+        conversation.last_used = time.monotonic()
+        self.conversations.move_to_end(scope)
+        return conversation
+
+    def add(self, scope: str, content: str) -> None:
+        digest = get_message_digest(content)
+        with self.lock:
+            conversation = self._get_conversation(scope, create=True)
+            conversation.digests[digest] = None
+            conversation.digests.move_to_end(digest)
+            if len(conversation.digests) > self.max_messages:
+                conversation.digests.popitem(last=False)
+
+    def contains(self, scope: str, content: str) -> bool:
+        digest = get_message_digest(content)
+        with self.lock:
+            conversation = self._get_conversation(scope)
+            return conversation is not None and digest in conversation.digests
+
+    def reset(self, scope: str) -> None:
+        with self.lock:
+            self.conversations.pop(scope, None)
+
+    def __len__(self) -> int:
+        return len(self.conversations)
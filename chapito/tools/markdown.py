@@ -0,0 +1,280 @@
+from html.parser import HTMLParser
+from typing import Dict, List, Optional, Set, Tuple
+
+# Elements never holding answer text (eg. "Copy" buttons).
+DEFAULT_SKIP_SELECTOR: str = "button, svg, script, style"
+DEFAULT_CODE_BLOCK_SELECTOR: str = "pre"
+# Elements without end tag.
+VOID_ELEMENTS: Set[str] = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "wbr"}
+HEADINGS: Dict[str, int] = {f"h{level}": level for level in range(1, 7)}
+# Elements separated from the surrounding text by a blank line (headings, lists, tables and code blocks too).
+BLOCK_ELEMENTS: Set[str] = set(
+    "address article aside blockquote details div dl dd dt fieldset figcaption figure footer form header hr main nav p "
+    "pre section summary".split()
+)
+PARAGRAPH_BREAK: str = "\n\n"
+LANGUAGE_CLASS_PREFIX: str = "language-"
+
+# Simple selector: tag name (or empty for any tag) and classes.
+Selector = Tuple[str, Set[str]]
+
+
+def parse_selectors(selectors: str) -> List[Selector]:
+    """
+    Parse a comma-separated list of simple selectors: `tag`, `tag.class`, `.class1.class2`.
+    """
+    parsed = []
+    for selector in filter(None, (selector.strip() for selector in selectors.split(","))):
+        tag, *classes = selector.split(".")
+        parsed.append((tag.lower(), set(classes)))
+    return parsed
+
+
+def matches(selectors: List[Selector], tag: str, classes: Set[str]) -> bool:
+    return any((not name or name == tag) and required <= classes for name, required in selectors)
+
+
+class MarkdownConverter(HTMLParser):
+    """
+    Converts the HTML of an answer to Markdown in a single pass over the parser events.
+    Text is kept as displayed; code blocks are fenced, inline code is quoted,
+    headings, lists and tables get their Markdown syntax. Blocks are separated by a blank line,
+    blocks in a list item by a line break.
+    In code blocks, only the text of <code> (else of <pre>) is kept when there is one: headers and labels are dropped.
+    """
+
+    def __init__(
+        self, code_block_selector: str = DEFAULT_CODE_BLOCK_SELECTOR, skip_selector: str = DEFAULT_SKIP_SELECTOR
+    ):
+        super().__init__(convert_charrefs=True)
+        self.code_block_selectors = parse_selectors(code_block_selector)
+        self.skip_selectors = parse_selectors(skip_selector)
+        self.parts: List[str] = []
+        # Open elements.
+        self.stack: List[str] = []
+        # Depth of the skipped element, or of the code block, being read.
+        self.skip_depth: Optional[int] = None
+        self.block_depth: Optional[int] = None
+        self.block_text: List[str] = []
+        self.block_pre_text: List[str] = []
+        self.block_code_text: List[str] = []
+        self.block_language = ""
+        # Open <pre> and <code> elements in the code block.
+        self.block_pre_depth = 0
+        self.block_code_depth = 0
+        self.block_has_pre = False
+        self.block_has_code = False
+        # Open lists: tag and number of items.
+        self.lists: List[List] = []
+        self.table_row_cells: Optional[int] = None
+        # Text of the table cell being read, written on a single line.
+        self.table_cell_text: Optional[List[str]] = None
+        self.table_has_header = False
+        self.table_header_done = False
+        # Separator written before the next text: a blank line, or a line break in a list item.
+        self.pending_break: Optional[str] = None
+        # Position of the text of the current list item in `parts`.
+        self.item_start = 0
+
+    def emit(self, text: str) -> None:
+        if not text:
+            return
+        if self.table_cell_text is not None:
+            self.table_cell_text.append(text)
+            return
+        if self.pending_break is not None:
+            self.write_break(self.pending_break)
+            self.pending_break = None
+        self.parts.append(text)
+
+    def write_break(self, separator: str) -> None:
+        if not self.parts:
+            return
+        tail = "".join(self.parts[-2:])
+        newlines = len(tail) - len(tail.rstrip("\n"))
+        if separator == PARAGRAPH_BREAK:
+            self.parts.append("\n" * max(0, 2 - newlines))
+        elif not newlines:
+            self.parts.append(separator)
+
+    def break_block(self) -> None:
+        """
+        Start or end a block: the next text is separated from the previous one.
+        """
+        if self.table_cell_text is not None:
+            # Cells are written on a single line.
+            self.table_cell_text.append(" ")
+        elif not self.lists:
+            self.pending_break = PARAGRAPH_BREAK
+        elif self.pending_break is None and len(self.parts) > self.item_start:
+            self.pending_break = "\n" + "  " * len(self.lists)
+
+    def start_line(self) -> None:
+        parts = self.parts if self.table_cell_text is None else self.table_cell_text
+        if parts and not parts[-1].endswith("\n"):
+            parts.append("\n")
+
+    def handle_starttag(self, tag: str, attrs: List[Tuple[str, Optional[str]]]) -> None:
+        if tag not in VOID_ELEMENTS:
+            self.stack.append(tag)
+        if self.skip_depth is not None:
+            return
+        classes = set((dict(attrs).get("class") or "").split())
+        if matches(self.skip_selectors, tag, classes):
+            if tag not in VOID_ELEMENTS:
+                self.skip_depth = len(self.stack)
+            return
+        if self.block_depth is not None:
+            if tag == "pre":
+                self.block_pre_depth += 1
+                self.block_has_pre = True
+                self.block_language = self.block_language or get_language(classes)
+            elif tag == "code":
+                self.block_code_depth += 1
+                self.block_has_code = True
+                self.block_language = self.block_language or get_language(classes)
+            elif tag == "br":
+                self.handle_data("\n")
+            return
+        if matches(self.code_block_selectors, tag, classes):
+            self.break_block()
+            self.block_depth = len(self.stack)
+            self.block_language = get_language(classes)
+            return
+        self.start_element(tag)
+
+    def start_element(self, tag: str) -> None:
+        if tag == "code":
+            self.emit("`")
+        elif tag == "br":
+            self.emit("\n")
+        elif tag in BLOCK_ELEMENTS:
+            self.break_block()
+        elif tag in HEADINGS:
+            self.break_block()
+            self.start_line()
+            self.emit("#" * HEADINGS[tag] + " ")
+        elif tag in ("ul", "ol"):
+            if not self.lists:
+                self.break_block()
+            self.lists.append([tag, 0])
+        elif tag == "li" and self.lists:
+            self.start_line()
+            current_list = self.lists[-1]
+            current_list[1] += 1
+            marker = f"{current_list[1]}." if current_list[0] == "ol" else "-"
+            self.emit("  " * (len(self.lists) - 1) + marker + " ")
+            self.item_start = len(self.parts)
+        elif tag == "table":
+            self.break_block()
+            self.start_line()
+            self.table_has_header = self.table_header_done = False
+        elif tag == "tr":
+            self.start_line()
+            self.emit("|")
+            self.table_row_cells = 0
+        elif tag in ("td", "th"):
+            self.table_cell_text = []
+            self.table_has_header = self.table_has_header or tag == "th"
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag in VOID_ELEMENTS or tag not in self.stack:
+            return
+        # Close the elements left open (eg. <li> without end tag).
+        while self.stack:
+            depth = len(self.stack)
+            open_tag = self.stack.pop()
+            self.end_element(open_tag, depth)
+            if open_tag == tag:
+                break
+
+    def end_element(self, tag: str, depth: int) -> None:
+        if self.skip_depth is not None:
+            if depth == self.skip_depth:
+                self.skip_depth = None
+            return
+        if self.block_depth is not None:
+            if depth == self.block_depth:
+                self.end_code_block()
+            elif tag == "pre":
+                self.block_pre_depth -= 1
+            elif tag == "code":
+                self.block_code_depth -= 1
+            return
+        if tag == "code":
+            self.emit("`")
+        elif tag in BLOCK_ELEMENTS:
+            self.break_block()
+        elif tag in HEADINGS:
+            self.start_line()
+            self.break_block()
+        elif tag in ("ul", "ol") and self.lists:
+            self.lists.pop()
+            self.start_line()
+            if not self.lists:
+                self.break_block()
+        elif tag == "table":
+            self.break_block()
+        elif tag in ("td", "th") and self.table_cell_text is not None:
+            text = " ".join("".join(self.table_cell_text).split()).replace("|", "\\|")
+            self.table_cell_text = None
+            self.emit(f" {text} |")
+            self.table_row_cells = (self.table_row_cells or 0) + 1
+        elif tag == "tr":
+            cells = self.table_row_cells or 0
+            self.table_row_cells = None
+            if self.table_has_header and not self.table_header_done:
+                self.emit("\n|" + " --- |" * cells)
+                self.table_header_done = True
+            self.emit("\n")
+
+    def end_code_block(self) -> None:
+        if self.block_has_code:
+            text = "".join(self.block_code_text)
+        else:
+            text = "".join(self.block_pre_text if self.block_has_pre else self.block_text)
+        text = text.rstrip("\n")
+        self.start_line()
+        self.emit(f"```{self.block_language}\n{text}\n```\n")
+        self.block_depth = None
+        self.block_text, self.block_pre_text, self.block_code_text = [], [], []
+        self.block_language = ""
+        self.block_pre_depth = self.block_code_depth = 0
+        self.block_has_pre = self.block_has_code = False
+        self.break_block()
+
+    def handle_data(self, data: str) -> None:
+        if self.skip_depth is not None:
+            return
+        if self.block_depth is not None:
+            self.block_text.append(data)
+            if self.block_pre_depth or self.block_code_depth:
+                self.block_pre_text.append(data)
+            if self.block_code_depth:
+                self.block_code_text.append(data)
+            return
+        if self.table_cell_text is None and self.stack and self.stack[-1] in ("table", "thead", "tbody", "tfoot", "tr"):
+            # Tables: only the text of cells.
+            return
+        if self.pending_break is not None:
+            # Whitespace between blocks is not displayed.
+            data = data.lstrip()
+        self.emit(data)
+
+    def convert(self, html: str) -> str:
+        self.feed(html)
+        self.close()
+        # Elements left open at the end of the answer.
+        if self.stack:
+            self.handle_endtag(self.stack[0])
+        return "".join(self.parts).strip()
+
+
+def get_language(classes: Set[str]) -> str:
+    return next((name[len(LANGUAGE_CLASS_PREFIX) :] for name in classes if name.startswith(LANGUAGE_CLASS_PREFIX)), "")
+
+
+def html_to_markdown(
+    html: str, code_block_selector: str = DEFAULT_CODE_BLOCK_SELECTOR, skip_selector: str = DEFAULT_SKIP_SELECTOR
+) -> str:
+    return MarkdownConverter(code_block_selector, skip_selector).convert(html)
@@ -0,0 +1,140 @@
+import bisect
+import contextlib
+import threading
+import time
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Tuple
+
+from chapito.tools.tracing import span
+
+# Upper bounds of the duration buckets, in seconds.
+DEFAULT_BUCKETS: Tuple[float, ...] = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+STAGE_METRIC: str = "chapito_stage_duration_seconds"
+STAGE_HELP: str = (
+    "Duration of the stages of a request: queue (wait for a browser tab), transfer (prompt written in the page), "
+    "submit (wait for the submit button and click), first_token (submit to the first text of the answer), "
+    "generation (submit to the end of the answer), extraction (final answer read from the page, "
+    "converted to Markdown in the page when possible), cleaning (HTML converted to Markdown by the proxy, "
+    "only when the answer can't be converted in the page)"
+)
+TIMEOUTS_COUNTER: str = "chapito_timeouts_total"
+EMPTY_ANSWERS_COUNTER: str = "chapito_empty_answers_total"
+CACHE_HITS_COUNTER: str = "chapito_cache_hits_total"
+# Counter name -> help.
+COUNTERS: Dict[str, str] = {
+    TIMEOUTS_COUNTER: "Requests that timed out waiting for the chatbot",
+    EMPTY_ANSWERS_COUNTER: "Requests answered with an empty message",
+    CACHE_HITS_COUNTER: "Requests answered from the response cache",
+}
+
+# Chatbot serving the request of the current thread, used as `provider` label.
+current_provider: ContextVar[str] = ContextVar("chapito_provider", default="")
+
+
+def format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    escaped = (
+        (name, value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for name, value in labels.items()
+    )
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+
+def format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(value)
+
+
+class Histogram:
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        # Observations per bucket, not cumulative. The last one is +Inf.
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def render(self, name: str, labels: Dict[str, str]) -> List[str]:
+        lines = []
+        cumulative = 0
+        for bound, count in zip([*map(format_value, self.buckets), "+Inf"], self.counts):
+            cumulative += count
+            lines.append(f"{name}_bucket{format_labels({**labels, 'le': bound})} {cumulative}")
+        lines.append(f"{name}_sum{format_labels(labels)} {format_value(self.sum)}")
+        lines.append(f"{name}_count{format_labels(labels)} {self.count}")
+        return lines
+
+
+class Metrics:
+    """
+    Stage durations and counters of the proxy, labeled by chatbot, in the Prometheus text format.
+    Thread-safe: stages are observed by the browser threads.
+    """
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        # (provider, stage) -> histogram.
+        self.histograms: Dict[Tuple[str, str], Histogram] = {}
+        # (counter, provider) -> value.
+        self.counters: Dict[Tuple[str, str], int] = {}
+        self.lock = threading.Lock()
+
+    def observe(self, stage: str, seconds: float, provider: str = "") -> None:
+        key = (provider or current_provider.get(), stage)
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(self.buckets)
+            histogram.observe(seconds)
+
+    @contextlib.contextmanager
+    def timer(self, stage: str) -> Iterator[None]:
+        start_time = time.monotonic()
+        try:
+            with span(stage, "stage"):
+                yield
+        finally:
+            self.observe(stage, time.monotonic() - start_time)
+
+    def increment(self, counter: str, provider: str = "") -> None:
+        key = (counter, provider)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + 1
+
+    def render(self) -> str:
+        lines = [f"# HELP {STAGE_METRIC} {STAGE_HELP}", f"# TYPE {STAGE_METRIC} histogram"]
+        with self.lock:
+            for (provider, stage), histogram in sorted(self.histograms.items()):
+                lines += histogram.render(STAGE_METRIC, {"provider": provider, "stage": stage})
+            for counter, description in COUNTERS.items():
+                lines += [f"# HELP {counter} {description}", f"# TYPE {counter} counter"]
+                for (name, provider), value in sorted(self.counters.items()):
+                    if name == counter:
+                        lines.append(f"{counter}{format_labels({'provider': provider} if provider else {})} {value}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self) -> None:
+        with self.lock:
+            self.histograms.clear()
+            self.counters.clear()
+
+
+@contextlib.contextmanager
+def provider_label(provider: str) -> Iterator[None]:
+    """
+    Label the stages observed by the current thread with the chatbot serving the request.
+    """
+    previous_provider = current_provider.get()
+    current_provider.set(provider)
+    try:
+        yield
+    finally:
+        current_provider.set(previous_provider)
+
+
+metrics = Metrics()
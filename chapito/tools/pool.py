@@ -0,0 +1,219 @@
+import contextlib
+import copy
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from types import ModuleType
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+from chapito.config import Config
+from chapito.tools.metrics import metrics
+from chapito.tools.rotation import ConversationStats, get_rotation_reason, measure_dom_size
+from chapito.tools.tabs import BrowserLock, create_tab_driver
+
+
+class Worker:
+    """
+    A browser and its tabs. Each tab holds one conversation.
+    Up to `tabs_per_worker` conversations are served at the same time, each one in its own tab.
+    """
+
+    def __init__(self, index: int, driver: Any, config: Config):
+        self.index = index
+        self.driver = driver
+        self.config = config
+        self.browser_lock = BrowserLock(driver)
+        # Conversation scope -> window handle, from the least recently used.
+        # Handle is None until the tab is opened.
+        self.tabs: OrderedDict[str, Optional[str]] = OrderedDict()
+        self.stats: Dict[str, ConversationStats] = {}
+        # Conversations being served.
+        self.busy_scopes: Set[str] = set()
+        # The tab opened at startup is ready to receive a new conversation.
+        self.fresh_handle: Optional[str] = self.browser_lock.current_handle
+
+    def __repr__(self) -> str:
+        return f"Worker({self.index})"
+
+    def has_capacity(self) -> bool:
+        return len(self.busy_scopes) < max(1, self.config.tabs_per_worker)
+
+    def pop_old_tabs(self) -> List[Tuple[str, Optional[str]]]:
+        """
+        Forget the least recently used conversations above `max_tabs`, except those being served.
+        """
+        old_tabs = []
+        idle_scopes = [scope for scope in self.tabs if scope not in self.busy_scopes]
+        while len(self.tabs) > self.config.max_tabs and idle_scopes:
+            scope = idle_scopes.pop(0)
+            old_tabs.append((scope, self.tabs.pop(scope)))
+            self.stats.pop(scope, None)
+        return old_tabs
+
+
+def get_worker_config(config: Config, index: int) -> Config:
+    """
+    Give each worker its own browser profile: browsers can't share a profile directory.
+    The first worker keeps the configured profile so existing sessions are reused.
+    """
+    worker_config = copy.copy(config)
+    if index > 0:
+        worker_config.browser_profile_path = f"{config.browser_profile_path}_{index}"
+    return worker_config
+
+
+class BrowserPool:
+    """
+    A set of browsers, each one serving several conversations at the same time in separate tabs.
+    Conversations stick to the browser tab that holds their context.
+    """
+
+    def __init__(self, chat_module: ModuleType, config: Config):
+        self.chat_module = chat_module
+        self.config = config
+        self.size = max(1, config.pool_size)
+        # Number of requests served at the same time.
+        self.capacity = self.size * max(1, config.tabs_per_worker)
+        self.workers: List[Worker] = []
+        self.condition = threading.Condition()
+        self.on_conversation_closed: Callable[[str], None] = lambda scope: None
+
+    def _start_worker(self, index: int) -> Worker:
+        logging.info(f"Starting browser worker {index + 1}/{self.size}")
+        worker_config = get_worker_config(self.config, index)
+        return Worker(index, self.chat_module.initialize_driver(worker_config), worker_config)
+
+    def start(self) -> None:
+        """
+        Start the browsers in parallel. Each one serves requests as soon as it is ready.
+        When a browser can't start, the other ones are quit before the error is raised.
+        """
+        with ThreadPoolExecutor(max_workers=self.size, thread_name_prefix="chapito-warm-up") as executor:
+            futures = [executor.submit(self._start_worker, index) for index in range(self.size)]
+            try:
+                for future in as_completed(futures):
+                    worker = future.result()
+                    with self.condition:
+                        self.workers.append(worker)
+                        self.workers.sort(key=lambda worker: worker.index)
+                        self.condition.notify_all()
+            except BaseException:
+                for future in futures:
+                    future.cancel()
+                # Waits for the browsers still starting.
+                started = [
+                    future.result() for future in futures if not future.cancelled() and future.exception() is None
+                ]
+                with self.condition:
+                    self.workers = started
+                self.quit()
+                with self.condition:
+                    self.workers = []
+                raise
+
+    def _find_available_worker(self, scope: str) -> Optional[Worker]:
+        owner = next((worker for worker in self.workers if scope in worker.tabs), None)
+        if owner is not None:
+            available = owner.has_capacity() and scope not in owner.busy_scopes
+            return owner if available else None
+        available_workers = [worker for worker in self.workers if worker.has_capacity()]
+        if not available_workers:
+            return None
+        # New conversation: use the least busy browser, then the one with the fewest tabs.
+        return min(available_workers, key=lambda worker: (len(worker.busy_scopes), len(worker.tabs)))
+
+    def _open_tab(self, worker: Worker, tab) -> str:
+        with self.condition:
+            handle, worker.fresh_handle = worker.fresh_handle, None
+        if handle:
+            return handle
+        logging.debug(f"{worker} opens a new tab")
+        tab.switch_to.new_window("tab")
+        self.chat_module.open_new_chat(tab)
+        return tab.handle
+
+    def needs_rotation(self, scope: str) -> bool:
+        """
+        The conversation grew too long: it should continue in a new chat.
+        """
+        with self.condition:
+            owner = next((worker for worker in self.workers if scope in worker.stats), None)
+            reason = get_rotation_reason(owner.stats[scope], self.config) if owner else None
+        if reason:
+            logging.info(f"Conversation {scope} moves to a new chat: {reason}")
+        return reason is not None
+
+    def _update_stats(self, worker: Worker, scope: str, tab, start_time: float) -> None:
+        dom_nodes = measure_dom_size(tab) if self.config.rotation_dom_nodes > 0 else 0
+        with self.condition:
+            stats = worker.stats.get(scope)
+            if stats is not None:
+                stats.turns += 1
+                stats.last_duration = time.monotonic() - start_time
+                stats.dom_nodes = dom_nodes
+
+    def _close_tabs(self, tab, old_tabs: List[Tuple[str, Optional[str]]]) -> None:
+        for scope, handle in old_tabs:
+            logging.debug(f"Closing the tab of conversation {scope}")
+            if handle:
+                tab.switch_to.window(handle)
+                tab.close()
+            self.on_conversation_closed(scope)
+
+    @contextlib.contextmanager
+    def acquire(self, scope: str, new_chat: bool = False) -> Iterator[Any]:
+        """
+        Wait for the browser owning the conversation, or for the first available browser for a new conversation.
+        Yields a driver bound to the tab of the conversation, after opening a new chat in it if `new_chat`.
+        Statistics of the conversation are updated once the driver is released.
+        """
+        with metrics.timer("queue"), self.condition:
+            worker = self.condition.wait_for(lambda: self._find_available_worker(scope))
+            worker.busy_scopes.add(scope)
+            # Reserve the conversation so concurrent requests wait for this browser.
+            handle = worker.tabs.setdefault(scope, None)
+            worker.tabs.move_to_end(scope)
+        logging.debug(f"{worker} acquired for conversation {scope}")
+        try:
+            tab = create_tab_driver(worker.driver, worker.browser_lock)
+            is_new_tab = handle is None
+            if is_new_tab:
+                handle = self._open_tab(worker, tab)
+                with self.condition:
+                    worker.tabs[scope] = handle
+                    worker.stats[scope] = ConversationStats()
+                    old_tabs = worker.pop_old_tabs()
+                self._close_tabs(tab, old_tabs)
+            tab.switch_to.window(handle)
+            if new_chat and not is_new_tab:
+                self.chat_module.open_new_chat(tab)
+                with self.condition:
+                    worker.stats[scope] = ConversationStats()
+            start_time = time.monotonic()
+            yield tab
+            self._update_stats(worker, scope, tab, start_time)
+        finally:
+            with self.condition:
+                worker.busy_scopes.discard(scope)
+                self.condition.notify_all()
+            logging.debug(f"{worker} released by conversation {scope}")
+
+    def run(self, scope: str, func: Callable, *args, new_chat: bool = False):
+        with self.acquire(scope, new_chat) as driver:
+            return func(driver, *args)
+
+    def stream(self, scope: str, func: Callable, *args, new_chat: bool = False) -> Iterator:
+        """
+        Like `run` for generators: the tab is kept until the generator is exhausted.
+        """
+        with self.acquire(scope, new_chat) as driver:
+            yield from func(driver, *args)
+
+    def quit(self) -> None:
+        for worker in self.workers:
+            try:
+                worker.driver.quit()
+            except Exception as e:
+                logging.warning(f"Error closing browser of {worker}: {e}")
@@ -0,0 +1,269 @@
+import copy
+import importlib
+import logging
+import threading
+import time
+from types import ModuleType
+from typing import Callable, Dict, Iterator, List, Union
+
+from chapito.config import Config
+from chapito.tools.metrics import provider_label
+from chapito.tools.pool import BrowserPool
+from chapito.tools.specs import ProviderSpec, SpecWatcher, apply_spec
+from chapito.types import Chatbot
+
+IDLE_CHECK_INTERVAL_SECONDS: float = 30
+# Model selecting the least busy chatbot.
+AUTO_MODEL: str = "auto"
+# Weight of the latest request when updating the average duration of a chatbot.
+LATENCY_SMOOTHING: float = 0.2
+# Duration recorded for failed requests and empty answers, so the chatbot is avoided for a while.
+FAILURE_PENALTY_SECONDS: float = 120
+
+
+def get_provider_config(config: Config, chatbot: Chatbot) -> Config:
+    """
+    Browsers of different chatbots can't share a profile directory.
+    The default chatbot keeps the configured profile so existing sessions are reused.
+    """
+    provider_config = copy.copy(config)
+    provider_config.chatbot = chatbot
+    if chatbot != config.chatbot:
+        provider_config.browser_profile_path = f"{config.browser_profile_path}_{chatbot.value}"
+    return provider_config
+
+
+class ProviderRegistry:
+    """
+    Browser pools of the chatbots served by the proxy, selected by the `model` field of requests.
+    Pools are started on first use, and shut down after `idle_timeout` seconds without requests,
+    except the pool of the default chatbot: it keeps the proxy ready.
+    Chat modules can be given by name: they are imported when their chatbot starts.
+    Specs of `provider_specs` are applied to the chatbots, and reloaded into running ones when the file changes.
+    """
+
+    def __init__(self, chat_modules: Dict[Chatbot, Union[str, ModuleType]], config: Config):
+        self.chat_modules = dict(chat_modules)
+        self.config = config
+        self.pools: Dict[Chatbot, BrowserPool] = {}
+        # Requests using each pool: a pool in use is never shut down.
+        self.users: Dict[Chatbot, int] = {chatbot: 0 for chatbot in chat_modules}
+        self.last_used: Dict[Chatbot, float] = {}
+        # Average request duration of each chatbot.
+        self.latencies: Dict[Chatbot, float] = {}
+        self.lock = threading.Lock()
+        self.start_locks = {chatbot: threading.Lock() for chatbot in chat_modules}
+        self.stopped = threading.Event()
+        self.on_conversation_closed: Callable[[str], None] = lambda scope: None
+        # Chatbot name -> spec.
+        self.specs: Dict[str, ProviderSpec] = {}
+        self.spec_watcher = SpecWatcher(config.provider_specs, self.update_specs) if config.provider_specs else None
+        if self.spec_watcher:
+            self.spec_watcher.check()
+
+    @property
+    def pool_capacity(self) -> int:
+        """
+        Number of requests served at the same time by a chatbot.
+        """
+        return max(1, self.config.pool_size) * max(1, self.config.tabs_per_worker)
+
+    @property
+    def capacity(self) -> int:
+        """
+        Number of requests served at the same time by the live chatbots.
+        """
+        return self.pool_capacity * max(1, len(self.live_chatbots()))
+
+    def resolve(self, model: str) -> Chatbot:
+        """
+        Chatbot serving a model: `grok`, `mistral`, ... Other names (eg. `gpt-3.5-turbo`) go to the default chatbot.
+        """
+        try:
+            chatbot = Chatbot(model.lower())
+        except ValueError:
+            return self.config.chatbot
+        return chatbot if chatbot in self.chat_modules else self.config.chatbot
+
+    def get_load(self, chatbot: Chatbot) -> float:
+        """
+        Expected duration of a new request: average duration, times the requests in progress per slot.
+        Chatbots never used yet come first.
+        """
+        with self.lock:
+            return self.latencies.get(chatbot, 0.0) * (self.users[chatbot] + 1) / self.pool_capacity
+
+    def get_candidates(self, model: str) -> List[Chatbot]:
+        """
+        Chatbots able to answer a model, from the preferred one.
+        `auto` gives the chatbots of `auto_chatbots` (or the running ones), from the least busy.
+        """
+        if model.lower() != AUTO_MODEL:
+            return [self.resolve(model)]
+        chatbots = [chatbot for chatbot in self.config.auto_chatbots if chatbot in self.chat_modules]
+        if not chatbots:
+            chatbots = self.live_chatbots() or [self.config.chatbot]
+        return sorted(chatbots, key=self.get_load)
+
+    def live_chatbots(self) -> List[Chatbot]:
+        with self.lock:
+            return list(self.pools)
+
+    def is_ready(self) -> bool:
+        """
+        The default chatbot is started.
+        """
+        with self.lock:
+            return self.config.chatbot in self.pools
+
+    def _warm_up(self, chatbot: Chatbot) -> None:
+        try:
+            self.get_pool(chatbot)
+        except Exception as e:
+            logging.error(f"Can't start chatbot {chatbot.value}: {e}")
+
+    def start(self) -> None:
+        """
+        Start the default chatbot, so authentication can be done right away, and the chatbots used by `auto`.
+        Then watch idle pools.
+        """
+        if self.spec_watcher:
+            threading.Thread(
+                target=self.spec_watcher.watch, args=(self.stopped,), name="chapito-spec-watcher", daemon=True
+            ).start()
+        chatbots = dict.fromkeys([self.config.chatbot, *self.config.auto_chatbots])
+        warm_up_threads = [
+            threading.Thread(target=self._warm_up, args=(chatbot,), name=f"chapito-warm-up-{chatbot.value}")
+            for chatbot in chatbots
+            if chatbot in self.chat_modules
+        ]
+        for thread in warm_up_threads:
+            thread.start()
+        for thread in warm_up_threads:
+            thread.join()
+        if self.config.idle_timeout > 0:
+            threading.Thread(target=self._watch_idle_pools, name="chapito-idle-watcher", daemon=True).start()
+
+    def get_chat_module(self, chatbot: Chatbot) -> ModuleType:
+        chat_module = self.chat_modules[chatbot]
+        if isinstance(chat_module, str):
+            logging.debug(f"Importing {chat_module}")
+            chat_module = self.chat_modules[chatbot] = importlib.import_module(chat_module)
+            self.apply_spec(chatbot, chat_module)
+        return chat_module
+
+    def apply_spec(self, chatbot: Chatbot, chat_module: ModuleType) -> None:
+        provider = getattr(chat_module, "provider", None)
+        if provider is not None:
+            apply_spec(provider, self.specs.get(chatbot.value, {}))
+
+    def update_specs(self, specs: Dict[str, ProviderSpec]) -> None:
+        """
+        Apply new specs to the imported chatbots. Running browsers use them from their next request.
+        """
+        known_names = {chatbot.value for chatbot in self.chat_modules}
+        for name in specs.keys() - known_names:
+            logging.warning(f"Spec of unknown chatbot ignored: {name}")
+        self.specs = specs
+        for chatbot, chat_module in list(self.chat_modules.items()):
+            if not isinstance(chat_module, str):
+                self.apply_spec(chatbot, chat_module)
+
+    def get_pool(self, chatbot: Chatbot) -> BrowserPool:
+        with self.start_locks[chatbot]:
+            with self.lock:
+                pool = self.pools.get(chatbot)
+            if pool is None:
+                logging.info(f"Starting chatbot {chatbot.value}")
+                pool = BrowserPool(self.get_chat_module(chatbot), get_provider_config(self.config, chatbot))
+                pool.on_conversation_closed = lambda scope: self.on_conversation_closed(scope)
+                pool.start()
+                if self.stopped.is_set():
+                    # The proxy was stopped while the browsers were starting.
+                    pool.quit()
+                    raise RuntimeError(f"Chatbot {chatbot.value} started after shutdown")
+                with self.lock:
+                    self.pools[chatbot] = pool
+                    self.last_used[chatbot] = time.monotonic()
+            return pool
+
+    def _use_pool(self, chatbot: Chatbot) -> BrowserPool:
+        while True:
+            pool = self.get_pool(chatbot)
+            with self.lock:
+                # The pool may have been shut down meanwhile.
+                if self.pools.get(chatbot) is pool:
+                    self.users[chatbot] += 1
+                    return pool
+
+    def _release_pool(self, chatbot: Chatbot, start_time: float, answered: bool) -> None:
+        now = time.monotonic()
+        duration = now - start_time if answered else max(now - start_time, FAILURE_PENALTY_SECONDS)
+        with self.lock:
+            self.users[chatbot] -= 1
+            self.last_used[chatbot] = now
+            latency = self.latencies.get(chatbot, duration)
+            self.latencies[chatbot] = latency + LATENCY_SMOOTHING * (duration - latency)
+
+    def needs_rotation(self, chatbot: Chatbot, scope: str) -> bool:
+        with self.lock:
+            pool = self.pools.get(chatbot)
+        return pool is not None and pool.needs_rotation(scope)
+
+    def run(self, chatbot: Chatbot, scope: str, prompt: str, new_chat: bool = False) -> str:
+        pool = self._use_pool(chatbot)
+        start_time = time.monotonic()
+        answer = ""
+        try:
+            with provider_label(chatbot.value):
+                answer = pool.run(scope, pool.chat_module.send_request_and_get_response, prompt, new_chat=new_chat)
+            return answer
+        finally:
+            self._release_pool(chatbot, start_time, bool(answer))
+
+    def stream(self, chatbot: Chatbot, scope: str, prompt: str, new_chat: bool = False) -> Iterator[str]:
+        pool = self._use_pool(chatbot)
+        start_time = time.monotonic()
+        answered = False
+        try:
+            with provider_label(chatbot.value):
+                stream = pool.stream(
+                    scope, pool.chat_module.send_request_and_stream_response, prompt, new_chat=new_chat
+                )
+                for chunk in stream:
+                    answered = answered or bool(chunk)
+                    yield chunk
+        finally:
+            self._release_pool(chatbot, start_time, answered)
+
+    def _shut_down(self, pool: BrowserPool) -> None:
+        for worker in pool.workers:
+            for scope in worker.tabs:
+                self.on_conversation_closed(scope)
+        pool.quit()
+
+    def shut_down_idle_pools(self) -> None:
+        idle_since = time.monotonic() - self.config.idle_timeout
+        with self.lock:
+            idle_chatbots = [
+                chatbot
+                for chatbot in self.pools
+                if chatbot != self.config.chatbot and not self.users[chatbot] and self.last_used[chatbot] < idle_since
+            ]
+            idle_pools = [self.pools.pop(chatbot) for chatbot in idle_chatbots]
+        for chatbot, pool in zip(idle_chatbots, idle_pools):
+            logging.info(f"Shutting down idle chatbot {chatbot.value}")
+            self._shut_down(pool)
+
+    def _watch_idle_pools(self) -> None:
+        while not self.stopped.wait(IDLE_CHECK_INTERVAL_SECONDS):
+            self.shut_down_idle_pools()
+
+    def quit(self) -> None:
+        self.stopped.set()
+        with self.lock:
+            pools = list(self.pools.values())
+            self.pools.clear()
+        for pool in pools:
+            pool.quit()
+
@@ -0,0 +1,43 @@
+import logging
+from typing import Optional
+
+from selenium.common.exceptions import WebDriverException
+
+from chapito.config import Config
+
+DOM_SIZE_SCRIPT: str = 'return document.getElementsByTagName("*").length;'
+
+
+class ConversationStats:
+    """
+    Growth of a web conversation, since its chat was opened.
+    """
+
+    def __init__(self):
+        self.turns = 0
+        # Duration of the last request, in seconds.
+        self.last_duration = 0.0
+        # Number of elements in the page after the last answer.
+        self.dom_nodes = 0
+
+
+def measure_dom_size(driver) -> int:
+    try:
+        return int(driver.execute_script(DOM_SIZE_SCRIPT) or 0)
+    except WebDriverException as e:
+        logging.warning(f"Can't measure page size: {e}")
+        return 0
+
+
+def get_rotation_reason(stats: ConversationStats, config: Config) -> Optional[str]:
+    """
+    Long conversations slow down the page and the chatbot: tell why the conversation should move to a new chat.
+    Thresholds set to 0 are disabled.
+    """
+    if 0 < config.rotation_turns <= stats.turns:
+        return f"{stats.turns} turns"
+    if 0 < config.rotation_dom_nodes <= stats.dom_nodes:
+        return f"{stats.dom_nodes} elements in the page"
+    if 0 < config.rotation_latency <= stats.last_duration:
+        return f"last answer took {stats.last_duration:.1f}s"
+    return None
@@ -0,0 +1,120 @@
+import logging
+import os
+import threading
+import tomllib
+from enum import Enum
+from typing import Any, Callable, Dict, Optional, Set, Tuple
+
+# Page of a chatbot, eg. {"url": "https://grok.com/", "answer_locator": ["xpath", "//div"]}.
+ProviderSpec = Dict[str, Any]
+
+SPEC_CHECK_INTERVAL_SECONDS: float = 2
+# Types of the provider attributes that can be set by a spec. Cleaning steps and methods stay in the code.
+SPEC_FIELD_TYPES: Tuple[type, ...] = (str, int, float, tuple, Enum)
+
+# Serializes the updates of providers: the spec watcher and the chatbots being imported.
+spec_lock = threading.Lock()
+
+
+def load_specs(path: str) -> Dict[str, ProviderSpec]:
+    """
+    Read a TOML spec file: one table per chatbot (eg. `[grok]`).
+    """
+    with open(path, "rb") as file:
+        specs = tomllib.load(file)
+    return {name: spec for name, spec in specs.items() if isinstance(spec, dict)}
+
+
+def get_spec_fields(provider: Any) -> Set[str]:
+    provider_class = type(provider)
+    return {
+        field
+        for field in dir(provider_class)
+        if not field.startswith("_") and isinstance(getattr(provider_class, field), SPEC_FIELD_TYPES)
+    }
+
+
+def convert_spec_value(default: Any, value: Any) -> Any:
+    """
+    Check a spec value against the default value of the field, and give it the same type.
+    """
+    if isinstance(default, Enum):
+        return type(default)(value)
+    if isinstance(default, tuple):
+        if not isinstance(value, list) or len(value) != len(default):
+            raise ValueError(f"expected a list of {len(default)} items, got {value!r}")
+        return tuple(value)
+    if isinstance(default, bool):
+        if not isinstance(value, bool):
+            raise ValueError(f"expected a boolean, got {value!r}")
+        return value
+    if isinstance(default, (int, float)):
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise ValueError(f"expected a number, got {value!r}")
+        return value
+    if not isinstance(value, str):
+        raise ValueError(f"expected a string, got {value!r}")
+    return value
+
+
+def apply_spec(provider: Any, spec: ProviderSpec) -> None:
+    """
+    Set the fields of a running provider. Fields missing from the spec get their default value back.
+    Invalid fields are ignored.
+    """
+    fields = get_spec_fields(provider)
+    values = {}
+    for field, value in spec.items():
+        if field not in fields:
+            logging.warning(f"Unknown field in {provider.name} spec: {field}")
+            continue
+        try:
+            values[field] = convert_spec_value(getattr(type(provider), field), value)
+        except ValueError as e:
+            logging.warning(f"Invalid value for {field} in {provider.name} spec: {e}")
+    with spec_lock:
+        # Attributes are swapped in a single assignment: requests see either all the old or all the new values.
+        attributes = {name: value for name, value in vars(provider).items() if name not in fields}
+        attributes.update(values)
+        provider.__dict__ = attributes
+
+
+class SpecWatcher:
+    """
+    Reloads a spec file when it changes, and gives the new specs to `on_change`.
+    A file that can't be read is ignored: the previous specs are kept.
+    """
+
+    def __init__(self, path: str, on_change: Callable[[Dict[str, ProviderSpec]], None]):
+        self.path = path
+        self.on_change = on_change
+        # Modification time and size of the last file read.
+        self.version: Optional[Tuple[int, int]] = None
+
+    def check(self) -> bool:
+        """
+        Reload the file if it changed. Returns True when new specs were loaded.
+        """
+        try:
+            stat = os.stat(self.path)
+        except OSError as e:
+            if self.version != (0, 0):
+                logging.warning(f"Can't read provider specs: {e}")
+                self.version = (0, 0)
+            return False
+        version = (stat.st_mtime_ns, stat.st_size)
+        if version == self.version:
+            return False
+        self.version = version
+        try:
+            specs = load_specs(self.path)
+        except (OSError, tomllib.TOMLDecodeError) as e:
+            logging.error(f"Can't load provider specs from {self.path}, keeping previous ones: {e}")
+            return False
+        logging.info(f"Provider specs loaded from {self.path}")
+        self.on_change(specs)
+        return True
+
+    def watch(self, stopped: threading.Event) -> None:
+        while not stopped.wait(SPEC_CHECK_INTERVAL_SECONDS):
+            self.check()
@@ -0,0 +1,92 @@
+import logging
+import os.path
+import time
+from typing import Callable, Iterator, Optional
+
+from selenium.common.exceptions import StaleElementReferenceException, TimeoutException
+
+from chapito.tools.metrics import metrics
+from chapito.tools.tracing import traced_sleep
+
+POLL_INTERVAL_SECONDS: float = 0.3
+# Time given to the chatbot to display a new answer before trusting its "finished" state.
+START_GRACE_SECONDS: float = 5
+DEFAULT_IMPLICIT_WAIT_SECONDS: int = 10
+
+
+def get_stable_text(previous_text: str, current_text: str) -> str:
+    """
+    Part of the answer that didn't change between two polls.
+    The end of a growing answer is unstable (eg. a code block is closed after its last line).
+    """
+    return os.path.commonprefix([previous_text, current_text])
+
+
+def get_new_text(sent_text: str, text: str) -> str:
+    """
+    Text to send so the client ends up with `text`.
+    Already sent text can't be taken back, so nothing is sent if `text` doesn't extend it.
+    """
+    if len(text) <= len(sent_text) or not text.startswith(sent_text):
+        return ""
+    return text[len(sent_text) :]
+
+
+def stream_answer(
+    driver,
+    submit: Callable[[], None],
+    count_answers: Callable[[], int],
+    read_new_answer: Callable[[int, bool], Optional[str]],
+    is_answer_finished: Callable[[], bool],
+    timeout: float,
+) -> Iterator[str]:
+    """
+    Submit a prompt, then poll the answer bubble while it grows and yield the new text.
+    `read_new_answer` gives the last answer when there are more answers than the given count, else None.
+    Its second argument tells whether the answer is finished: only this final read records its stages.
+    Raises `TimeoutException` when the answer is not finished after `timeout` seconds.
+    """
+    driver.implicitly_wait(0)
+    answer_count = count_answers()
+    driver.implicitly_wait(DEFAULT_IMPLICIT_WAIT_SECONDS)
+    submit()
+
+    driver.implicitly_wait(0)
+    start_time = time.monotonic()
+    sent_text = ""
+    previous_text = ""
+    text = ""
+    try:
+        while True:
+            elapsed = time.monotonic() - start_time
+            if elapsed > timeout:
+                metrics.observe("generation", elapsed)
+                raise TimeoutException("Timeout while waiting for the end of the answer")
+            finished = is_answer_finished()
+            try:
+                answer = read_new_answer(answer_count, finished)
+            except StaleElementReferenceException:
+                # The bubble was re-rendered between the search and the read.
+                traced_sleep(POLL_INTERVAL_SECONDS)
+                continue
+            text = answer or ""
+            if finished and (answer is not None or elapsed > START_GRACE_SECONDS):
+                break
+            if new_text := get_new_text(sent_text, get_stable_text(previous_text, text)):
+                if not sent_text:
+                    metrics.observe("first_token", time.monotonic() - start_time)
+                sent_text += new_text
+                yield new_text
+            previous_text = text
+            traced_sleep(POLL_INTERVAL_SECONDS)
+    finally:
+        driver.implicitly_wait(DEFAULT_IMPLICIT_WAIT_SECONDS)
+    metrics.observe("generation", time.monotonic() - start_time)
+
+    if not text:
+        logging.warning("No message found.")
+    if new_text := get_new_text(sent_text, text):
+        yield new_text
+    elif not text.startswith(sent_text):
+        logging.warning("Answer was modified after being streamed, the client may receive a slightly different text")
+    logging.debug(f"Streamed message ends with: {text[-100:]}")
@@ -0,0 +1,96 @@
+import copy
+import logging
+import re
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from selenium.common.exceptions import NoSuchElementException
+from selenium.webdriver.remote.command import Command
+from selenium.webdriver.remote.switch_to import SwitchTo
+
+from chapito.tools.tracing import span
+
+FIND_POLL_INTERVAL_SECONDS: float = 0.2
+FIND_COMMANDS = (Command.FIND_ELEMENT, Command.FIND_CHILD_ELEMENT)
+FIND_ALL_COMMANDS = (Command.FIND_ELEMENTS, Command.FIND_CHILD_ELEMENTS)
+# Selenium runs some element commands as scripts named by a leading comment (eg. `get_attribute`).
+SCRIPT_NAME_PATTERN = re.compile(r"/\* (\w+) \*/")
+
+
+def get_span_args(driver_command: str, params: Optional[dict]) -> Dict[str, Any]:
+    """
+    Name of the command in the trace, and its locator for searches.
+    """
+    params = params or {}
+    if driver_command == Command.W3C_EXECUTE_SCRIPT:
+        match = SCRIPT_NAME_PATTERN.match(params.get("script", ""))
+        return {"name": match.group(1) if match else driver_command}
+    if driver_command in FIND_COMMANDS + FIND_ALL_COMMANDS:
+        return {"name": driver_command, "using": params.get("using"), "value": params.get("value")}
+    return {"name": driver_command}
+
+
+class BrowserLock:
+    """
+    Serializes the WebDriver commands of the tabs sharing a browser, and remembers the active tab.
+    """
+
+    def __init__(self, driver):
+        self.lock = threading.RLock()
+        self.current_handle: Optional[str] = driver.current_window_handle
+        # Implicit waits are emulated by the tabs: a waiting command must not block the other tabs.
+        driver.implicitly_wait(0)
+
+
+def create_tab_driver(driver, browser_lock: BrowserLock):
+    """
+    A view of the driver bound to its own tab, usable alongside the views of the other tabs.
+    Each command switches to the tab if needed and runs while holding the browser lock,
+    so requests interleave between commands: while a tab waits for its answer, another one can submit a prompt.
+    """
+    tab = copy.copy(driver)
+    tab._switch_to = SwitchTo(tab)
+    tab.handle = browser_lock.current_handle
+    tab.implicit_wait = 0.0
+    execute_command = type(driver).execute
+
+    def execute_in_tab(driver_command, params=None):
+        with browser_lock.lock:
+            if tab.handle and browser_lock.current_handle != tab.handle and driver_command != Command.SWITCH_TO_WINDOW:
+                execute_command(tab, Command.SWITCH_TO_WINDOW, {"handle": tab.handle})
+                browser_lock.current_handle = tab.handle
+            response = execute_command(tab, driver_command, params)
+            if driver_command == Command.SWITCH_TO_WINDOW:
+                tab.handle = browser_lock.current_handle = params["handle"]
+            elif driver_command == Command.CLOSE:
+                tab.handle = browser_lock.current_handle = None
+            return response
+
+    def execute(driver_command, params=None):
+        if driver_command == Command.SET_TIMEOUTS and params and set(params) == {"implicit"}:
+            tab.implicit_wait = params["implicit"] / 1000
+            return {"success": 0, "value": None, "sessionId": tab.session_id}
+        if tab.implicit_wait and driver_command in FIND_COMMANDS + FIND_ALL_COMMANDS:
+            with span("implicitWait", "wait", timeout=tab.implicit_wait):
+                return find_with_implicit_wait(driver_command, params)
+        with span(**get_span_args(driver_command, params)):
+            return execute_in_tab(driver_command, params)
+
+    def find_with_implicit_wait(driver_command, params):
+        # Release the browser between two searches.
+        deadline = time.monotonic() + tab.implicit_wait
+        while True:
+            try:
+                with span(**get_span_args(driver_command, params)):
+                    response = execute_in_tab(driver_command, params)
+                if driver_command in FIND_COMMANDS or response["value"] or time.monotonic() > deadline:
+                    return response
+            except NoSuchElementException:
+                if time.monotonic() > deadline:
+                    raise
+            time.sleep(FIND_POLL_INTERVAL_SECONDS)
+
+    tab.execute = execute
+    logging.debug(f"Tab view created on {tab.handle}")
+    return tab
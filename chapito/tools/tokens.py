@@ -0,0 +1,121 @@
+import hashlib
+import logging
+import math
+import os
+import re
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, Optional
+
+DEFAULT_TOKENIZER: str = "o200k_base"
+HEURISTIC_TOKENIZER: str = "heuristic"
+MAX_MEMOIZED_TEXTS: int = 4096
+# Texts shorter than this are counted again rather than hashed and memoized.
+MIN_MEMOIZED_LENGTH: int = 256
+
+# Words, numbers, single punctuation marks and line breaks, roughly like the pre-tokenizer of BPE encodings.
+PIECE_PATTERN: re.Pattern = re.compile(r"[^\W\d_]+|\d{1,3}|\n|[^\w\s]|_")
+# Characters per token of a word: common words are single tokens, long words are split.
+CHARS_PER_TOKEN: int = 6
+# BPE files of the tiktoken encodings, downloaded by tiktoken on first use then kept in its cache.
+ENCODING_FILES_URL: str = "https://openaipublic.blob.core.windows.net/encodings"
+ENCODING_FILES: Dict[str, str] = {
+    "r50k_base": f"{ENCODING_FILES_URL}/r50k_base.tiktoken",
+    "p50k_base": f"{ENCODING_FILES_URL}/p50k_base.tiktoken",
+    "p50k_edit": f"{ENCODING_FILES_URL}/p50k_base.tiktoken",
+    "cl100k_base": f"{ENCODING_FILES_URL}/cl100k_base.tiktoken",
+    "o200k_base": f"{ENCODING_FILES_URL}/o200k_base.tiktoken",
+    "o200k_harmony": f"{ENCODING_FILES_URL}/o200k_base.tiktoken",
+}
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Fast estimate of the number of BPE tokens: long words span several tokens, every symbol is a token.
+    Counts code much closer than whitespace-separated words.
+    """
+    return sum(math.ceil(len(piece) / CHARS_PER_TOKEN) for piece in PIECE_PATTERN.findall(text))
+
+
+def is_encoding_cached(name: str) -> bool:
+    """
+    Whether the BPE file of a tiktoken encoding is in the cache of tiktoken, which otherwise downloads it.
+    Encodings of tiktoken plugins are assumed available.
+    """
+    if name not in ENCODING_FILES:
+        return True
+    default_cache_dir = os.path.join(tempfile.gettempdir(), "data-gym-cache")
+    cache_dir = os.environ.get("TIKTOKEN_CACHE_DIR", os.environ.get("DATA_GYM_CACHE_DIR", default_cache_dir))
+    if not cache_dir:
+        return False
+    cache_key = hashlib.sha1(ENCODING_FILES[name].encode()).hexdigest()
+    return os.path.exists(os.path.join(cache_dir, cache_key))
+
+
+def load_encoder(name: str) -> Optional[Callable[[str], int]]:
+    """
+    Token counter of a tiktoken encoding, None when tiktoken or the encoding is not available.
+    Never downloads: an encoding missing from the cache of tiktoken is not available.
+    """
+    if name == HEURISTIC_TOKENIZER:
+        return None
+    try:
+        import tiktoken
+    except ImportError:
+        logging.debug("tiktoken is not installed, token counts are estimated")
+        return None
+    if not is_encoding_cached(name):
+        logging.warning(
+            f"Tokenizer {name} is not cached, token counts are estimated. "
+            f"Cache it with: python -c \"import tiktoken; tiktoken.get_encoding('{name}')\""
+        )
+        return None
+    try:
+        encoding = tiktoken.get_encoding(name)
+    except Exception as e:
+        logging.warning(f"Can't load tokenizer {name}, token counts are estimated: {e}")
+        return None
+    return lambda text: len(encoding.encode(text, disallowed_special=()))
+
+
+class TokenCounter:
+    """
+    Counts tokens with a BPE encoding when tiktoken is installed, with `estimate_tokens` otherwise.
+    Counts of long texts are memoized (LRU): the messages of a conversation are sent again on every turn.
+    The encoding is loaded on creation, at startup: not in requests, where it would block the event loop.
+    Thread-safe.
+    """
+
+    def __init__(self, tokenizer: str = DEFAULT_TOKENIZER, max_texts: int = MAX_MEMOIZED_TEXTS):
+        self.tokenizer = tokenizer
+        self.max_texts = max_texts
+        self.encoder = load_encoder(tokenizer)
+        # Digest of a text -> tokens, from the least recently used.
+        self.counts: OrderedDict[bytes, int] = OrderedDict()
+        self.lock = threading.Lock()
+
+    def _encode(self, text: str) -> int:
+        return self.encoder(text) if self.encoder is not None else estimate_tokens(text)
+
+    def count(self, text: str) -> int:
+        if len(text) < MIN_MEMOIZED_LENGTH:
+            return self._encode(text)
+        digest = hashlib.blake2b(text.encode(), digest_size=16).digest()
+        with self.lock:
+            tokens = self.counts.get(digest)
+            if tokens is not None:
+                self.counts.move_to_end(digest)
+                return tokens
+        tokens = self._encode(text)
+        with self.lock:
+            self.counts[digest] = tokens
+            while len(self.counts) > self.max_texts:
+                self.counts.popitem(last=False)
+        return tokens
+
+    def count_all(self, texts: Iterable[str]) -> int:
+        """
+        Tokens of texts sent one after the other, each text counted (and memoized) on its own.
+        """
+        return sum(self.count(text) for text in texts)
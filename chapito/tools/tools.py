@@ -2,15 +2,66 @@ import os
 import platform
 import time
 from chapito.config import Config
-from chapito.types import OsType
+from chapito.tools.tracing import traced_sleep
+from chapito.types import OsType, TransferStrategy
 from selenium.webdriver.common.keys import Keys
-import pyperclip
 import logging
-import requests
 import re
-from selenium_stealth import stealth
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
+import shutil
+import sys
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from selenium import webdriver
+
+# Browser, clipboard and HTTP libraries are imported when used: they are slow to import
+# and not needed by every command.
+
+# The chat page is checked with an implicit wait, retries only need a short pause.
+CHAT_LOAD_RETRY_SECONDS: float = 1
+VERSION_CHECK_TIMEOUT_SECONDS: float = 3
+# Files locking a profile to the browser using it.
+PROFILE_LOCK_FILES: tuple = ("SingletonLock", "SingletonSocket", "SingletonCookie", "lockfile", "*.lock")
+TRANSFER_TIMEOUT_SECONDS: float = 2
+TRANSFER_POLL_INTERVAL_SECONDS: float = 0.05
+# Browsers rewrite whitespaces in rich text editors (non-breaking spaces, paragraphs, ...).
+WHITESPACE_PATTERN: str = "[ \\t\\n\\r\\f\\v\\u00a0]+"
+FNV_OFFSET_BASIS: int = 2166136261
+FNV_PRIME: int = 16777619
+
+INSERT_PROMPT_SCRIPT: str = """
+const [element, text, requestedStrategy] = arguments;
+const strategy = requestedStrategy === "auto"
+    ? (element.isContentEditable ? "contenteditable" : "value")
+    : requestedStrategy;
+element.focus();
+if (strategy === "value") {
+    // React tracks the value set through the prototype setter, not the instance one.
+    const prototype = Object.getPrototypeOf(element);
+    Object.getOwnPropertyDescriptor(prototype, "value").set.call(element, text);
+    element.dispatchEvent(new Event("input", { bubbles: true }));
+    element.dispatchEvent(new Event("change", { bubbles: true }));
+} else {
+    window.getSelection().selectAllChildren(element);
+    // Rich text editors listen to the events fired by "insertText".
+    if (!document.execCommand("insertText", false, text)) {
+        element.textContent = text;
+        element.dispatchEvent(new InputEvent("input", { bubbles: true, inputType: "insertText", data: text }));
+    }
+}
+return strategy;
+"""
+
+READ_PROMPT_HASH_SCRIPT: str = """
+const [element, whitespacePattern, offsetBasis, prime] = arguments;
+const content = "value" in element ? element.value : element.innerText;
+const text = content.replace(new RegExp(whitespacePattern, "g"), "");
+let hash = offsetBasis;
+for (let i = 0; i < text.length; i++) {
+    hash = Math.imul(hash ^ text.charCodeAt(i), prime) >>> 0;
+}
+return hash;
+"""
 
 
 def get_os() -> OsType:
@@ -22,32 +73,69 @@ def get_os() -> OsType:
     return OsType.MACOS if platform.system() == "Darwin" else OsType.LINUX
 
 
+def get_prompt_hash(text: str) -> int:
+    """
+    FNV-1a hash of the text without whitespaces, computed on UTF-16 code units like in the browser.
+    """
+    encoding = "utf-16-le" if sys.byteorder == "little" else "utf-16-be"
+    data = re.sub(WHITESPACE_PATTERN, "", text).encode(encoding)
+    prompt_hash = FNV_OFFSET_BASIS
+    for code_unit in memoryview(data).cast("H"):
+        prompt_hash = ((prompt_hash ^ code_unit) * FNV_PRIME) & 0xFFFFFFFF
+    return prompt_hash
+
+
 def paste(textarea):
     logging.debug("Paste prompt")
-    if get_os() == OsType.MACOS:
-        textarea.send_keys(Keys.COMMAND, "v")
-    else:
-        textarea.send_keys(Keys.CONTROL, "v")
+    modifier = Keys.COMMAND if get_os() == OsType.MACOS else Keys.CONTROL
+    # Replace any previous content.
+    textarea.send_keys(modifier, "a")
+    textarea.send_keys(modifier, "v")
+
+
+def wait_for_prompt(driver, textarea, expected_hash: int) -> bool:
+    deadline = time.monotonic() + TRANSFER_TIMEOUT_SECONDS
+    while True:
+        prompt_hash = driver.execute_script(
+            READ_PROMPT_HASH_SCRIPT, textarea, WHITESPACE_PATTERN, FNV_OFFSET_BASIS, FNV_PRIME
+        )
+        if prompt_hash == expected_hash:
+            return True
+        if time.monotonic() > deadline:
+            return False
+        traced_sleep(TRANSFER_POLL_INTERVAL_SECONDS)
 
 
-def transfer_prompt(message, textarea) -> None:
+def transfer_prompt(message, textarea, strategy: TransferStrategy = TransferStrategy.AUTO) -> None:
+    """
+    Write the prompt directly in the page, then check that the chatbot input holds it.
+    The system clipboard is only used as a fallback: it's shared by all browsers.
+    """
     logging.debug("Transfering prompt to chatbot interface")
-    usePaste = True
-    if usePaste:
-        pyperclip.copy(message)
-        paste(textarea)
-    else:
-        # Send message line by line
-        for line in message.split("\n"):
-            # Don't send "\t" to browser to avoid focus change.
-            textarea.send_keys(line.replace("\t", "    "))
-            # Don't send "\n" to browser to avoid early submition.
-            textarea.send_keys(Keys.SHIFT, Keys.ENTER)
-    time.sleep(0.5)
+    driver = textarea.parent
+    expected_hash = get_prompt_hash(message)
+    if strategy != TransferStrategy.CLIPBOARD:
+        used_strategy = driver.execute_script(INSERT_PROMPT_SCRIPT, textarea, message, strategy.value)
+        if wait_for_prompt(driver, textarea, expected_hash):
+            logging.debug(f"Prompt transfered ({used_strategy})")
+            return
+        logging.warning(f"Prompt transfer failed ({used_strategy}), falling back to clipboard")
+
+    import pyperclip
+
+    pyperclip.copy(message)
+    paste(textarea)
+    if not wait_for_prompt(driver, textarea, expected_hash):
+        logging.warning("Can't confirm the prompt was transfered")
+        return
     logging.debug("Prompt transfered")
 
 
-def create_driver(config: Config) -> webdriver.Chrome | webdriver.Firefox:
+def create_driver(config: Config) -> "webdriver.Chrome | webdriver.Firefox":
+    from selenium import webdriver
+    from selenium.webdriver.chrome.options import Options
+    from selenium_stealth import stealth
+
     chrome_options = Options()
     chrome_options.add_argument("--disable-blink-features=AutomationControlled")
     chrome_options.add_argument(f"user-agent={config.browser_user_agent}")
@@ -55,8 +143,11 @@ def create_driver(config: Config) -> webdriver.Chrome | webdriver.Firefox:
     chrome_options.add_argument("--log-level=1")
     chrome_options.add_experimental_option("excludeSwitches", ["enable-automation", "enable-logging"])
     chrome_options.add_experimental_option("useAutomationExtension", False)
+    # Don't wait for images and late resources: the chat interface is checked by each chatbot.
+    chrome_options.page_load_strategy = "eager"
     if config.use_browser_profile:
         browser_profile_path = os.path.abspath(config.browser_profile_path)
+        seed_browser_profile(browser_profile_path, config.browser_profile_template)
         os.makedirs(browser_profile_path, exist_ok=True)
         chrome_options.add_argument(f"user-data-dir={browser_profile_path}")
 
@@ -73,6 +164,20 @@ def create_driver(config: Config) -> webdriver.Chrome | webdriver.Firefox:
     return driver
 
 
+def seed_browser_profile(browser_profile_path: str, template_path: str) -> None:
+    """
+    Create a new profile from a template (eg. an authenticated profile), so the browser skips its first run
+    and the chatbot doesn't ask to log in.
+    """
+    if not template_path or os.path.isdir(browser_profile_path):
+        return
+    if not os.path.isdir(template_path):
+        logging.warning(f"Browser profile template not found: {template_path}")
+        return
+    logging.info(f"Creating browser profile {browser_profile_path} from {template_path}")
+    shutil.copytree(template_path, browser_profile_path, ignore=shutil.ignore_patterns(*PROFILE_LOCK_FILES))
+
+
 def check_official_version(version: str) -> bool:
     try:
         official_version = get_last_version()
@@ -88,7 +193,12 @@ def check_official_version(version: str) -> bool:
 
 
 def get_last_version() -> str:
-    response = requests.get("https://raw.githubusercontent.com/Yajusta/Chapito/refs/heads/main/pyproject.toml")
+    import requests
+
+    response = requests.get(
+        "https://raw.githubusercontent.com/Yajusta/Chapito/refs/heads/main/pyproject.toml",
+        timeout=VERSION_CHECK_TIMEOUT_SECONDS,
+    )
     response.raise_for_status()
     if match := re.search(r'version\s*=\s*"([^"]+)"', response.text):
         return match[1]
@@ -0,0 +1,96 @@
+import contextlib
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional
+
+# Trace of the request served by the current thread, None when tracing is disabled.
+current_trace: ContextVar[Optional["Trace"]] = ContextVar("chapito_trace", default=None)
+
+
+def create_trace_id() -> str:
+    return uuid.uuid4().hex
+
+
+class Trace:
+    """
+    Spans of a request, as Chrome trace events ("complete" events, timestamps in microseconds).
+    Spans are recorded by the event loop and by the browser threads.
+    """
+
+    def __init__(self, trace_id: str):
+        self.trace_id = trace_id
+        self.start_time = time.time_ns() // 1000
+        self.events: List[Dict[str, Any]] = []
+        self.lock = threading.Lock()
+
+    def add(self, name: str, category: str, start_time: int, duration: int, args: Dict[str, Any]) -> None:
+        event = {
+            "name": name,
+            "cat": category,
+            "ph": "X",
+            "ts": start_time,
+            "dur": duration,
+            "pid": os.getpid(),
+            "tid": threading.get_ident(),
+            "args": {"trace_id": self.trace_id, **args},
+        }
+        with self.lock:
+            self.events.append(event)
+
+    def finish(self, name: str, **args) -> List[Dict[str, Any]]:
+        """
+        Add the span of the whole request and return all the events.
+        """
+        self.add(name, "request", self.start_time, time.time_ns() // 1000 - self.start_time, args)
+        with self.lock:
+            return sorted(self.events, key=lambda event: event["ts"])
+
+
+@contextlib.contextmanager
+def span(name: str, category: str = "selenium", **args) -> Iterator[None]:
+    trace = current_trace.get()
+    if trace is None:
+        yield
+        return
+    start_time = time.time_ns() // 1000
+    start_counter = time.perf_counter_ns()
+    try:
+        yield
+    finally:
+        trace.add(name, category, start_time, (time.perf_counter_ns() - start_counter) // 1000, args)
+
+
+def traced_sleep(seconds: float) -> None:
+    """
+    `time.sleep`, shown in the trace.
+    """
+    with span("sleep", "wait", seconds=seconds):
+        time.sleep(seconds)
+
+
+class TraceWriter:
+    """
+    Appends the events of finished traces to a file in the Chrome "JSON array" trace format, one event per line.
+    The closing bracket is optional in this format: the file can be opened in a trace viewer
+    (chrome://tracing, https://ui.perfetto.dev) while the proxy is still writing to it.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.Lock()
+
+    def write(self, events: List[Dict[str, Any]]) -> None:
+        lines = "".join(json.dumps(event, separators=(",", ":")) + ",\n" for event in events)
+        with self.lock:
+            try:
+                with open(self.path, "a", encoding="utf-8") as file:
+                    if file.tell() == 0:
+                        file.write("[\n")
+                    file.write(lines)
+            except OSError as e:
+                logging.warning(f"Can't write trace to {self.path}: {e}")
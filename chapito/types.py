@@ -18,3 +18,14 @@ class Chatbot(Enum):
     ANTHROPIC = "anthropic"
     GITHUB = "github"
     DUCKDUCKGO = "duckduckgo"
+
+
+class TransferStrategy(Enum):
+    # Let the browser choose from the kind of element.
+    AUTO = "auto"
+    # <textarea> and <input>: native value setter.
+    VALUE = "value"
+    # Rich text editors (ProseMirror, Lexical, ...): "insertText" command.
+    CONTENT_EDITABLE = "contenteditable"
+    # System clipboard and Ctrl/Cmd+V.
+    CLIPBOARD = "clipboard"
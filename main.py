@@ -1,57 +1,43 @@
+import logging
+import threading
+
 from chapito.config import Config
-from chapito import (
-    anthropic_chat,
-    deepseek_chat,
-    duckduckgo_chat,
-    gemini_chat,
-    grok_chat,
-    mistral_chat,
-    openai_chat,
-    perplexity_chat,
-)
 from chapito.proxy import init_proxy
+from chapito.tools.providers import ProviderRegistry
 from chapito.tools.tools import check_official_version, greeting
 from chapito.types import Chatbot
 
 __version__ = "0.1.9"
 
+# Chat modules are imported when their chatbot starts.
+CHAT_MODULES = {
+    Chatbot.GROK: "chapito.grok_chat",
+    Chatbot.MISTRAL: "chapito.mistral_chat",
+    Chatbot.PERPLEXITY: "chapito.perplexity_chat",
+    Chatbot.OPENAI: "chapito.openai_chat",
+    Chatbot.GEMINI: "chapito.gemini_chat",
+    Chatbot.DEEPSEEK: "chapito.deepseek_chat",
+    Chatbot.ANTHROPIC: "chapito.anthropic_chat",
+    Chatbot.DUCKDUCKGO: "chapito.duckduckgo_chat",
+}
+
 
 def main():
     greeting(__version__)
     config = Config()
-    check_official_version(__version__)
-
-    if config.chatbot == Chatbot.GROK:
-        driver = grok_chat.initialize_driver(config)
-        init_proxy(driver, grok_chat.send_request_and_get_response, config)
-
-    if config.chatbot == Chatbot.MISTRAL:
-        driver = mistral_chat.initialize_driver(config)
-        init_proxy(driver, mistral_chat.send_request_and_get_response, config)
-
-    if config.chatbot == Chatbot.PERPLEXITY:
-        driver = perplexity_chat.initialize_driver(config)
-        init_proxy(driver, perplexity_chat.send_request_and_get_response, config)
-
-    if config.chatbot == Chatbot.OPENAI:
-        driver = openai_chat.initialize_driver(config)
-        init_proxy(driver, openai_chat.send_request_and_get_response, config)
-
-    if config.chatbot == Chatbot.GEMINI:
-        driver = gemini_chat.initialize_driver(config)
-        init_proxy(driver, gemini_chat.send_request_and_get_response, config)
-
-    if config.chatbot == Chatbot.DEEPSEEK:
-        driver = deepseek_chat.initialize_driver(config)
-        init_proxy(driver, deepseek_chat.send_request_and_get_response, config)
-
-    if config.chatbot == Chatbot.ANTHROPIC:
-        driver = anthropic_chat.initialize_driver(config)
-        init_proxy(driver, anthropic_chat.send_request_and_get_response, config)
-
-    if config.chatbot == Chatbot.DUCKDUCKGO:
-        driver = duckduckgo_chat.initialize_driver(config)
-        init_proxy(driver, duckduckgo_chat.send_request_and_get_response, config)
+    threading.Thread(target=check_official_version, args=(__version__,), name="chapito-version", daemon=True).start()
+
+    if config.chatbot not in CHAT_MODULES:
+        logging.error(f"Chatbot not supported yet: {config.chatbot.value}")
+        return
+
+    providers = ProviderRegistry(CHAT_MODULES, config)
+    # Browsers start in the background: the server is listening meanwhile, see `/health/ready`.
+    threading.Thread(target=providers.start, name="chapito-warm-up", daemon=True).start()
+    try:
+        init_proxy(providers, config)
+    finally:
+        providers.quit()
 
 
 if __name__ == "__main__":
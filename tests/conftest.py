@@ -0,0 +1,91 @@
+import itertools
+from types import SimpleNamespace
+
+import pytest
+from selenium.webdriver.remote.command import Command
+from selenium.webdriver.remote.switch_to import SwitchTo
+from selenium.webdriver.remote.webdriver import WebDriver
+
+from chapito.config import Config
+from chapito.types import Chatbot
+
+
+class FakeDriver(WebDriver):
+    """
+    Minimal stand-in for a Selenium driver: only tracks tabs, scripts return the size of the page.
+    The browser state is shared with the copies of the driver, like a real session.
+    """
+
+    def __init__(self, profile_path: str = ""):
+        # No remote end: commands are answered by `execute`.
+        self.session_id = f"session-{profile_path}"
+        self._switch_to = SwitchTo(self)
+        self.fake_browser = SimpleNamespace(
+            profile_path=profile_path,
+            handle_counter=itertools.count(),
+            window_handles=[],
+            current_window_handle=None,
+            implicit_wait=0,
+            loaded_chats=0,
+            dom_nodes=0,
+        )
+        self.switch_to.new_window("tab")
+
+    def execute(self, driver_command: str, params: dict = None) -> dict:
+        browser = self.fake_browser
+        value = None
+        if driver_command == Command.NEW_WINDOW:
+            handle = f"tab-{next(browser.handle_counter)}"
+            browser.window_handles.append(handle)
+            value = {"handle": handle, "type": params["type"]}
+        elif driver_command == Command.SWITCH_TO_WINDOW:
+            assert params["handle"] in browser.window_handles
+            browser.current_window_handle = params["handle"]
+        elif driver_command == Command.CLOSE:
+            browser.window_handles.remove(browser.current_window_handle)
+            browser.current_window_handle = None
+        elif driver_command == Command.W3C_GET_CURRENT_WINDOW_HANDLE:
+            value = browser.current_window_handle
+        elif driver_command == Command.W3C_GET_WINDOW_HANDLES:
+            value = list(browser.window_handles)
+        elif driver_command == Command.SET_TIMEOUTS:
+            browser.implicit_wait = params.get("implicit", browser.implicit_wait)
+        elif driver_command == Command.W3C_EXECUTE_SCRIPT:
+            value = browser.dom_nodes
+        else:
+            raise NotImplementedError(driver_command)
+        return {"value": value}
+
+    def quit(self) -> None:
+        self.fake_browser.window_handles.clear()
+
+
+def make_config(**values) -> Config:
+    """
+    Config with the defaults of `Config`, without reading the command line nor the config file.
+    Browsers use the "profile" profile and idle chatbots are never shut down.
+    """
+    config = Config.__new__(Config)
+    config.browser_profile_path = "profile"
+    config.chatbot = Chatbot.GROK
+    config.idle_timeout = 0
+    for key, value in values.items():
+        setattr(config, key, value)
+    return config
+
+
+def open_new_chat(driver: FakeDriver) -> None:
+    driver.fake_browser.loaded_chats += 1
+
+
+@pytest.fixture
+def fake_chat_module():
+    def make_chat_module(send_request_and_get_response=None, send_request_and_stream_response=None):
+        return SimpleNamespace(
+            initialize_driver=lambda config: FakeDriver(config.browser_profile_path),
+            open_new_chat=open_new_chat,
+            send_request_and_get_response=send_request_and_get_response,
+            send_request_and_stream_response=send_request_and_stream_response,
+        )
+
+    return make_chat_module
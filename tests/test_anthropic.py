@@ -26,6 +26,7 @@ def test_clean_chat_answer() -> None:
 
     expected = """
 index.html
+
 ```
 <!DOCTYPE html>
 <html lang="fr">
@@ -0,0 +1,52 @@
+from unittest.mock import patch
+
+from chapito.tools.cache import ResponseCache, get_cache_key
+
+
+def test_key_depends_on_model_and_prompt() -> None:
+    assert get_cache_key("chapito", "Hello") == get_cache_key("chapito", "Hello")
+    assert get_cache_key("chapito", "Hello") != get_cache_key("other", "Hello")
+    assert get_cache_key("chapito", "Hello") != get_cache_key("chapito", "Hello!")
+
+
+def test_least_recently_used_answers_are_evicted_above_max_bytes() -> None:
+    key_size = len(get_cache_key("", ""))
+    cache = ResponseCache(max_bytes=2 * (key_size + 10))
+    for prompt in ("a", "b"):
+        cache.put(get_cache_key("chapito", prompt), "0123456789")
+    cache.get(get_cache_key("chapito", "a"))
+    cache.put(get_cache_key("chapito", "c"), "0123456789")
+    assert cache.get(get_cache_key("chapito", "a")) == "0123456789"
+    assert cache.get(get_cache_key("chapito", "b")) is None
+    assert len(cache) == 2
+
+
+def test_answers_expire() -> None:
+    cache = ResponseCache(ttl=10)
+    with patch("chapito.tools.cache.time.time", return_value=1000):
+        cache.put("key", "answer")
+    with patch("chapito.tools.cache.time.time", return_value=1005):
+        assert cache.get("key") == "answer"
+    with patch("chapito.tools.cache.time.time", return_value=1011):
+        assert cache.get("key") is None
+
+
+def test_answers_survive_restarts_with_sqlite(tmp_path) -> None:
+    path = str(tmp_path / "cache.sqlite")
+    ResponseCache(path=path).put("key", "answer")
+    cache = ResponseCache(path=path)
+    assert cache.get("key") == "answer"
+    assert cache.purge() == 1
+    assert ResponseCache(path=path).get("key") is None
+
+
+def test_memory_tier_never_reads_nor_writes_sqlite(tmp_path) -> None:
+    path = str(tmp_path / "cache.sqlite")
+    cache = ResponseCache(path=path)
+    cache.put_in_memory("key", "answer")
+    assert ResponseCache(path=path).get("key") is None
+    cache.put_in_database("key", "answer")
+    restarted = ResponseCache(path=path)
+    assert restarted.get_from_memory("key") is None
+    assert restarted.get_from_database("key") == "answer"
+    assert restarted.get_from_memory("key") == "answer"
@@ -0,0 +1,42 @@
+from chapito.tools.compaction import REPEATED_CODE_BLOCK, REPEATED_TOOL_OUTPUT, compact_messages
+
+
+def count_tokens(text: str) -> int:
+    return len(text) // 4
+
+
+def test_repeated_system_messages_and_contents_are_removed() -> None:
+    file = "```python\n" + "print('line')\n" * 20 + "```"
+    output = "test_a PASSED\n" * 20
+    messages = [
+        ("system", "Be concise."),
+        ("user", f"Fix it:\n{file}"),
+        ("tool", output),
+        ("system", "Be  concise."),
+        ("user", f"Still broken:\n{file}"),
+        ("tool", output),
+    ]
+    assert compact_messages(messages, 10000, count_tokens) == [
+        ("system", "Be concise."),
+        ("user", f"Fix it:\n{REPEATED_CODE_BLOCK}"),
+        ("tool", REPEATED_TOOL_OUTPUT),
+        ("user", f"Still broken:\n{file}"),
+        ("tool", output),
+    ]
+
+
+def test_old_tool_outputs_are_shortened_first_above_the_budget() -> None:
+    messages = [
+        ("system", "s" * 4000),
+        ("user", "u" * 4000),
+        ("tool", "t" * 4000),
+        *[("user", f"Question {index}") for index in range(4)],
+    ]
+    compacted = compact_messages(messages, 2500, count_tokens)
+    assert compacted[:2] == messages[:2]
+    assert "[... 3100 characters omitted ...]" in compacted[2][1]
+    assert compacted[3:] == messages[3:]
+    compacted = compact_messages(messages, 1500, count_tokens)
+    assert compacted[0] == messages[0]
+    assert "omitted" in compacted[1][1]
+    assert compacted[3:] == messages[3:]
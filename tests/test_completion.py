@@ -0,0 +1,44 @@
+from unittest.mock import MagicMock, patch
+
+from chapito.tools.completion import get_turn_status, wait_for_completion
+from chapito.tools.metrics import metrics
+
+
+def make_driver(*states) -> MagicMock:
+    driver = MagicMock()
+    driver.execute_script.side_effect = list(states)
+    return driver
+
+
+def test_turn_needs_quiet_page_and_done_marker() -> None:
+    assert get_turn_status(make_driver({"quietFor": 2, "mutations": 5, "done": True}), "button", 1) is True
+    assert get_turn_status(make_driver({"quietFor": 0.2, "mutations": 5, "done": True}), "button", 1) is False
+    assert get_turn_status(make_driver({"quietFor": 2, "mutations": 5, "done": False}), "button", 1) is False
+    # Nothing happened since the prompt was submitted.
+    assert get_turn_status(make_driver({"quietFor": 2, "mutations": 0, "done": True}), "button", 1) is False
+
+
+def test_done_marker_before_the_new_answer_is_not_finished() -> None:
+    # Disabled submit button displayed as soon as the prompt is sent, the answer not started yet.
+    waiting = {"quietFor": 1.5, "mutations": 2, "done": True, "newAnswer": False}
+    assert get_turn_status(make_driver(waiting), "button", 1) is False
+    assert get_turn_status(make_driver({**waiting, "newAnswer": True}), "button", 1) is True
+    started = {**waiting, "quietFor": 0, "newAnswer": True}
+    driver = make_driver(waiting, waiting, started, {**waiting, "newAnswer": True})
+    with patch("chapito.tools.completion.POLL_INTERVAL_SECONDS", 0):
+        assert wait_for_completion(driver, "button", 1, timeout=5) is True
+    assert driver.execute_script.call_count == 4
+
+
+def test_wait_reports_lost_observer() -> None:
+    driver = make_driver({"quietFor": 0, "mutations": 1, "done": False}, None)
+    assert wait_for_completion(driver, "button", 1, timeout=5) is False
+
+
+def test_first_token_is_the_first_text_of_the_new_answer() -> None:
+    metrics.reset()
+    finished = {"quietFor": 2, "mutations": 5, "done": True}
+    assert wait_for_completion(make_driver({**finished, "firstAnswerTextAfter": None}), "button", 1, timeout=5)
+    assert 'stage="first_token"' not in metrics.render()
+    assert wait_for_completion(make_driver({**finished, "firstAnswerTextAfter": 1.5}), "button", 1, timeout=5)
+    assert 'stage="first_token"} 1.5' in metrics.render()
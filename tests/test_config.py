@@ -1,4 +1,5 @@
 import argparse
+import shutil
 import pytest
 from chapito.config import DEFAULT_BROWSER_PROFILE_PATH, DEFAULT_USE_BROWSER_PROFILE, Config
 from unittest.mock import patch
@@ -114,3 +115,17 @@ browser_profile_path = {file_profile_path}
         assert config.config_path == (cli_config if cli_config == "config_test.ini" else expected_config_path)
         assert config.use_browser_profile == expected_use_browser_profile
         assert config.browser_profile_path == expected_profile_path
+
+
+def test_zero_on_the_command_line_disables_thresholds(tmp_path, monkeypatch) -> None:
+    shutil.copy("config.ini.sample", tmp_path / "config.ini.sample")
+    (tmp_path / "config.ini").write_text(
+        "[DEFAULT]\nidle_timeout = 900\nrotation_turns = 20\nrotation_latency = 60\nprompt_budget = 32000\n"
+    )
+    monkeypatch.chdir(tmp_path)
+    arguments = ["main.py", "--idle-timeout", "0", "--rotation-turns", "0", "--rotation-latency", "0"]
+    arguments += ["--prompt-budget", "0"]
+    with patch("sys.argv", arguments):
+        config = Config()
+    assert (config.idle_timeout, config.rotation_turns, config.rotation_latency) == (0, 0, 0)
+    assert config.prompt_budget == 0
@@ -0,0 +1,71 @@
+import html
+import importlib
+import os
+from typing import Tuple
+
+import pytest
+
+from chapito.tools.markdown import html_to_markdown
+
+try:
+    import pytest_benchmark
+except ImportError:
+    pytest_benchmark = None
+
+CORPUS_PATH: str = os.path.join(os.path.dirname(os.path.abspath(__file__)), "corpus")
+CHATBOTS = ["anthropic", "deepseek", "duckduckgo", "gemini", "grok", "mistral", "openai", "perplexity"]
+SIZES = ["small", "medium", "huge"]
+# Huge answers: the code block of the fixture is filled with generated code (3 lines per function).
+CODE_LINES_MARKER: str = "@@CODE_LINES@@"
+HUGE_FUNCTIONS: int = 1000
+HUGE_FUNCTION: str = (
+    "def step_{index}(values: list) -> int:\n    return sum(value for value in values if value < {index})\n\n"
+)
+
+
+def get_huge_code() -> str:
+    return "".join(HUGE_FUNCTION.format(index=index) for index in range(HUGE_FUNCTIONS))
+
+
+def load_case(chatbot: str, size: str) -> Tuple[str, str]:
+    """
+    HTML of an answer and its golden Markdown, written by hand.
+    """
+    base_path = os.path.join(CORPUS_PATH, chatbot, size)
+    with open(f"{base_path}.html", encoding="utf-8") as file:
+        answer_html = file.read().replace(CODE_LINES_MARKER, html.escape(get_huge_code(), quote=False))
+    with open(f"{base_path}.md", encoding="utf-8") as file:
+        expected = file.read().rstrip("\n")
+    return answer_html, expected.replace(CODE_LINES_MARKER, get_huge_code().rstrip("\n"))
+
+
+def convert_answer(chatbot: str, answer_html: str) -> str:
+    """
+    Conversion of the chatbot's answers, in the page (mirrored by `html_to_markdown`) or by `clean_chat_answer`.
+    DuckDuckGo's `clean_chat_answer` only normalizes the text of its copy button.
+    """
+    provider = importlib.import_module(f"chapito.{chatbot}_chat").provider
+    return html_to_markdown(answer_html, provider.code_block_selector, provider.skip_selector)
+
+
+@pytest.mark.parametrize("size", SIZES)
+@pytest.mark.parametrize("chatbot", CHATBOTS)
+def test_conversion_matches_golden(chatbot: str, size: str) -> None:
+    answer_html, expected = load_case(chatbot, size)
+    markdown = convert_answer(chatbot, answer_html)
+    if chatbot != "duckduckgo":
+        assert importlib.import_module(f"chapito.{chatbot}_chat").clean_chat_answer(answer_html) == markdown
+    assert markdown == expected
+
+
+@pytest.mark.benchmark
+@pytest.mark.skipif(pytest_benchmark is None, reason="pytest-benchmark is not installed")
+@pytest.mark.parametrize("size", SIZES)
+@pytest.mark.parametrize("chatbot", CHATBOTS)
+def test_conversion_speed(benchmark, chatbot: str, size: str) -> None:
+    answer_html, expected = load_case(chatbot, size)
+    benchmark.group = f"conversion[{size}]"
+    assert benchmark(convert_answer, chatbot, answer_html) == expected
+    size_kb = len(answer_html.encode()) / 1024
+    benchmark.extra_info["size_kb"] = round(size_kb, 1)
+    benchmark.extra_info["us_per_kb"] = round(benchmark.stats.stats.mean * 1_000_000 / size_kb, 2)
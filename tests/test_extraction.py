@@ -0,0 +1,135 @@
+import json
+import shutil
+import subprocess
+from html.parser import HTMLParser
+from unittest.mock import MagicMock
+
+import pytest
+from selenium.common.exceptions import JavascriptException
+from selenium.webdriver.common.by import By
+
+from chapito.base_chat import BaseChatProvider
+from chapito.tools.extraction import EXTRACT_ANSWER_SCRIPT
+from chapito.tools.markdown import VOID_ELEMENTS, html_to_markdown
+from chapito.tools.metrics import metrics
+
+# Just enough DOM for the extractor: elements with tag, classes, children and simple selectors.
+DOM_SHIM: str = """
+const Node = { ELEMENT_NODE: 1, TEXT_NODE: 3 };
+function matchesSelectors(element, selectors) {
+    return selectors.split(",").map((selector) => selector.trim()).filter(Boolean).some((selector) => {
+        const [tag, ...classes] = selector.split(".");
+        return (!tag || tag === element.localName) && classes.every((name) => element.classList.includes(name));
+    });
+}
+function build(node) {
+    if (typeof node === "string") {
+        return { nodeType: Node.TEXT_NODE, data: node };
+    }
+    const element = { nodeType: Node.ELEMENT_NODE, localName: node.tag, classList: node.classes };
+    element.childNodes = node.children.map(build);
+    element.matches = (selectors) => matchesSelectors(element, selectors);
+    return element;
+}
+const [tree, args] = JSON.parse(require("fs").readFileSync(0, "utf8"));
+const root = build(tree);
+const document = { querySelectorAll: () => [root] };
+const result = (function () {
+%s
+}).apply(null, args);
+process.stdout.write(JSON.stringify(result));
+"""
+
+
+class FakeChat(BaseChatProvider):
+    name = "Fake"
+    answer_locator = (By.XPATH, "//div[@class='answer']")
+
+
+def test_answer_is_read_in_a_single_browser_call() -> None:
+    driver = MagicMock()
+    driver.execute_script.return_value = {"count": 42, "markdown": "Hello `world`"}
+    assert FakeChat().read_answer(driver) == "Hello `world`"
+    assert driver.execute_script.call_count == 1
+    assert driver.execute_script.call_args.args[1:3] == (By.XPATH, "//div[@class='answer']")
+    driver.find_elements.assert_not_called()
+
+
+def test_no_new_answer_is_none() -> None:
+    driver = MagicMock()
+    driver.execute_script.return_value = {"count": 2, "markdown": None}
+    assert FakeChat().read_new_answer(driver, 2) is None
+
+
+def test_only_the_final_read_records_its_stages() -> None:
+    metrics.reset()
+    driver = MagicMock()
+    driver.execute_script.side_effect = JavascriptException("Invalid selector")
+    bubble = MagicMock()
+    bubble.get_attribute.return_value = "<div><p>Hello</p></div>"
+    driver.find_elements.return_value = [bubble]
+    for _ in range(3):
+        FakeChat().read_new_answer(driver, 0, final=False)
+    assert 'stage="extraction"' not in metrics.render()
+    FakeChat().read_new_answer(driver, 0)
+    assert 'chapito_stage_duration_seconds_count{provider="",stage="extraction"} 1' in metrics.render()
+    assert 'chapito_stage_duration_seconds_count{provider="",stage="cleaning"} 1' in metrics.render()
+
+
+def test_answer_is_read_with_webdriver_when_the_page_cannot_run_the_extractor() -> None:
+    driver = MagicMock()
+    driver.execute_script.side_effect = JavascriptException("Invalid selector")
+    bubble = MagicMock()
+    bubble.get_attribute.return_value = "<div><p>Hello <code>world</code></p></div>"
+    driver.find_elements.return_value = [MagicMock(), bubble]
+    assert FakeChat().read_answer(driver) == "Hello `world`"
+
+
+class TreeBuilder(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.root = {"tag": "div", "classes": ["answer"], "children": []}
+        self.stack = [self.root]
+
+    def handle_starttag(self, tag, attrs) -> None:
+        element = {"tag": tag, "classes": (dict(attrs).get("class") or "").split(), "children": []}
+        self.stack[-1]["children"].append(element)
+        if tag not in VOID_ELEMENTS:
+            self.stack.append(element)
+
+    def handle_endtag(self, tag) -> None:
+        if tag not in VOID_ELEMENTS:
+            self.stack.pop()
+
+    def handle_data(self, data) -> None:
+        self.stack[-1]["children"].append(data)
+
+
+def extract_in_node(html: str, code_block_selector: str, skip_selector: str) -> str:
+    builder = TreeBuilder()
+    builder.feed(html)
+    arguments = [builder.root, ["css selector", "div.answer", code_block_selector, skip_selector, 0]]
+    result = subprocess.run(
+        ["node", "-e", DOM_SHIM % EXTRACT_ANSWER_SCRIPT],
+        input=json.dumps(arguments),
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(result.stdout)["markdown"]
+
+
+@pytest.mark.skipif(shutil.which("node") is None, reason="Node.js is not installed")
+@pytest.mark.parametrize(
+    "html",
+    [
+        "<p>First paragraph.</p>\n<p>Second paragraph.</p><div><p>Third</p></div>",
+        "<p>Steps:</p><ol><li><p>Install</p><p>with uv</p><ul><li>fast</li></ul></li><li>Run</li></ol><p>Done</p>",
+        "<ul><li>a</li></ul><table><tr><th>Name</th></tr><tr><td><p>x</p><p>y</p></td></tr></table><h3>End</h3>",
+        '<p>Code:</p><pre><button>Copy</button><code class="language-python">a = 1\n\nb = 2\n</code></pre><p>ok</p>',
+    ],
+)
+def test_page_extractor_matches_the_python_converter(html: str) -> None:
+    code_block_selector, skip_selector = "pre", "button"
+    expected = html_to_markdown(f'<div class="answer">{html}</div>', code_block_selector, skip_selector)
+    assert extract_in_node(html, code_block_selector, skip_selector) == expected
@@ -0,0 +1,40 @@
+from unittest.mock import patch
+
+from chapito.tools.history import MessageIndex
+
+
+def test_membership_ignores_whitespace_changes() -> None:
+    index = MessageIndex()
+    index.add("client", "Hello\n\nworld ")
+    assert index.contains("client", "Hello world")
+    assert not index.contains("client", "Hello")
+    assert not index.contains("other client", "Hello world")
+
+
+def test_messages_are_bounded_per_conversation() -> None:
+    index = MessageIndex(max_messages=2)
+    for content in ("a", "b", "c"):
+        index.add("client", content)
+    assert not index.contains("client", "a")
+    assert index.contains("client", "b")
+    assert index.contains("client", "c")
+
+
+def test_least_recently_used_conversation_is_evicted() -> None:
+    index = MessageIndex(max_conversations=2)
+    index.add("first", "a")
+    index.add("second", "b")
+    index.contains("first", "a")
+    index.add("third", "c")
+    assert len(index) == 2
+    assert index.contains("first", "a")
+    assert not index.contains("second", "b")
+
+
+def test_expired_conversations_are_forgotten() -> None:
+    index = MessageIndex(ttl=60)
+    with patch("chapito.tools.history.time.monotonic", return_value=1000):
+        index.add("client", "a")
+    with patch("chapito.tools.history.time.monotonic", return_value=1061):
+        assert not index.contains("client", "a")
+        assert len(index) == 0
@@ -0,0 +1,32 @@
+import subprocess
+import sys
+
+# Modules only needed once a chatbot starts.
+LAZY_MODULES = [
+    "chapito.anthropic_chat",
+    "chapito.deepseek_chat",
+    "chapito.duckduckgo_chat",
+    "chapito.gemini_chat",
+    "chapito.grok_chat",
+    "chapito.mistral_chat",
+    "chapito.openai_chat",
+    "chapito.perplexity_chat",
+    "bs4",
+    "pyperclip",
+    "requests",
+    "selenium_stealth",
+    "selenium.webdriver.remote.webdriver",
+]
+
+
+def test_startup_does_not_import_chatbots() -> None:
+    code = f"import sys, main; print([module for module in {LAZY_MODULES!r} if module in sys.modules])"
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == "[]"
+
+
+def test_chatbot_modules_do_not_import_the_clipboard() -> None:
+    # The clipboard is only a fallback, imported when used.
+    code = "import sys, chapito.duckduckgo_chat; print('pyperclip' in sys.modules)"
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == "False"
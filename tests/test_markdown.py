@@ -0,0 +1,28 @@
+from chapito.tools.markdown import html_to_markdown
+
+
+def test_code_blocks_keep_only_code_and_inline_code_is_quoted() -> None:
+    html = (
+        "<p>Run <code>main.py</code>:</p>"
+        '<div class="not-prose"><span>python</span><button>Copy</button>'
+        '<pre><code class="language-python">print("a &lt; b")\n</code></pre></div>'
+    )
+    expected = 'Run `main.py`:\n\n```python\nprint("a < b")\n```'
+    assert html_to_markdown(html, "div.not-prose, pre") == expected
+
+
+def test_labels_inside_pre_are_dropped_when_there_is_code() -> None:
+    html = '<pre class="not-prose"><div>python</div><div><code>x = 1\n</code></div></pre><pre><span>y = 2</span></pre>'
+    assert html_to_markdown(html, "pre.not-prose, pre") == "```\nx = 1\n```\n\n```\ny = 2\n```"
+
+
+def test_headings_lists_and_tables() -> None:
+    html = (
+        "<h2>Steps</h2><ol><li>Install<ul><li>with <b>uv</b></li></ul></li><li>Run</ol>"
+        "<table><tr><th>Name</th><th>Value</th></tr>\n<tr><td>a|b</td><td>\n  1\n</td></tr></table>"
+    )
+    expected = (
+        "## Steps\n\n1. Install\n  - with uv\n2. Run\n\n"
+        "| Name | Value |\n| --- | --- |\n| a\\|b | 1 |"
+    )
+    assert html_to_markdown(html) == expected
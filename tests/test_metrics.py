@@ -0,0 +1,28 @@
+from chapito.tools.metrics import CACHE_HITS_COUNTER, Metrics, provider_label
+
+
+def test_render_prometheus_exposition() -> None:
+    metrics = Metrics(buckets=(0.1, 1))
+    with provider_label("grok"):
+        metrics.observe("generation", 0.5)
+        metrics.observe("generation", 2)
+    metrics.increment(CACHE_HITS_COUNTER)
+
+    lines = metrics.render().splitlines()
+    assert "# TYPE chapito_stage_duration_seconds histogram" in lines
+    assert 'chapito_stage_duration_seconds_bucket{provider="grok",stage="generation",le="0.1"} 0' in lines
+    assert 'chapito_stage_duration_seconds_bucket{provider="grok",stage="generation",le="1"} 1' in lines
+    assert 'chapito_stage_duration_seconds_bucket{provider="grok",stage="generation",le="+Inf"} 2' in lines
+    assert 'chapito_stage_duration_seconds_sum{provider="grok",stage="generation"} 2.5' in lines
+    assert 'chapito_stage_duration_seconds_count{provider="grok",stage="generation"} 2' in lines
+    assert "chapito_cache_hits_total 1" in lines
+    assert "# TYPE chapito_timeouts_total counter" in lines
+
+
+def test_provider_label_is_restored() -> None:
+    metrics = Metrics()
+    with provider_label("grok"):
+        with provider_label("mistral"):
+            metrics.observe("queue", 0)
+        metrics.observe("queue", 0)
+    assert set(metrics.histograms) == {("grok", "queue"), ("mistral", "queue")}
@@ -0,0 +1,41 @@
+import argparse
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+from offline_proxy import CHAT_MODULES, run_benchmark  # noqa: E402
+
+from chapito.types import Chatbot  # noqa: E402
+
+
+def make_args(chatbot: Chatbot, requests: int, stream: bool) -> argparse.Namespace:
+    # Short answers and quiet period: the chatbot code is checked, not measured.
+    return argparse.Namespace(
+        chatbot=chatbot.value,
+        requests=requests,
+        concurrency=1,
+        stream=stream,
+        blocks=3,
+        code_lines=2,
+        block_interval=0.01,
+        quiet_period=0.05,
+    )
+
+
+@pytest.mark.parametrize("chatbot", list(CHAT_MODULES))
+def test_chatbots_answer_on_fake_chat_sites(chatbot: Chatbot) -> None:
+    args = make_args(chatbot, requests=1, stream=False)
+    samples = asyncio.run(run_benchmark(args))
+    assert len(samples["http"]) == 1
+    assert samples["completion_detection"][0] >= 0.05
+
+
+def test_streamed_answer_on_fake_chat_site() -> None:
+    args = make_args(Chatbot.GROK, requests=2, stream=True)
+    samples = asyncio.run(run_benchmark(args))
+    assert len(samples["time_to_first_token"]) == 2
+    assert all(ttft <= latency for ttft, latency in zip(samples["time_to_first_token"], samples["http"]))
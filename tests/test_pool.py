@@ -0,0 +1,120 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from conftest import make_config
+
+from chapito.tools.pool import BrowserPool
+
+
+def test_each_worker_has_its_own_profile(fake_chat_module) -> None:
+    pool = BrowserPool(fake_chat_module(), make_config(pool_size=3))
+    pool.start()
+    assert [worker.driver.fake_browser.profile_path for worker in pool.workers] == ["profile", "profile_1", "profile_2"]
+
+
+def test_browsers_start_in_parallel(fake_chat_module) -> None:
+    chat_module = fake_chat_module()
+    initialize_driver = chat_module.initialize_driver
+    barrier = threading.Barrier(2, timeout=5)
+
+    def initialize_driver_together(config):
+        barrier.wait()
+        return initialize_driver(config)
+
+    chat_module.initialize_driver = initialize_driver_together
+    pool = BrowserPool(chat_module, make_config(pool_size=2))
+    pool.start()
+    assert [worker.index for worker in pool.workers] == [0, 1]
+
+
+def test_started_browsers_are_quit_when_one_fails(fake_chat_module) -> None:
+    chat_module = fake_chat_module()
+    initialize_driver = chat_module.initialize_driver
+    drivers = []
+
+    def initialize_driver_or_fail(config):
+        if config.browser_profile_path == "profile_1":
+            raise RuntimeError("Chrome failed to start")
+        drivers.append(initialize_driver(config))
+        return drivers[-1]
+
+    chat_module.initialize_driver = initialize_driver_or_fail
+    pool = BrowserPool(chat_module, make_config(pool_size=3))
+    with pytest.raises(RuntimeError):
+        pool.start()
+    assert drivers
+    assert all(not driver.fake_browser.window_handles for driver in drivers)
+    assert pool.workers == []
+
+
+def test_requests_are_served_in_parallel(fake_chat_module) -> None:
+    pool = BrowserPool(fake_chat_module(), make_config(pool_size=2))
+    pool.start()
+    barrier = threading.Barrier(2, timeout=5)
+
+    def send_request_and_get_response(driver, prompt: str) -> str:
+        # Both requests must be in flight at the same time to pass the barrier.
+        barrier.wait()
+        return driver.fake_browser.profile_path
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        futures = [
+            executor.submit(pool.run, scope, send_request_and_get_response, "prompt") for scope in ("a", "b")
+        ]
+        profiles = sorted(future.result() for future in futures)
+
+    assert profiles == ["profile", "profile_1"]
+    assert all(not worker.busy_scopes for worker in pool.workers)
+
+
+def test_conversations_stick_to_their_tab(fake_chat_module) -> None:
+    pool = BrowserPool(fake_chat_module(), make_config(pool_size=1))
+    pool.start()
+
+    def get_tab(driver, prompt: str) -> str:
+        return driver.current_window_handle
+
+    first_tab = pool.run("first", get_tab, "prompt")
+    second_tab = pool.run("second", get_tab, "prompt")
+    assert first_tab != second_tab
+    assert pool.run("first", get_tab, "follow-up") == first_tab
+    assert pool.run("second", get_tab, "follow-up") == second_tab
+    # The tab opened at startup is used by the first conversation.
+    assert pool.workers[0].driver.fake_browser.loaded_chats == 1
+
+
+def test_tabs_of_a_browser_are_served_concurrently(fake_chat_module) -> None:
+    pool = BrowserPool(fake_chat_module(), make_config(pool_size=1, tabs_per_worker=2))
+    pool.start()
+    barrier = threading.Barrier(2, timeout=5)
+
+    def send_request_and_get_response(driver, prompt: str) -> tuple:
+        tab_before = driver.current_window_handle
+        # Both requests are in flight on the same browser, the other one switched tabs meanwhile.
+        barrier.wait()
+        return tab_before, driver.current_window_handle
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        futures = [
+            executor.submit(pool.run, scope, send_request_and_get_response, "prompt") for scope in ("a", "b")
+        ]
+        tabs = [future.result() for future in futures]
+
+    assert all(tab_before == tab_after for tab_before, tab_after in tabs)
+    assert tabs[0][0] != tabs[1][0]
+
+
+def test_least_recently_used_tab_is_closed(fake_chat_module) -> None:
+    pool = BrowserPool(fake_chat_module(), make_config(pool_size=1, max_tabs=2))
+    pool.start()
+    closed_conversations = []
+    pool.on_conversation_closed = closed_conversations.append
+
+    for scope in ("first", "second", "first", "third"):
+        pool.run(scope, lambda driver, prompt: None, "prompt")
+
+    assert closed_conversations == ["second"]
+    assert list(pool.workers[0].tabs) == ["first", "third"]
+    assert len(pool.workers[0].driver.window_handles) == 2
@@ -0,0 +1,50 @@
+from conftest import make_config
+
+from chapito.tools.providers import ProviderRegistry
+from chapito.types import Chatbot
+
+
+def make_registry(chat_module, idle_timeout: int = 0) -> ProviderRegistry:
+    config = make_config(idle_timeout=idle_timeout)
+    return ProviderRegistry({Chatbot.GROK: chat_module, Chatbot.MISTRAL: chat_module}, config)
+
+
+def test_model_selects_the_chatbot(fake_chat_module) -> None:
+    providers = make_registry(fake_chat_module())
+    assert providers.resolve("mistral") == Chatbot.MISTRAL
+    assert providers.resolve("Grok") == Chatbot.GROK
+    # Unknown models and chatbots without module go to the default chatbot.
+    assert providers.resolve("gpt-3.5-turbo") == Chatbot.GROK
+    assert providers.resolve("gemini") == Chatbot.GROK
+
+
+def test_chatbots_are_started_on_first_use(fake_chat_module) -> None:
+    providers = make_registry(fake_chat_module(lambda driver, prompt: driver.fake_browser.profile_path))
+    providers.start()
+    assert providers.live_chatbots() == [Chatbot.GROK]
+    assert providers.run(Chatbot.MISTRAL, "scope", "prompt") == "profile_mistral"
+    assert providers.live_chatbots() == [Chatbot.GROK, Chatbot.MISTRAL]
+
+
+def test_idle_chatbots_are_shut_down(fake_chat_module) -> None:
+    providers = make_registry(fake_chat_module(lambda driver, prompt: "answer"))
+    closed_conversations = []
+    providers.on_conversation_closed = closed_conversations.append
+    providers.start()
+    providers.run(Chatbot.MISTRAL, "scope", "prompt")
+    providers.shut_down_idle_pools()
+    # The default chatbot keeps running: the proxy stays ready.
+    assert providers.live_chatbots() == [Chatbot.GROK]
+    assert providers.is_ready()
+    assert closed_conversations == ["scope"]
+
+
+def test_auto_model_prefers_the_fastest_chatbot(fake_chat_module) -> None:
+    providers = make_registry(fake_chat_module())
+    providers.config.auto_chatbots = [Chatbot.GROK, Chatbot.MISTRAL]
+    providers.latencies = {Chatbot.GROK: 30.0, Chatbot.MISTRAL: 10.0}
+    assert providers.get_candidates("auto") == [Chatbot.MISTRAL, Chatbot.GROK]
+    # Requests in progress make a chatbot slower.
+    providers.users[Chatbot.MISTRAL] = 3
+    assert providers.get_candidates("auto") == [Chatbot.GROK, Chatbot.MISTRAL]
+    assert providers.get_candidates("mistral") == [Chatbot.MISTRAL]
@@ -0,0 +1,246 @@
+import asyncio
+import json
+import threading
+from typing import Optional
+
+import httpx
+import pytest
+from selenium.common.exceptions import TimeoutException
+
+from conftest import make_config
+
+from chapito.proxy import app, in_flight, setup_proxy
+from chapito.tools.metrics import metrics
+from chapito.tools.providers import ProviderRegistry
+from chapito.types import Chatbot
+
+
+def setup_fake_proxy(chat_module, other_chat_modules: Optional[dict] = None, **config_values) -> None:
+    config = make_config(**config_values)
+    providers = ProviderRegistry({Chatbot.GROK: chat_module, **(other_chat_modules or {})}, config)
+    providers.start()
+    setup_proxy(providers, config)
+
+
+def chat_payload(content: str = "Hello") -> dict:
+    return {"model": "chapito", "messages": [{"role": "user", "content": content}]}
+
+
+@pytest.fixture
+def blocked_browser():
+    release = threading.Event()
+    started = threading.Event()
+
+    def send_request_and_get_response(driver, prompt: str) -> str:
+        started.set()
+        release.wait(timeout=5)
+        return f"Answer to: {prompt}"
+
+    yield send_request_and_get_response, started, release
+    release.set()
+
+
+def test_event_loop_stays_responsive(blocked_browser, fake_chat_module) -> None:
+    send_request_and_get_response, started, release = blocked_browser
+    setup_fake_proxy(fake_chat_module(send_request_and_get_response), queue_size=4)
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            completion = asyncio.create_task(client.post("/chat/completions", json=chat_payload()))
+            await asyncio.to_thread(started.wait, 5)
+            models = await client.get("/models")
+            assert models.status_code == 200
+            assert not completion.done()
+            release.set()
+            response = await completion
+            assert response.status_code == 200
+            assert response.json()["choices"][0]["message"]["content"] == "Answer to: [user] Hello"
+
+    asyncio.run(scenario())
+
+
+def test_queue_full_returns_429(blocked_browser, fake_chat_module) -> None:
+    send_request_and_get_response, started, release = blocked_browser
+    setup_fake_proxy(fake_chat_module(send_request_and_get_response), queue_size=1)
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            completion = asyncio.create_task(client.post("/chat/completions", json=chat_payload("First")))
+            await asyncio.to_thread(started.wait, 5)
+            rejected = await client.post("/chat/completions", json=chat_payload("Second"))
+            assert rejected.status_code == 429
+            assert int(rejected.headers["Retry-After"]) >= 1
+            release.set()
+            assert (await completion).status_code == 200
+
+    asyncio.run(scenario())
+
+
+def test_stream_sends_chunks_as_they_come(fake_chat_module) -> None:
+    def send_request_and_stream_response(driver, prompt: str):
+        yield "Hel"
+        yield "lo!"
+
+    setup_fake_proxy(fake_chat_module(None, send_request_and_stream_response), queue_size=4, stream=True)
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            response = await client.post("/chat/completions", json=chat_payload())
+            events = [line[len("data: ") :] for line in response.text.split("\n\n") if line]
+            assert events[-1] == "[DONE]"
+            chunks = [json.loads(event) for event in events[:-1]]
+            assert all(chunk["object"] == "chat.completion.chunk" for chunk in chunks)
+            assert chunks[0]["choices"][0]["delta"]["role"] == "assistant"
+            assert [chunk["choices"][0]["delta"].get("content") for chunk in chunks[1:-1]] == ["Hel", "lo!"]
+            assert chunks[-1]["choices"][0]["finish_reason"] == "stop"
+            assert app.state.pending_requests == 0
+
+    asyncio.run(scenario())
+
+
+def test_identical_requests_are_answered_from_cache(fake_chat_module) -> None:
+    calls = []
+
+    def send_request_and_get_response(driver, prompt: str) -> str:
+        calls.append(prompt)
+        return "Cached answer"
+
+    setup_fake_proxy(fake_chat_module(send_request_and_get_response), queue_size=4, cache=True)
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            first = await client.post("/chat/completions", json=chat_payload("Same"))
+            assert first.headers["X-Chapito-Cache"] == "MISS"
+            retry = await client.post("/chat/completions", json=chat_payload("Same"))
+            assert retry.headers["X-Chapito-Cache"] == "HIT"
+            assert retry.json()["choices"][0]["message"]["content"] == "Cached answer"
+            assert retry.json()["usage"] == first.json()["usage"]
+            assert len(calls) == 1
+            assert (await client.delete("/admin/cache")).json() == {"purged": 1}
+            purged = await client.post("/chat/completions", json=chat_payload("Same"))
+            assert purged.headers["X-Chapito-Cache"] == "MISS"
+
+    asyncio.run(scenario())
+
+
+def test_identical_concurrent_requests_share_the_browser_call(blocked_browser, fake_chat_module) -> None:
+    send_request_and_get_response, started, release = blocked_browser
+    calls = []
+
+    def count_calls(driver, prompt: str) -> str:
+        calls.append(prompt)
+        return send_request_and_get_response(driver, prompt)
+
+    setup_fake_proxy(fake_chat_module(count_calls), queue_size=4)
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            first = asyncio.create_task(client.post("/chat/completions", json=chat_payload("Fan-out")))
+            await asyncio.to_thread(started.wait, 5)
+            second = asyncio.create_task(client.post("/chat/completions", json=chat_payload("Fan-out")))
+            await asyncio.sleep(0.1)
+            release.set()
+            responses = await asyncio.gather(first, second)
+            assert [response.json()["choices"][0]["message"]["content"] for response in responses] == [
+                "Answer to: [user] Fan-out"
+            ] * 2
+            assert len(calls) == 1
+            assert not in_flight
+
+    asyncio.run(scenario())
+
+
+@pytest.mark.parametrize("failure", ["timeout", "empty answer"])
+def test_auto_model_fails_over_to_the_next_chatbot(failure: str, fake_chat_module) -> None:
+    def fail(driver, prompt: str) -> str:
+        if failure == "timeout":
+            raise TimeoutException()
+        return ""
+
+    other_chat_modules = {Chatbot.MISTRAL: fake_chat_module(lambda driver, prompt: "Mistral answer")}
+    setup_fake_proxy(
+        fake_chat_module(fail), other_chat_modules, auto_chatbots=[Chatbot.GROK, Chatbot.MISTRAL], queue_size=4
+    )
+    metrics.reset()
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            payload = {"model": "auto", "messages": [{"role": "user", "content": failure}]}
+            response = await client.post("/chat/completions", json=payload)
+            assert response.json()["choices"][0]["message"]["content"] == "Mistral answer"
+            # The failing chatbot is penalized, the next request goes to the other one first.
+            assert app.state.providers.get_candidates("auto") == [Chatbot.MISTRAL, Chatbot.GROK]
+            counter = "chapito_timeouts_total" if failure == "timeout" else "chapito_empty_answers_total"
+            exposition = (await client.get("/metrics")).text
+            assert f'{counter}{{provider="grok"}} 1' in exposition
+            assert 'chapito_stage_duration_seconds_count{provider="mistral",stage="queue"} 1' in exposition
+
+    asyncio.run(scenario())
+
+
+def test_readiness_waits_for_the_default_chatbot(fake_chat_module) -> None:
+    config = make_config()
+    providers = ProviderRegistry({Chatbot.GROK: fake_chat_module()}, config)
+    setup_proxy(providers, config)
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            assert (await client.get("/health/ready")).status_code == 503
+            await asyncio.to_thread(providers.start)
+            assert (await client.get("/health/ready")).json() == {"status": "ready"}
+
+    asyncio.run(scenario())
+
+
+def test_long_conversations_move_to_a_new_chat(fake_chat_module) -> None:
+    prompts = []
+
+    def send_request_and_get_response(driver, prompt: str) -> str:
+        prompts.append(prompt)
+        return f"Answer {len(prompts)}"
+
+    setup_fake_proxy(fake_chat_module(send_request_and_get_response), queue_size=4, rotation_turns=2)
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            messages = []
+            for turn in range(1, 5):
+                messages.append({"role": "user", "content": f"Rotation {turn}"})
+                response = await client.post("/chat/completions", json={"model": "chapito", "messages": messages})
+                messages.append({"role": "assistant", "content": response.json()["choices"][0]["message"]["content"]})
+            browser = app.state.providers.pools[Chatbot.GROK].workers[0].driver.fake_browser
+            assert browser.loaded_chats == 1
+
+    asyncio.run(scenario())
+    assert prompts[:2] == ["[user] Rotation 1", "[user] Rotation 2"]
+    # The third turn replays the whole conversation in a new chat, then only new messages are sent.
+    assert prompts[2] == (
+        "[user] Rotation 1\n\n[assistant] Answer 1\n\n[user] Rotation 2\n\n[assistant] Answer 2\n\n[user] Rotation 3"
+    )
+    assert prompts[3] == "[user] Rotation 4"
+
+
+def test_requests_are_traced(tmp_path, fake_chat_module) -> None:
+    trace_file = tmp_path / "trace.json"
+    setup_fake_proxy(fake_chat_module(lambda driver, prompt: "Traced answer"), queue_size=4, trace_file=str(trace_file))
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            response = await client.post("/chat/completions", json=chat_payload("Traced"))
+            return response.headers["X-Chapito-Trace-Id"]
+
+    trace_id = asyncio.run(scenario())
+    # Chrome trace format: a JSON array whose closing bracket is optional.
+    events = json.loads(trace_file.read_text().rstrip(",\n") + "]")
+    assert {event["args"]["trace_id"] for event in events} == {trace_id}
+    names = {event["name"] for event in events}
+    assert {"chat_completions", "queue", "switchToWindow"} <= names
@@ -0,0 +1,73 @@
+import os
+from types import SimpleNamespace
+
+from selenium.webdriver.common.by import By
+
+from conftest import make_config
+
+from chapito.base_chat import BaseChatProvider
+from chapito.tools.providers import ProviderRegistry
+from chapito.tools.specs import SpecWatcher, apply_spec
+from chapito.types import Chatbot, TransferStrategy
+
+
+class FakeChat(BaseChatProvider):
+    name = "Fake"
+    url = "https://example.com/"
+    submit_css_selector = "button"
+    answer_locator = (By.CSS_SELECTOR, "div.answer")
+
+
+def write_specs(path, content: str) -> None:
+    path.write_text(content)
+    # Make sure the change is seen even within the resolution of the file system clock.
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+def test_spec_overrides_fields_and_removed_fields_get_their_default_back() -> None:
+    provider = FakeChat()
+    spec = {
+        "submit_css_selector": "button.send",
+        "answer_locator": ["xpath", "//div"],
+        "transfer_strategy": "contenteditable",
+        "timeout_seconds": "soon",
+        "unknown": 1,
+    }
+    apply_spec(provider, spec)
+    assert provider.submit_css_selector == "button.send"
+    assert provider.answer_locator == (By.XPATH, "//div")
+    assert provider.transfer_strategy == TransferStrategy.CONTENT_EDITABLE
+    # Invalid values are ignored.
+    assert provider.timeout_seconds == 120
+    previous_values = vars(provider)
+    apply_spec(provider, {"url": "https://example.org/"})
+    assert provider.url == "https://example.org/"
+    assert provider.submit_css_selector == "button"
+    # New values are swapped in, the previous ones are left untouched for requests reading them.
+    assert previous_values["submit_css_selector"] == "button.send"
+
+
+def test_running_chatbots_get_reloaded_specs(tmp_path) -> None:
+    path = tmp_path / "providers.toml"
+    write_specs(path, '[grok]\nsubmit_css_selector = "button.send"\n')
+    config = make_config(provider_specs=str(path))
+    chat_module = SimpleNamespace(provider=FakeChat())
+    providers = ProviderRegistry({Chatbot.GROK: chat_module}, config)
+    assert chat_module.provider.submit_css_selector == "button.send"
+
+    write_specs(path, '[grok]\nsubmit_css_selector = "button.submit"\n')
+    assert providers.spec_watcher.check()
+    assert chat_module.provider.submit_css_selector == "button.submit"
+    assert not providers.spec_watcher.check()
+
+
+def test_invalid_spec_file_keeps_previous_specs(tmp_path) -> None:
+    path = tmp_path / "providers.toml"
+    write_specs(path, '[grok]\nurl = "https://example.org/"\n')
+    loaded = []
+    watcher = SpecWatcher(str(path), loaded.append)
+    assert watcher.check()
+    write_specs(path, "[grok\n")
+    assert not watcher.check()
+    assert loaded == [{"grok": {"url": "https://example.org/"}}]
@@ -0,0 +1,49 @@
+from unittest.mock import MagicMock
+
+import pytest
+from selenium.common.exceptions import TimeoutException
+
+from chapito.tools.streaming import get_new_text, get_stable_text, stream_answer
+
+
+def test_stable_text_excludes_changing_end() -> None:
+    previous_text = "Code:\n```\nprint(1\n```"
+    current_text = "Code:\n```\nprint(1)\n```"
+    assert get_stable_text(previous_text, current_text) == "Code:\n```\nprint(1"
+
+
+def test_new_text_extends_sent_text() -> None:
+    assert get_new_text("Hello", "Hello world") == " world"
+    assert get_new_text("Hello", "Hello") == ""
+
+
+def test_new_text_ignores_rewritten_answer() -> None:
+    assert get_new_text("Hello", "Hi there") == ""
+
+
+def test_unfinished_answer_times_out(monkeypatch) -> None:
+    monkeypatch.setattr("chapito.tools.streaming.traced_sleep", lambda seconds: None)
+    stream = stream_answer(
+        MagicMock(),
+        submit=lambda: None,
+        count_answers=lambda: 0,
+        read_new_answer=lambda count, final: "Still writing",
+        is_answer_finished=lambda: False,
+        timeout=0.01,
+    )
+    with pytest.raises(TimeoutException):
+        list(stream)
+
+
+def test_only_the_final_read_is_final(monkeypatch) -> None:
+    monkeypatch.setattr("chapito.tools.streaming.traced_sleep", lambda seconds: None)
+    finished = iter([False, False, True])
+    finals = []
+
+    def read_new_answer(count: int, final: bool) -> str:
+        finals.append(final)
+        return "Hello world"
+
+    stream = stream_answer(MagicMock(), lambda: None, lambda: 0, read_new_answer, lambda: next(finished), timeout=5)
+    assert "".join(stream) == "Hello world"
+    assert finals == [False, False, True]
@@ -0,0 +1,51 @@
+import hashlib
+import sys
+from unittest.mock import MagicMock, patch
+
+from chapito.tools.tokens import (
+    ENCODING_FILES,
+    HEURISTIC_TOKENIZER,
+    TokenCounter,
+    estimate_tokens,
+    is_encoding_cached,
+    load_encoder,
+)
+
+
+def test_estimate_counts_symbols_and_long_words() -> None:
+    assert estimate_tokens("Hello world") == 2
+    assert estimate_tokens("print(values[0])") == 7
+    assert estimate_tokens("internationalization") == 4
+    assert estimate_tokens("") == 0
+
+
+def test_counts_of_long_texts_are_memoized() -> None:
+    counter = TokenCounter(HEURISTIC_TOKENIZER, max_texts=2)
+    history = ["first message " * 50, "second message " * 50, "third message " * 50]
+    with patch("chapito.tools.tokens.estimate_tokens", wraps=estimate_tokens) as estimate:
+        total = counter.count_all(history[:2])
+        assert counter.count_all(history[:2]) == total
+        assert estimate.call_count == 2
+        counter.count_all(history)
+        assert estimate.call_count == 3
+        assert len(counter.counts) == 2
+
+
+def test_encoding_is_looked_up_in_the_tiktoken_cache(tmp_path, monkeypatch) -> None:
+    monkeypatch.setenv("TIKTOKEN_CACHE_DIR", str(tmp_path))
+    assert not is_encoding_cached("o200k_base")
+    (tmp_path / hashlib.sha1(ENCODING_FILES["o200k_base"].encode()).hexdigest()).write_bytes(b"")
+    assert is_encoding_cached("o200k_base")
+    monkeypatch.setenv("TIKTOKEN_CACHE_DIR", "")
+    assert not is_encoding_cached("o200k_base")
+
+
+def test_missing_encoding_is_estimated_without_download(tmp_path, monkeypatch) -> None:
+    monkeypatch.setenv("TIKTOKEN_CACHE_DIR", str(tmp_path))
+    tiktoken = MagicMock()
+    with patch.dict(sys.modules, {"tiktoken": tiktoken}):
+        assert load_encoder("o200k_base") is None
+        counter = TokenCounter("o200k_base")
+    tiktoken.get_encoding.assert_not_called()
+    assert counter.encoder is None
+    assert counter.count("Hello world") == 2
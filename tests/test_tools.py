@@ -0,0 +1,39 @@
+from unittest.mock import MagicMock, patch
+
+from chapito.tools import tools
+from chapito.types import TransferStrategy
+
+
+def test_prompt_hash_is_fnv1a() -> None:
+    assert tools.get_prompt_hash("a") == 0xE40C292C
+
+
+def test_prompt_hash_ignores_whitespaces() -> None:
+    assert tools.get_prompt_hash("def f():\n\treturn 1") == tools.get_prompt_hash("def f(): return 1")
+    assert tools.get_prompt_hash("a b") != tools.get_prompt_hash("ab c")
+
+
+def test_transfer_prompt_confirms_with_hash() -> None:
+    message = "Hello\nworld"
+    textarea = MagicMock()
+    textarea.parent.execute_script.side_effect = ["value", tools.get_prompt_hash(message)]
+
+    with patch("pyperclip.copy") as copy:
+        tools.transfer_prompt(message, textarea, TransferStrategy.VALUE)
+
+    copy.assert_not_called()
+    assert textarea.parent.execute_script.call_count == 2
+
+
+def test_transfer_prompt_falls_back_to_clipboard() -> None:
+    message = "Hello"
+    textarea = MagicMock()
+    hashes = iter([0, tools.get_prompt_hash(message)])
+    textarea.parent.execute_script.side_effect = lambda script, *args: (
+        "value" if script == tools.INSERT_PROMPT_SCRIPT else next(hashes)
+    )
+
+    with patch.object(tools, "TRANSFER_TIMEOUT_SECONDS", 0), patch("pyperclip.copy") as copy:
+        tools.transfer_prompt(message, textarea, TransferStrategy.VALUE)
+
+    copy.assert_called_once_with(message)
@@ -0,0 +1,30 @@
+from selenium.webdriver.remote.command import Command
+
+from chapito.tools.tabs import get_span_args
+from chapito.tools.tracing import Trace, current_trace, span
+
+
+def test_span_names_selenium_scripts_and_searches() -> None:
+    script = "/* getAttribute */return (function(){}).apply(null, arguments);"
+    assert get_span_args(Command.W3C_EXECUTE_SCRIPT, {"script": script, "args": []}) == {"name": "getAttribute"}
+    assert get_span_args(Command.W3C_EXECUTE_SCRIPT, {"script": "return 1;"}) == {"name": Command.W3C_EXECUTE_SCRIPT}
+    assert get_span_args(Command.FIND_ELEMENT, {"using": "css selector", "value": "textarea"}) == {
+        "name": Command.FIND_ELEMENT,
+        "using": "css selector",
+        "value": "textarea",
+    }
+
+
+def test_spans_are_recorded_in_the_current_trace() -> None:
+    with span("untraced"):
+        pass
+    trace = Trace("abc")
+    token = current_trace.set(trace)
+    try:
+        with span("clickElement"):
+            pass
+    finally:
+        current_trace.reset(token)
+    events = trace.finish("chat_completions")
+    assert [event["name"] for event in events] == ["chat_completions", "clickElement"]
+    assert all(event["ph"] == "X" and event["args"]["trace_id"] == "abc" for event in events)